@@ -1,7 +1,9 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-from utils.db import (
-    get_downloaded_restaurants)
+from utils.cache import (
+    cached_downloaded_restaurants,
+    get_shared_pool,
+    get_shared_stop_words)
 from views.analytics import analytics_page
 from views.home import home_page
 from views.llm import llm_page
@@ -31,7 +33,11 @@ with st.sidebar:
         # orientation="horizontal",
     )
 
-df_downloaded_restaurants = get_downloaded_restaurants()
+# Ressources partagées entre les sessions, chargées une seule fois
+get_shared_pool()
+get_shared_stop_words()
+
+df_downloaded_restaurants = cached_downloaded_restaurants()
 
 if selected == "Accueil":
     home_page()
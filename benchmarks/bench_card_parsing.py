@@ -0,0 +1,117 @@
+"""
+Benchmark review card parsing throughput (cards/s).
+
+Compares the previous parsing (full html.parser tree, then two find() calls per
+field of each card) with the current one (fastest available parser restricted
+to the cards by a SoupStrainer, then one pass over the tags of each card).
+
+Pages are HTML fixtures: the files given with --fixtures (e.g. review pages
+saved from a browser), or pages generated with the markup of
+benchmarks.fake_tripadvisor. No network or database is needed.
+
+Usage:
+    python -m benchmarks.bench_card_parsing [--pages 50] [--fixtures page1.html page2.html ...]
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from benchmarks.fake_tripadvisor import REVIEWS_PER_PAGE, render_page
+from utils.functions import clean_text, extract_by_regex, filter_by_regex
+from utils.tripAdvisorScraper import (
+    HTML_PARSER,
+    REVIEW_PAGE_STRAINER,
+    TripAdvisorSpecificRestaurantScraper,
+    parse_html,
+)
+
+
+def parse_review_previous(review_card):
+    """Previous implementation: two find() calls per field."""
+    review_text_class = "biGQs _P pZUbB KxBGd"
+    contributions_class = "b"
+    date_class = "biGQs _P pZUbB ncFvv osNWb"
+    user_name_class = "BMQDV _F Gv wSSLS SwZTJ FGwzt ukgoS"
+    rating_class = "UctUV d H0"
+
+    review_text = review_card.find("div", class_=review_text_class).get_text(strip=True) if review_card.find("div", class_=review_text_class) else None
+    contributions = review_card.find("span", class_=contributions_class).get_text(strip=True) if review_card.find("span", class_=contributions_class) else None
+    date = review_card.find("div", class_=date_class).get_text(strip=True) if review_card.find("div", class_=date_class) else None
+    user_name = review_card.find("a", class_=user_name_class).get_text(strip=True) if review_card.find("a", class_=user_name_class) else None
+    rating = review_card.find("svg", class_=rating_class).title.text if review_card.find("svg", class_=rating_class) else None
+
+    date = filter_by_regex(date, r"Rédigé le") if date else None
+    rating = extract_by_regex(rating, r"(\d\,\d)") if rating else None
+    try:
+        date = datetime.strptime(date, "%d %B %Y").strftime("%Y-%m-%d")
+    except ValueError:
+        date = None
+
+    rating = float(rating.replace(",", ".")) if rating else None
+    return {
+        "user_name": user_name,
+        "review_text": clean_text(review_text) if review_text else None,
+        "date": date,
+        "contributions": contributions,
+        "rating": rating,
+    }
+
+
+def parse_previous(pages):
+    reviews = []
+    for page in pages:
+        soup = BeautifulSoup(page, "html.parser")
+        reviews.extend(parse_review_previous(card) for card in soup.find_all("div", class_="_c"))
+    return reviews
+
+
+def parse_current(pages, scraper):
+    reviews = []
+    for page in pages:
+        scraper.soup = parse_html(page, REVIEW_PAGE_STRAINER)
+        reviews.extend(scraper.parse_review(card) for card in scraper.get_review_cards())
+    return reviews
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50, help="Number of generated pages.")
+    parser.add_argument("--fixtures", nargs="*", default=None, help="Saved HTML pages of reviews.")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        pages = []
+        for path in args.fixtures:
+            with open(path, "rb") as file:
+                pages.append(file.read())
+    else:
+        pages = [
+            render_page(page % 20 + 1, (page // 20) * REVIEWS_PER_PAGE, args.pages).encode("utf-8")
+            for page in range(args.pages)
+        ]
+
+    scraper = TripAdvisorSpecificRestaurantScraper()
+
+    start = time.perf_counter()
+    previous = parse_previous(pages)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = parse_current(pages, scraper)
+    elapsed = time.perf_counter() - start
+
+    assert current == previous, "the parsed reviews differ from the previous implementation"
+
+    cards = len(previous)
+    print(f"{len(pages)} pages, {cards} review cards")
+    print(f"{'method':<40}{'seconds':>10}{'cards/s':>12}{'speedup':>10}")
+    print(f"{'html.parser + find() x2 (previous)':<40}{baseline:>10.2f}{cards / baseline:>12.0f}{1:>9.1f}x")
+    name = f"{HTML_PARSER} + strainer + one pass"
+    print(f"{name:<40}{elapsed:>10.2f}{cards / elapsed:>12.0f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark NRC emotion scoring: per-review NRCLex versus the vectorized scorer.
+
+Runs on the corpus bundled in sql/set_reviews.sql (no database needed). The
+vectorized scorer is timed on already tokenized reviews, as produced by
+clean_text_df; tokenization itself is not part of its timing.
+
+The scores are not the same as before: NRCLex matched the raw TextBlob words
+of the review, the scorer matches its lemmatized, lower-case tokens without
+stop words. The per-emotion distributions of both are compared, along with
+those of the scorer on the raw words, which isolates the preprocessing change.
+
+Usage:
+    python -m benchmarks.bench_emotions [--scale 1]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from nltk.corpus import stopwords
+from nrclex import NRCLex
+from textblob import TextBlob
+
+from benchmarks.corpus import load_reviews_corpus
+from utils.emotions import EMOTIONS, NRCEmotionScorer, _EMOTION_ALIASES
+from utils.functions import words_not_relevant
+from utils.normalization import normalize_texts
+
+
+def nrclex_per_review(texts):
+    """Previous implementation of extract_emotions, one NRCLex object per review."""
+    results = []
+    for text in texts:
+        emotion_scores = NRCLex(text).raw_emotion_scores
+        total = sum(emotion_scores.values())
+        if total > 0:
+            results.append({emotion: score / total for emotion, score in emotion_scores.items()})
+        else:
+            results.append(emotion_scores)
+    return results
+
+
+def distributions(results):
+    """Per-emotion shares of each review as a DataFrame, NaN rows for reviews without emotion words."""
+    rows = []
+    for result in results:
+        # An emotion found under both of its names is merged, whatever the order of the keys
+        shares = {}
+        for emotion, share in result.items():
+            emotion = _EMOTION_ALIASES.get(emotion, emotion)
+            shares[emotion] = max(shares.get(emotion, 0.0), share)
+        rows.append({emotion: shares.get(emotion, 0.0) for emotion in EMOTIONS} if shares else {})
+    return pd.DataFrame(rows, columns=EMOTIONS)
+
+
+def compare(expected, scores):
+    """
+    Mean absolute difference of each emotion share, over the reviews where both
+    found emotion words, and share of the reviews where both agree on their presence.
+    """
+    scores = scores.copy()
+    present = scores.notna().any(axis=1)
+    scores.loc[present] = scores.loc[present].fillna(0.0)
+    expected_present = expected.notna().any(axis=1)
+    both = present & expected_present
+    difference = (scores[both] - expected[both]).abs().mean()
+    return difference, (present == expected_present).mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the corpus this many times.")
+    args = parser.parse_args()
+
+    texts = [review["review_text"] for review in load_reviews_corpus()] * args.scale
+    stop_words = set(stopwords.words("french"))
+    stop_words.update(words_not_relevant)
+    token_lists = [text.split() for text in normalize_texts(texts, "lemmatization", stop_words)]
+
+    start = time.perf_counter()
+    expected = nrclex_per_review(texts)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scorer = NRCEmotionScorer()
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = scorer.score(token_lists)
+    elapsed = time.perf_counter() - start
+
+    expected = distributions(expected)
+    raw_words = [[word.lower() for word in TextBlob(text).words] for text in texts]
+    difference, agreement = compare(expected, scores)
+    raw_difference, raw_agreement = compare(expected, scorer.score(raw_words))
+
+    with_emotions = int(expected.notna().any(axis=1).sum())
+    print(f"{len(texts)} reviews ({with_emotions} with NRC emotion words according to NRCLex)")
+    print(f"{'method':<30}{'seconds':>10}{'reviews/s':>12}{'speedup':>10}")
+    print(f"{'NRCLex per review':<30}{baseline:>10.3f}{len(texts) / baseline:>12.0f}{1:>9.1f}x")
+    print(f"{'NRCEmotionScorer (batch)':<30}{elapsed:>10.3f}{len(texts) / elapsed:>12.0f}{baseline / elapsed:>9.1f}x")
+    print(f"Lexicon matrix built once in {build:.3f}s")
+    print()
+    print("Mean absolute difference of the emotion shares with NRCLex")
+    print(f"{'emotion':<16}{'NRCLex mean':>12}{'normalized':>12}{'raw words':>12}")
+    for emotion in EMOTIONS:
+        print(f"{emotion:<16}{expected[emotion].mean():>12.3f}"
+              f"{difference[emotion]:>12.3f}{raw_difference[emotion]:>12.3f}")
+    print(f"{'all emotions':<16}{'':>12}{difference.mean():>12.3f}{raw_difference.mean():>12.3f}")
+    print(f"{'presence agrees':<16}{'':>12}{agreement:>12.1%}{raw_agreement:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
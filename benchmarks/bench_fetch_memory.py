@@ -0,0 +1,88 @@
+"""
+Benchmark review fetching: DictCursor row materialization versus the columnar fetch layer.
+
+Reports wall time and peak Python memory (tracemalloc) for the review-level
+query used by the analytics pages, over every restaurant in the database.
+
+Usage:
+    python -m benchmarks.bench_fetch_memory [--chunk-size 2000]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+import psycopg2.extras
+
+from utils.db import fetch_dataframe, get_cursor, iter_dataframes
+
+QUERY = """
+    SELECT
+        r.restaurant_id,
+        r.restaurant_name,
+        r.restaurant_avg_review,
+        r.restaurant_type,
+        r.restaurant_price,
+        l.latitude,
+        l.longitude,
+        r2.rating,
+        r2.review_text,
+        r2.contributions,
+        r2.date
+    FROM restaurants r
+    JOIN locations l ON l.restaurant_id = r.restaurant_id
+    JOIN reviews r2 ON r2.restaurant_id = r.restaurant_id
+"""
+
+
+def fetch_with_dict_cursor():
+    """Previous approach: one dict per row, then a DataFrame from the dicts."""
+    with get_cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+        cursor.execute(QUERY)
+        rows = cursor.fetchall()
+    return pd.DataFrame([dict(row) for row in rows])
+
+
+def fetch_columnar():
+    return fetch_dataframe(QUERY, categorical=True)
+
+
+def fetch_chunked(chunk_size):
+    rows = 0
+    for chunk in iter_dataframes(QUERY, chunk_size=chunk_size, categorical=True):
+        rows += len(chunk)
+    return rows
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = []
+    df, elapsed, peak = measure(fetch_with_dict_cursor)
+    results.append(("DictCursor + dicts", len(df), elapsed, peak, df.memory_usage(deep=True).sum()))
+    df, elapsed, peak = measure(fetch_columnar)
+    results.append(("columnar fetch_dataframe", len(df), elapsed, peak, df.memory_usage(deep=True).sum()))
+    rows, elapsed, peak = measure(lambda: fetch_chunked(args.chunk_size))
+    results.append((f"iter_dataframes ({args.chunk_size}/chunk)", rows, elapsed, peak, None))
+
+    print(f"{'method':<34}{'rows':>8}{'seconds':>10}{'peak MiB':>10}{'frame MiB':>11}")
+    for name, rows, elapsed, peak, frame_bytes in results:
+        frame = f"{frame_bytes / 2 ** 20:>11.1f}" if frame_bytes is not None else f"{'-':>11}"
+        print(f"{name:<34}{rows:>8}{elapsed:>10.3f}{peak / 2 ** 20:>10.1f}{frame}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark review text normalization throughput against the number of worker processes.
+
+Runs on the corpus bundled in sql/set_reviews.sql (no database needed) and
+compares the batched engine of utils.normalization with the previous
+per-review Series.apply implementation.
+
+Usage:
+    python -m benchmarks.bench_normalization [--root-type lemmatization] [--scale 1]
+"""
+
+import argparse
+import os
+import time
+
+import nltk
+import pandas as pd
+from nltk.corpus import stopwords
+from nltk.stem.snowball import SnowballStemmer
+
+from benchmarks.corpus import load_reviews_corpus
+from utils.functions import words_not_relevant
+from utils.normalization import normalize_texts
+
+
+def apply_per_review(texts, root_type, stop_words):
+    """Previous implementation: one review at a time, no memoization."""
+    stemmer = SnowballStemmer("french")
+    lemmatizer = nltk.WordNetLemmatizer()
+
+    def process_text(text):
+        tokens = nltk.word_tokenize(text, language="french")
+        if root_type == "stemming":
+            tokens = [stemmer.stem(word.lower()).lower() for word in tokens if word.lower() not in stop_words]
+        else:
+            tokens = [lemmatizer.lemmatize(word.lower()).lower() for word in tokens if word.lower() not in stop_words]
+        return " ".join(tokens)
+
+    return pd.Series(texts).apply(process_text).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root-type", choices=["lemmatization", "stemming"], default="lemmatization")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the corpus this many times.")
+    args = parser.parse_args()
+
+    texts = [review["review_text"] for review in load_reviews_corpus()] * args.scale
+    stop_words = set(stopwords.words("french"))
+    stop_words.update(words_not_relevant)
+
+    start = time.perf_counter()
+    expected = apply_per_review(texts, args.root_type, stop_words)
+    baseline = time.perf_counter() - start
+
+    print(f"{len(texts)} reviews, {args.root_type}")
+    print(f"{'method':<28}{'seconds':>10}{'reviews/s':>12}{'speedup':>10}")
+    print(f"{'Series.apply (previous)':<28}{baseline:>10.2f}{len(texts) / baseline:>12.0f}{1:>9.1f}x")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        result = normalize_texts(texts, args.root_type, stop_words, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert result == expected, "normalize_texts output differs from the previous implementation"
+        name = f"engine, {workers} worker(s)"
+        print(f"{name:<28}{elapsed:>10.2f}{len(texts) / elapsed:>12.0f}{baseline / elapsed:>9.1f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark review ingestion: per-row INSERT versus batched save_reviews_to_db.
+
+The corpus from sql/set_reviews.sql is written under a scratch restaurant,
+which is removed afterwards. Requires a reachable PostgreSQL (see README).
+
+Usage:
+    python -m benchmarks.bench_review_ingest [--repeat 3] [--batch-sizes 100 500 1000]
+"""
+
+import argparse
+import time
+
+from benchmarks.corpus import load_reviews_corpus
+from utils.db import get_cursor, save_reviews_to_db
+
+
+def create_scratch_restaurant():
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO restaurants (restaurant_name, restaurant_url)
+            VALUES ('__benchmark__', '__benchmark__')
+            RETURNING restaurant_id
+            """
+        )
+        return cursor.fetchone()[0]
+
+
+def clear_reviews(restaurant_id):
+    with get_cursor() as cursor:
+        cursor.execute("DELETE FROM reviews WHERE restaurant_id = %s", (restaurant_id,))
+
+
+def drop_scratch_restaurant(restaurant_id):
+    clear_reviews(restaurant_id)
+    with get_cursor() as cursor:
+        cursor.execute("DELETE FROM restaurants WHERE restaurant_id = %s", (restaurant_id,))
+
+
+def save_reviews_row_by_row(restaurant_id, reviews):
+    """Previous ingestion path: one INSERT round-trip per review, single commit."""
+    with get_cursor() as cursor:
+        for review in reviews:
+            cursor.execute(
+                """
+                INSERT INTO reviews (restaurant_id, user_name, review_text, date, contributions, rating)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (
+                    restaurant_id, review['user_name'], review['review_text'],
+                    review['date'], review['contributions'], review['rating']
+                )
+            )
+
+
+def timed(func, restaurant_id, repeat):
+    timings = []
+    for _ in range(repeat):
+        clear_reviews(restaurant_id)
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 500, 1000])
+    args = parser.parse_args()
+
+    reviews = load_reviews_corpus()
+    restaurant_id = create_scratch_restaurant()
+    try:
+        results = [(
+            "per-row INSERT",
+            timed(lambda: save_reviews_row_by_row(restaurant_id, reviews), restaurant_id, args.repeat)
+        )]
+        for batch_size in args.batch_sizes:
+            results.append((
+                f"execute_values (batch={batch_size})",
+                timed(lambda: save_reviews_to_db(restaurant_id, reviews, batch_size), restaurant_id, args.repeat)
+            ))
+    finally:
+        drop_scratch_restaurant(restaurant_id)
+
+    baseline = results[0][1]
+    print(f"{len(reviews)} reviews, best of {args.repeat} runs")
+    print(f"{'method':<32}{'seconds':>10}{'reviews/s':>12}{'speedup':>10}")
+    for name, seconds in results:
+        print(f"{name:<32}{seconds:>10.3f}{len(reviews) / seconds:>12.0f}{baseline / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the restaurant-level queries before and after migration 001.
+
+Compares, per restaurant:
+- the legacy review summary (COUNT/AVG/MIN/MAX over reviews) and the legacy
+  "downloaded restaurants" query (IN subquery), with index scans disabled to
+  stand in for the schema before the migration;
+- the same legacy queries with the new indexes;
+- the queries served from the restaurant_review_stats summary table.
+
+Usage:
+    python -m benchmarks.bench_review_stats [--repeat 50]
+"""
+
+import argparse
+import statistics
+import time
+
+from utils.db import get_connection
+
+LEGACY_SUMMARY = """
+    SELECT COUNT(*), AVG(rating), MAX(date), MIN(date)
+    FROM reviews
+    WHERE restaurant_id = %s
+"""
+LEGACY_DOWNLOADED = """
+    SELECT r.restaurant_id, l.address
+    FROM restaurants r
+    JOIN locations l ON r.restaurant_id = l.restaurant_id
+    WHERE r.restaurant_id IN (SELECT restaurant_id FROM REVIEWS)
+"""
+STATS_SUMMARY = """
+    SELECT review_count, rating_sum::float / NULLIF(review_count, 0), last_comment_date, first_comment_date
+    FROM restaurant_review_stats
+    WHERE restaurant_id = %s
+"""
+STATS_DOWNLOADED = """
+    SELECT r.restaurant_id, l.address
+    FROM restaurants r
+    JOIN locations l ON r.restaurant_id = l.restaurant_id
+    JOIN restaurant_review_stats s ON s.restaurant_id = r.restaurant_id
+    WHERE s.review_count > 0
+"""
+
+
+def median_latency(cursor, query, params_list, repeat):
+    timings = []
+    for _ in range(repeat):
+        for params in params_list:
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT restaurant_id FROM restaurants")
+            restaurant_ids = [(row[0],) for row in cursor.fetchall()]
+
+            results = []
+            cursor.execute("SET enable_indexscan = off; SET enable_bitmapscan = off; SET enable_indexonlyscan = off")
+            results.append(("legacy, no index", median_latency(cursor, LEGACY_SUMMARY, restaurant_ids, args.repeat),
+                            median_latency(cursor, LEGACY_DOWNLOADED, [None], args.repeat)))
+            cursor.execute("RESET enable_indexscan; RESET enable_bitmapscan; RESET enable_indexonlyscan")
+            results.append(("legacy, indexed", median_latency(cursor, LEGACY_SUMMARY, restaurant_ids, args.repeat),
+                            median_latency(cursor, LEGACY_DOWNLOADED, [None], args.repeat)))
+            results.append(("restaurant_review_stats", median_latency(cursor, STATS_SUMMARY, restaurant_ids, args.repeat),
+                            median_latency(cursor, STATS_DOWNLOADED, [None], args.repeat)))
+        connection.rollback()
+
+    print(f"Median latency over {args.repeat} runs, {len(restaurant_ids)} restaurants")
+    print(f"{'variant':<26}{'summary (ms)':>14}{'downloaded (ms)':>17}")
+    for name, summary, downloaded in results:
+        print(f"{name:<26}{summary:>14.3f}{downloaded:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
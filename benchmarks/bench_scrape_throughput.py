@@ -0,0 +1,70 @@
+"""
+Benchmark review scraping throughput (pages/minute) against the number of
+restaurants scraped in parallel, at a fixed polite request rate.
+
+Runs against the local stand-in server of benchmarks.fake_tripadvisor (no
+request is sent to TripAdvisor and no database is needed). With one restaurant
+at a time the throughput is bounded by the page latency; with several, pages
+are fetched while others are waiting and the token bucket becomes the limit.
+
+Usage:
+    python -m benchmarks.bench_scrape_throughput [--restaurants 8] [--pages 5] [--latency 0.3] [--rate 4]
+"""
+
+import argparse
+import time
+
+from benchmarks.fake_tripadvisor import FakeTripAdvisorServer, REVIEWS_PER_PAGE, restaurant_url
+from utils.http_client import page_cache
+from utils.rate_limit import set_rate_limit
+from utils.scraping import scrape_restaurants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurants", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=5, help="Pages of reviews per restaurant.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per page on the server.")
+    parser.add_argument("--rate", type=float, default=4.0, help="Requests per second allowed to the host.")
+    args = parser.parse_args()
+
+    server = FakeTripAdvisorServer(pages=args.pages, latency=args.latency).start()
+    restaurants = [
+        (restaurant_url(restaurant_id), args.pages * REVIEWS_PER_PAGE)
+        for restaurant_id in range(1, args.restaurants + 1)
+    ]
+    expected_reviews = args.restaurants * args.pages * REVIEWS_PER_PAGE
+
+    def run(workers):
+        set_rate_limit(server.url_base, args.rate)
+        served = server.requests_served
+        start = time.perf_counter()
+        results = scrape_restaurants(restaurants, max_workers=workers, url_base=server.url_base)
+        elapsed = time.perf_counter() - start
+        pages = server.requests_served - served
+
+        errors = [result for result in results.values() if isinstance(result, Exception)]
+        assert not errors, errors[0]
+        assert sum(len(reviews) for reviews in results.values()) == expected_reviews
+        return elapsed, pages
+
+    print(f"{args.restaurants} restaurants x {args.pages} pages, latency {args.latency}s, rate {args.rate} req/s")
+    print(f"  (rate ceiling: {args.rate * 60:.0f} pages/min)")
+    print(f"{'parallel restaurants':<22}{'seconds':>10}{'pages/min':>12}")
+    workers = 1
+    while workers <= args.restaurants:
+        page_cache.clear()
+        elapsed, pages = run(workers)
+        print(f"{workers:<22}{elapsed:>10.2f}{pages / elapsed * 60:>12.0f}")
+        workers *= 2
+
+    # Second pass over the same pages: answered with 304 and served from the page cache
+    workers //= 2
+    elapsed, pages = run(workers)
+    print(f"{f'{workers}, revalidated':<22}{elapsed:>10.2f}{pages / elapsed * 60:>12.0f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
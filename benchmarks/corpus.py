@@ -0,0 +1,47 @@
+"""
+Helpers to load the bundled review corpus (sql/set_reviews.sql) without a database.
+"""
+
+import os
+import re
+
+SET_REVIEWS_PATH = os.path.join(os.path.dirname(__file__), "..", "sql", "set_reviews.sql")
+
+# One VALUES tuple of sql/set_reviews.sql:
+# (restaurant_id, 'user_name', 'review_text', 'date' | NULL, contributions | NULL, rating)
+_ROW_PATTERN = re.compile(
+    r"\((\d+),'((?:[^']|'')*)','((?:[^']|'')*)',(NULL|'[\d-]+'),(NULL|\d+),(\d)\)"
+)
+
+
+def _unquote(value):
+    if value == "NULL":
+        return None
+    return value.strip("'").replace("''", "'")
+
+
+def load_reviews_corpus(path=SET_REVIEWS_PATH):
+    """
+    Parse the reviews inserted by sql/set_reviews.sql.
+
+    Args:
+        path (str): Path to the SQL file.
+
+    Returns:
+        list: List of review dicts, in the format returned by the scraper,
+              with an additional 'restaurant_id' key.
+    """
+    with open(path, encoding="utf-8") as sql_file:
+        content = sql_file.read()
+
+    reviews = []
+    for restaurant_id, user_name, review_text, date, contributions, rating in _ROW_PATTERN.findall(content):
+        reviews.append({
+            "restaurant_id": int(restaurant_id),
+            "user_name": _unquote(user_name),
+            "review_text": _unquote(review_text),
+            "date": _unquote(date),
+            "contributions": int(contributions) if contributions != "NULL" else None,
+            "rating": int(rating),
+        })
+    return reviews
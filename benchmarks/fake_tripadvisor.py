@@ -0,0 +1,159 @@
+"""
+Local stand-in for the TripAdvisor review pages.
+
+Serves generated restaurant pages with the markup parsed by
+utils.tripAdvisorScraper, with an optional per-request latency and ETag
+revalidation, so the scraping code can be exercised without sending requests
+to TripAdvisor.
+
+Usage:
+    python -m benchmarks.fake_tripadvisor [--port 8765] [--restaurants 10] [--pages 5] [--latency 0.2]
+
+then point the scrapers to it with TRIPADVISOR_URL_BASE=http://127.0.0.1:8765.
+"""
+
+import argparse
+import hashlib
+import re
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REVIEWS_PER_PAGE = 15
+URL_PATTERN = re.compile(r"^/Restaurant_Review-g1-d(\d+)-Reviews-(?:or(\d+)-)?Fake_\d+\.html$")
+WORDS = ("cuisine", "service", "accueil", "plat", "dessert", "prix", "serveur", "ambiance", "terrasse", "vin")
+
+
+def restaurant_url(restaurant_id, offset=0):
+    """
+    URL of a page of reviews of a fake restaurant, relative to the server.
+
+    Args:
+        restaurant_id (int): The ID of the fake restaurant.
+        offset (int): Index of the first review of the page.
+
+    Returns:
+        str: The URL.
+    """
+    page = f"or{offset}-" if offset else ""
+    return f"/Restaurant_Review-g1-d{restaurant_id}-Reviews-{page}Fake_{restaurant_id}.html"
+
+
+def render_review(restaurant_id, index):
+    text = " ".join(WORDS[(restaurant_id + index + i) % len(WORDS)] for i in range(12))
+    rating = index % 5 + 1
+    return (
+        '<div class="_c">'
+        f'<a class="BMQDV _F Gv wSSLS SwZTJ FGwzt ukgoS" href="/Profile/u{index}">user_{restaurant_id}_{index}</a>'
+        f'<span class="b">{index % 50 + 1}</span>'
+        f'<svg class="UctUV d H0"><title>{rating},0 sur 5 bulles</title></svg>'
+        f'<div class="biGQs _P pZUbB KxBGd">{escape(text)}</div>'
+        f'<div class="biGQs _P pZUbB ncFvv osNWb">Rédigé le {index % 28 + 1} janvier 2024</div>'
+        '</div>'
+    )
+
+
+def render_page(restaurant_id, offset, pages):
+    """
+    Render a page of reviews of a fake restaurant.
+
+    Args:
+        restaurant_id (int): The ID of the fake restaurant.
+        offset (int): Index of the first review of the page.
+        pages (int): Number of pages of each restaurant.
+
+    Returns:
+        str: The HTML page.
+    """
+    cards = "".join(render_review(restaurant_id, index) for index in range(offset, offset + REVIEWS_PER_PAGE))
+    next_offset = offset + REVIEWS_PER_PAGE
+    next_link = (
+        f'<a class="BrOJk u j z _F wSSLS tIqAi unMkR" aria-label="Page suivante" '
+        f'href="{restaurant_url(restaurant_id, next_offset)}">Suivant</a>'
+        if next_offset < pages * REVIEWS_PER_PAGE else ""
+    )
+    return (
+        "<html><body>"
+        f'<h1><span class="oMoFy">Fake {restaurant_id}</span></h1>'
+        f"{cards}{next_link}"
+        "</body></html>"
+    )
+
+
+class FakeTripAdvisorServer(ThreadingHTTPServer):
+    """
+    HTTP server of the fake restaurant pages.
+
+    Args:
+        port (int): Port to listen on, 0 for any free port.
+        pages (int): Number of pages of each restaurant.
+        latency (float): Seconds waited before answering each request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, pages=5, latency=0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.pages = pages
+        self.latency = latency
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def url_base(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        """Serve in a background thread and return the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        match = URL_PATTERN.match(self.path)
+        if not match:
+            self.send_error(404)
+            return
+        with self.server._count_lock:
+            self.server.requests_served += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        # Pages never change, so the ETag only depends on the URL
+        etag = f'"{hashlib.sha1(self.path.encode("utf-8")).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = render_page(int(match.group(1)), int(match.group(2) or 0), self.server.pages).encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--restaurants", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = FakeTripAdvisorServer(args.port, args.pages, args.latency)
+    print(f"Serving on {server.url_base}")
+    for restaurant_id in range(1, args.restaurants + 1):
+        print(f"  {server.url_base}{restaurant_url(restaurant_id)}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
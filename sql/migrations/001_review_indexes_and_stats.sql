@@ -0,0 +1,26 @@
+-- Indexes for restaurant-level queries
+CREATE INDEX IF NOT EXISTS idx_reviews_restaurant_id ON reviews (restaurant_id);
+CREATE INDEX IF NOT EXISTS idx_reviews_date ON reviews (date);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_restaurants_restaurant_url ON restaurants (restaurant_url);
+CREATE INDEX IF NOT EXISTS idx_locations_restaurant_id ON locations (restaurant_id);
+
+-- Review summary per restaurant, kept up to date by the save/delete helpers of utils/db.py
+CREATE TABLE IF NOT EXISTS restaurant_review_stats (
+    restaurant_id INTEGER PRIMARY KEY,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    first_comment_date DATE,
+    last_comment_date DATE,
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(restaurant_id) ON DELETE CASCADE
+);
+
+-- Backfill from the existing reviews
+INSERT INTO restaurant_review_stats (restaurant_id, review_count, rating_sum, first_comment_date, last_comment_date)
+SELECT restaurant_id, COUNT(*), SUM(rating), MIN(date), MAX(date)
+FROM reviews
+GROUP BY restaurant_id
+ON CONFLICT (restaurant_id) DO UPDATE SET
+    review_count = EXCLUDED.review_count,
+    rating_sum = EXCLUDED.rating_sum,
+    first_comment_date = EXCLUDED.first_comment_date,
+    last_comment_date = EXCLUDED.last_comment_date;
@@ -0,0 +1,9 @@
+-- Cleaned (tokenized, stemmed or lemmatized) review text, one row per review
+-- and preprocessing configuration. See utils.functions.clean_text_df.
+CREATE TABLE IF NOT EXISTS review_tokens (
+    review_id INTEGER NOT NULL,
+    config_hash VARCHAR(16) NOT NULL,
+    cleaned_text TEXT NOT NULL,
+    PRIMARY KEY (review_id, config_hash),
+    FOREIGN KEY (review_id) REFERENCES reviews(review_id) ON DELETE CASCADE
+);
@@ -0,0 +1,17 @@
+-- Sentiment polarity (TextBlob) and normalized NRC emotion proportions per review.
+-- An emotion is NULL when none of its words appear in the review. See utils/scoring.py.
+CREATE TABLE IF NOT EXISTS review_scores (
+    review_id INTEGER PRIMARY KEY,
+    polarity REAL NOT NULL,
+    anger REAL,
+    anticipation REAL,
+    disgust REAL,
+    fear REAL,
+    joy REAL,
+    negative REAL,
+    positive REAL,
+    sadness REAL,
+    surprise REAL,
+    trust REAL,
+    FOREIGN KEY (review_id) REFERENCES reviews(review_id) ON DELETE CASCADE
+);
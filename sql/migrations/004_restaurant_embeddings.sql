@@ -0,0 +1,9 @@
+-- Word2Vec vector of each restaurant (contribution-weighted mean of its review
+-- vectors), used for nearest-neighbour search. See utils/similarity.py.
+CREATE TABLE IF NOT EXISTS restaurant_embeddings (
+    restaurant_id INTEGER PRIMARY KEY,
+    embedding REAL[] NOT NULL,
+    review_count INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(restaurant_id) ON DELETE CASCADE
+);
@@ -0,0 +1,12 @@
+-- Term counts of the cleaned review text per restaurant, rating bucket
+-- (bad: 1-2, neutral: 3, good: 4-5) and preprocessing configuration.
+-- Used by the wordcloud tab, see utils/term_index.py.
+CREATE TABLE IF NOT EXISTS review_term_counts (
+    restaurant_id INTEGER NOT NULL,
+    config_hash VARCHAR(16) NOT NULL,
+    rating_bucket VARCHAR(8) NOT NULL CHECK (rating_bucket IN ('bad', 'neutral', 'good')),
+    term TEXT NOT NULL,
+    term_count INTEGER NOT NULL,
+    PRIMARY KEY (restaurant_id, config_hash, rating_bucket, term),
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(restaurant_id) ON DELETE CASCADE
+);
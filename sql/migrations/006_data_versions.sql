@@ -0,0 +1,11 @@
+-- Version counters of the data read by the application, bumped by the
+-- save/delete helpers of utils/db.py in the same transaction as the change.
+-- The Streamlit cache (utils/cache.py) keys its entries on these versions.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(32) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO data_versions (name) VALUES ('restaurants'), ('reviews'), ('review_scores')
+ON CONFLICT (name) DO NOTHING;
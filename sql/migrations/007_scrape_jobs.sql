@@ -0,0 +1,28 @@
+-- Queue of the scraping jobs run by the worker process (python -m utils.worker).
+-- 'new' jobs scrape a restaurant from its URL, 'update' jobs replace the
+-- reviews of an existing restaurant. Progress and logs are stored on the job
+-- so the Restaurants page can poll them, and heartbeat_at lets a worker
+-- requeue the jobs of a worker that stopped.
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    job_id SERIAL PRIMARY KEY,
+    job_type VARCHAR(16) NOT NULL CHECK (job_type IN ('new', 'update')),
+    restaurant_url VARCHAR(255) NOT NULL,
+    restaurant_id INTEGER,
+    total_reviews INTEGER,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    logs TEXT[] NOT NULL DEFAULT '{}',
+    reviews_downloaded INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker VARCHAR(64),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(restaurant_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_scrape_jobs_queued
+    ON scrape_jobs (job_id) WHERE status = 'queued';
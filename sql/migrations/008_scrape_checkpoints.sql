@@ -0,0 +1,11 @@
+-- Pagination checkpoint of the review scraping of each restaurant, written in
+-- the same transaction as the reviews of each page (see save_review_page).
+-- next_url is the next page to scrape, NULL once the last page is saved.
+CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+    restaurant_id INTEGER PRIMARY KEY,
+    next_url VARCHAR(255),
+    page INTEGER NOT NULL,
+    reviews_saved INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(restaurant_id) ON DELETE CASCADE
+);
@@ -0,0 +1,9 @@
+-- Incremental refresh of the reviews of a restaurant: 'refresh' jobs only
+-- scrape the pages until the reviews already stored, matched on
+-- (restaurant_id, user_name, date) and the hash of their text.
+ALTER TABLE scrape_jobs DROP CONSTRAINT IF EXISTS scrape_jobs_job_type_check;
+ALTER TABLE scrape_jobs ADD CONSTRAINT scrape_jobs_job_type_check
+    CHECK (job_type IN ('new', 'update', 'refresh'));
+
+CREATE INDEX IF NOT EXISTS idx_reviews_natural_key
+    ON reviews (restaurant_id, user_name, date);
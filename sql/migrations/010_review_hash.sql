@@ -0,0 +1,36 @@
+-- Content hash of each review, so the same review cannot be stored twice:
+-- md5 of restaurant_id, user_name, date and review_text separated by a unit
+-- separator (see review_hash in utils/db.py, which computes the same value).
+-- On large existing tables, run `python -m utils.dedup` before this migration:
+-- it does the same steps in batches and reports the removed rows.
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS review_hash CHAR(32);
+
+UPDATE reviews SET review_hash = md5(concat_ws(E'\x1f',
+    restaurant_id::TEXT,
+    COALESCE(user_name, ''),
+    COALESCE(to_char(date, 'YYYY-MM-DD'), ''),
+    COALESCE(review_text, '')
+))
+WHERE review_hash IS NULL;
+
+-- Keep the oldest copy of each review; tokens and scores of the removed copies
+-- are deleted by ON DELETE CASCADE
+DELETE FROM reviews r
+USING reviews kept
+WHERE kept.restaurant_id = r.restaurant_id
+    AND kept.review_hash = r.review_hash
+    AND kept.review_id < r.review_id;
+
+-- Summary rebuilt after the removal of the duplicates
+INSERT INTO restaurant_review_stats (restaurant_id, review_count, rating_sum, first_comment_date, last_comment_date)
+SELECT restaurant_id, COUNT(*), SUM(rating), MIN(date), MAX(date)
+FROM reviews
+GROUP BY restaurant_id
+ON CONFLICT (restaurant_id) DO UPDATE SET
+    review_count = EXCLUDED.review_count,
+    rating_sum = EXCLUDED.rating_sum,
+    first_comment_date = EXCLUDED.first_comment_date,
+    last_comment_date = EXCLUDED.last_comment_date;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_review_hash
+    ON reviews (restaurant_id, review_hash);
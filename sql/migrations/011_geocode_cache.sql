@@ -0,0 +1,11 @@
+-- Results of the geocoding backends (see utils/geocoding.py), keyed by backend
+-- and normalized address. result is NULL when the backend found no match.
+-- Entries older than GEOCODE_CACHE_TTL are ignored and refreshed on use.
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    backend VARCHAR(32) NOT NULL,
+    address_key TEXT NOT NULL,
+    address TEXT NOT NULL,
+    result JSONB,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (backend, address_key)
+);
@@ -0,0 +1,7 @@
+-- Version of the Word2Vec model (utils/embeddings.py), bumped each time the
+-- model is saved. Restaurant vectors record the version they were computed
+-- with, so the worker recomputes the outdated ones after a model update.
+INSERT INTO data_versions (name) VALUES ('word2vec')
+ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE restaurant_embeddings ADD COLUMN IF NOT EXISTS model_version BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,17 @@
+-- At most one queued or running job per restaurant, so two pages enqueuing the
+-- same restaurant at once cannot both insert a job (utils/db.py
+-- enqueue_scrape_job). Duplicates left by earlier versions are marked as
+-- failed, the oldest job of each restaurant is kept.
+UPDATE scrape_jobs j
+SET status = 'failed', message = 'Tâche en double', finished_at = NOW()
+WHERE status IN ('queued', 'running')
+  AND EXISTS (
+      SELECT 1 FROM scrape_jobs o
+      WHERE o.restaurant_url = j.restaurant_url
+        AND o.status IN ('queued', 'running')
+        AND o.job_id < j.job_id
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_scrape_jobs_active_url
+ON scrape_jobs (restaurant_url)
+WHERE status IN ('queued', 'running');
@@ -0,0 +1,3 @@
+-- A failed job is queued again after a backoff delay (utils/worker.py): it
+-- cannot be claimed before not_before.
+ALTER TABLE scrape_jobs ADD COLUMN IF NOT EXISTS not_before TIMESTAMP;
@@ -0,0 +1,43 @@
+"""
+Shared fixtures: a local stand-in for the TripAdvisor review pages
+(benchmarks.fake_tripadvisor) that the scrapers are pointed to, so no request
+is sent to TripAdvisor.
+"""
+
+import pytest
+
+from benchmarks.fake_tripadvisor import FakeTripAdvisorServer, REVIEWS_PER_PAGE, render_page
+
+# Pages of reviews of each fake restaurant
+PAGES = 5
+
+
+@pytest.fixture
+def fake_tripadvisor(monkeypatch):
+    """Fake TripAdvisor server with PAGES pages per restaurant, scraped without rate limit."""
+    import utils.tripAdvisorScraper
+    from utils.http_client import page_cache
+    from utils.rate_limit import set_rate_limit
+
+    server = FakeTripAdvisorServer(pages=PAGES).start()
+    monkeypatch.setattr(utils.tripAdvisorScraper, "TRIPADVISOR_URL_BASE", server.url_base)
+    set_rate_limit(server.url_base, 1000)
+    page_cache.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_reviews():
+    """Parse the reviews of a fake restaurant, page by page, as the scraper does."""
+    from benchmarks.bench_card_parsing import parse_current
+    from utils.tripAdvisorScraper import TripAdvisorSpecificRestaurantScraper
+
+    def parse(restaurant_id, pages=range(PAGES)):
+        scraper = TripAdvisorSpecificRestaurantScraper()
+        return [
+            parse_current([render_page(restaurant_id, page * REVIEWS_PER_PAGE, PAGES).encode("utf-8")], scraper)
+            for page in pages
+        ]
+    return parse
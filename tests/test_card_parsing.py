@@ -0,0 +1,40 @@
+"""
+The one-pass review card parser must return the same reviews as the previous
+parser (see benchmarks.bench_card_parsing).
+"""
+
+from benchmarks.bench_card_parsing import parse_current, parse_previous
+from benchmarks.fake_tripadvisor import REVIEWS_PER_PAGE, render_page
+from utils.tripAdvisorScraper import TripAdvisorSpecificRestaurantScraper
+
+
+def test_one_pass_parser_matches_previous_parser():
+    pages = [
+        render_page(restaurant_id, page * REVIEWS_PER_PAGE, 3).encode("utf-8")
+        for restaurant_id in range(1, 5) for page in range(3)
+    ]
+
+    current = parse_current(pages, TripAdvisorSpecificRestaurantScraper())
+
+    assert len(current) == len(pages) * REVIEWS_PER_PAGE
+    assert current == parse_previous(pages)
+
+
+def test_next_page_url(fake_tripadvisor):
+    from benchmarks.fake_tripadvisor import restaurant_url
+
+    scraper = TripAdvisorSpecificRestaurantScraper()
+    pages = list(scraper.iter_review_pages(restaurant_url(1)))
+
+    assert [page for page, _, _ in pages] == list(range(1, fake_tripadvisor.pages + 1))
+    assert [next_url for _, _, next_url in pages] == [
+        restaurant_url(1, offset) for offset in range(REVIEWS_PER_PAGE, fake_tripadvisor.pages * REVIEWS_PER_PAGE, REVIEWS_PER_PAGE)
+    ] + [None]
+
+
+def test_scraped_pages_match_parsed_pages(fake_tripadvisor, fake_reviews):
+    from benchmarks.fake_tripadvisor import restaurant_url
+
+    scraper = TripAdvisorSpecificRestaurantScraper()
+
+    assert [reviews for _, reviews, _ in scraper.iter_review_pages(restaurant_url(3))] == fake_reviews(3)
@@ -0,0 +1,55 @@
+"""
+Tests of the saving of the Word2Vec vectors of utils.embeddings.
+"""
+
+import os
+
+import pytest
+
+import utils.embeddings as embeddings
+
+CORPUS = [["cuisine", "service", "accueil"], ["service", "prix", "dessert"]] * 5
+
+
+@pytest.fixture
+def models_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(embeddings, "MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(embeddings, "WORD2VEC_PATH", str(tmp_path / "word2vec.model"))
+    monkeypatch.setattr(embeddings, "KEYED_VECTORS_POINTER", str(tmp_path / "word2vec.kv.current"))
+    monkeypatch.setattr(embeddings, "_bump_model_version", lambda: None)
+    monkeypatch.setattr(embeddings, "_keyed_vectors", None)
+    return tmp_path
+
+
+def test_update_switches_to_new_files(models_dir):
+    first = embeddings.train_word2vec(CORPUS)
+    first_name = embeddings._current_keyed_vectors_name()
+
+    updated = embeddings.update_word2vec([["terrasse", "service"]] * 3)
+
+    assert embeddings._current_keyed_vectors_name() != first_name
+    assert "terrasse" in updated.key_to_index and "terrasse" not in first.key_to_index
+    assert updated.vectors.shape[0] == len(updated.key_to_index)
+    # The files loaded by readers of the previous save are left untouched
+    assert os.path.exists(models_dir / first_name)
+    assert os.path.exists(models_dir / (first_name + ".vectors.npy"))
+
+
+def test_only_current_and_previous_saves_are_kept(models_dir):
+    embeddings.train_word2vec(CORPUS)
+    for i in range(3):
+        embeddings.update_word2vec([[f"plat{i}", "service"]] * 3)
+
+    saves = {name.split(".vectors.npy")[0] for name in os.listdir(models_dir) if name.startswith("word2vec-")}
+    assert len(saves) == 2
+    assert embeddings._current_keyed_vectors_name() in saves
+
+
+def test_vectors_saved_before_versioning_are_exported_again(models_dir):
+    embeddings.train_word2vec(CORPUS)
+    os.remove(embeddings.KEYED_VECTORS_POINTER)
+    embeddings._keyed_vectors = None
+
+    keyed_vectors = embeddings.build_word2vec_from_database()
+
+    assert "cuisine" in keyed_vectors.key_to_index
@@ -0,0 +1,37 @@
+"""
+Tests of the vectorized NRC emotion scorer of utils.emotions.
+"""
+
+import numpy as np
+
+from benchmarks.bench_emotions import distributions
+from utils.emotions import EMOTIONS, NRCEmotionScorer
+
+
+def test_duplicate_entries_are_merged_whatever_their_order():
+    lexicon = {"Joie": ["joy"], "joie": ["trust", "anticip"], "attente": ["anticipation", "anticip"]}
+    reversed_lexicon = dict(reversed(list(lexicon.items())))
+
+    scores = NRCEmotionScorer(lexicon).raw_scores([["joie", "attente"]])
+
+    assert np.array_equal(scores, NRCEmotionScorer(reversed_lexicon).raw_scores([["joie", "attente"]]))
+    assert dict(zip(EMOTIONS, scores[0])) == dict.fromkeys(EMOTIONS, 0) | {"joy": 1, "trust": 1, "anticipation": 2}
+
+
+def test_scores_are_shares_of_emotion_words():
+    scorer = NRCEmotionScorer({"joie": ["joy", "positive"], "peur": ["fear", "negative"]})
+
+    scores = scorer.score([["joie", "joie", "peur", "table"], ["table"]])
+
+    assert scores.loc[0, "joy"] == scores.loc[0, "positive"] == 2 / 6
+    assert scores.loc[0, "fear"] == 1 / 6
+    assert np.isnan(scores.loc[0, "sadness"])
+    assert scores.loc[1].isna().all()
+
+
+def test_benchmark_merges_emotion_aliases():
+    shares = [{"anticip": 0.5, "anticipation": 0.0, "joy": 0.5}]
+    reversed_shares = [dict(reversed(list(shares[0].items())))]
+
+    assert distributions(shares).equals(distributions(reversed_shares))
+    assert distributions(shares).loc[0, "anticipation"] == 0.5
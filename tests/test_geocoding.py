@@ -0,0 +1,87 @@
+"""
+Tests of utils.geocoding with the offline backend, the geocode_cache table
+being replaced by a dictionary.
+"""
+
+import json
+
+import pytest
+import requests
+
+import utils.geocoding as geocoding
+
+
+@pytest.fixture
+def geocode_cache(monkeypatch):
+    cache = {}
+
+    def get_geocode_cache(backend, keys, ttl):
+        return {key: cache[backend, key] for key in keys if (backend, key) in cache}
+
+    def save_geocode_cache(backend, entries):
+        for key, _, result in entries:
+            cache[backend, key] = result
+
+    monkeypatch.setattr(geocoding, "get_geocode_cache", get_geocode_cache)
+    monkeypatch.setattr(geocoding, "save_geocode_cache", save_geocode_cache)
+    return cache
+
+
+def test_offline_backend_parses_postcode_and_city():
+    result = geocoding.OfflineGeocoder().geocode("12 Rue Mercière, 69002 Lyon France")
+
+    assert result == {
+        "address": "12 Rue Mercière, 69002 Lyon France",
+        "latitude": None,
+        "longitude": None,
+        "zip_code": "69002",
+        "country": "France",
+        "ville": "Lyon",
+    }
+
+
+def test_offline_backend_reads_known_addresses(tmp_path):
+    path = tmp_path / "addresses.json"
+    path.write_text(json.dumps({"12 rue Mercière, 69002 Lyon France": {"latitude": 45.76, "longitude": 4.83}}), encoding="utf-8")
+
+    result = geocoding.OfflineGeocoder(str(path)).geocode("12  Rue Mercière ,69002 Lyon France")
+
+    assert (result["latitude"], result["longitude"]) == (45.76, 4.83)
+
+
+def test_batch_geocodes_each_address_once(geocode_cache):
+    calls = []
+
+    class Geocoder(geocoding.OfflineGeocoder):
+        name = "test"
+
+        def geocode(self, address):
+            calls.append(address)
+            return super().geocode(address)
+
+    addresses = ["1 Rue A, 69001 Lyon France", "1 rue a, 69001 LYON France", "2 Rue B, 75002 Paris France"]
+    results = geocoding.geocode_batch(addresses, Geocoder())
+
+    assert len(calls) == 2
+    assert results[addresses[0]] == results[addresses[1]]
+    assert results[addresses[2]]["zip_code"] == "75002"
+
+    # Second run: answered from the cache
+    geocoding.geocode_batch(addresses, Geocoder())
+    assert len(calls) == 2
+
+
+def test_failed_requests_are_not_cached(geocode_cache):
+    class Geocoder:
+        name = "failing"
+
+        def geocode(self, address):
+            raise requests.ConnectionError("offline")
+
+    assert geocoding.geocode_batch(["1 Rue A, 69001 Lyon"], Geocoder()) == {"1 Rue A, 69001 Lyon": None}
+    assert geocode_cache == {}
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        geocoding.get_geocoder("nominatim")
@@ -0,0 +1,138 @@
+"""
+Tests of the retries and of the page cache of utils.http_client.fetch_page,
+with a stub session or the fake TripAdvisor server.
+"""
+
+import pytest
+import requests
+
+import utils.http_client as http_client
+
+
+class _Response:
+
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class _Session:
+    """Answers with the given responses in order; exceptions are raised."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.requests = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class _Limiter:
+
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_client.time, "sleep", sleeps.append)
+    monkeypatch.setattr(http_client, "RETRIES", 3)
+    monkeypatch.setattr(http_client, "RETRY_BACKOFF", 1)
+    return sleeps
+
+
+def test_retries_take_a_token_each(sleeps):
+    session = _Session(requests.ConnectionError(), _Response(503), _Response(200, b"page"))
+    limiter = _Limiter()
+
+    page = http_client.fetch_page("http://example.test/", bytes.decode, session=session, cache=None, rate_limiter=limiter)
+
+    assert page == "page"
+    assert session.requests == limiter.acquired == 3
+    assert sleeps == [1, 2]
+
+
+def test_retry_after_header_is_honoured(sleeps):
+    session = _Session(_Response(429, headers={"Retry-After": "7"}), _Response(200, b"page"))
+
+    http_client.fetch_page("http://example.test/", bytes.decode, session=session, cache=None)
+
+    assert sleeps == [7]
+
+
+def test_last_error_is_raised_after_all_retries(sleeps):
+    session = _Session(*[_Response(500)] * 4)
+    limiter = _Limiter()
+
+    with pytest.raises(requests.HTTPError):
+        http_client.fetch_page("http://example.test/", bytes.decode, session=session, cache=None, rate_limiter=limiter)
+    assert session.requests == limiter.acquired == 4
+
+
+def test_client_errors_are_not_retried(sleeps):
+    session = _Session(_Response(404))
+
+    with pytest.raises(requests.HTTPError):
+        http_client.fetch_page("http://example.test/", bytes.decode, session=session, cache=None)
+    assert session.requests == 1 and sleeps == []
+
+
+def test_unchanged_page_is_revalidated_and_parsed_again(fake_tripadvisor):
+    from benchmarks.fake_tripadvisor import restaurant_url
+
+    url = fake_tripadvisor.url_base + restaurant_url(1)
+    cache = http_client.PageCache()
+    parsed = []
+
+    def parse(content):
+        parsed.append(content)
+        return [content]
+
+    first = http_client.fetch_page(url, parse, cache=cache)
+    second = http_client.fetch_page(url, parse, cache=cache)
+
+    # The 304 answer reuses the cached content, each caller gets its own page
+    assert first == second and first is not second
+    assert len(parsed) == 2
+    assert cache.get(url)["content"] == parsed[0]
+    assert fake_tripadvisor.requests_served == 2
+
+
+def test_cached_page_is_parsed_by_each_scraper(fake_tripadvisor):
+    from benchmarks.fake_tripadvisor import restaurant_url
+    from utils.tripAdvisorScraper import REVIEW_PAGE_STRAINER, TripAdvisorSpecificRestaurantScraper
+
+    scrapers = [TripAdvisorSpecificRestaurantScraper() for _ in range(2)]
+    scrapers[0].fetch_page(restaurant_url(1))
+    scrapers[1].fetch_page(restaurant_url(1), REVIEW_PAGE_STRAINER)
+
+    full, strained = (scraper.get_soup() for scraper in scrapers)
+    assert full is not strained
+    assert full.find("h1") is not None and strained.find("h1") is None
+    assert len(full.find_all("div", class_="_c")) == len(strained.find_all("div", class_="_c"))
+    assert fake_tripadvisor.requests_served == 2
+
+
+def test_cache_keeps_the_most_recent_pages():
+    cache = http_client.PageCache(max_size=2)
+    for url in ("a", "b", "c"):
+        cache.put(url, f"etag-{url}", None, url.encode())
+
+    assert cache.get("a") is None
+    assert cache.get("c")["content"] == b"c"
+    # Pages without validators cannot be revalidated
+    cache.put("d", None, None, b"d")
+    assert cache.get("d") is None
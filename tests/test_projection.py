@@ -0,0 +1,75 @@
+"""
+Tests of the refresh decisions of utils.projection.refresh_projection, with
+the database and the fitting replaced by recorders.
+"""
+
+import numpy as np
+import pytest
+
+import utils.projection as projection
+
+MODEL_VERSION = 4
+
+
+@pytest.fixture
+def refresh(monkeypatch):
+    state = {"outdated": [], "projection": None, "fittable": True, "fits": 0, "computed": []}
+
+    def compute_restaurant_embeddings(ids):
+        state["computed"].append(list(ids))
+        # Restaurants whose reviews give no vector are not stored
+        ids = [id for id in ids if id != 99]
+        return np.array(ids), np.zeros((len(ids), 2))
+
+    def fit_projection(batch_size, model_version):
+        state["fits"] += 1
+        if not state["fittable"]:
+            return None
+        state["projection"] = projection.Projection(np.zeros(2), np.eye(2), model_version)
+        return state["projection"]
+
+    monkeypatch.setattr(projection, "get_model_version", lambda: MODEL_VERSION)
+    monkeypatch.setattr(projection, "get_outdated_restaurant_embeddings", lambda version: state["outdated"])
+    monkeypatch.setattr(projection, "compute_restaurant_embeddings", compute_restaurant_embeddings)
+    monkeypatch.setattr(projection, "get_projection", lambda: state["projection"])
+    monkeypatch.setattr(projection, "fit_projection", fit_projection)
+    monkeypatch.setattr(projection, "_unfitted_model_version", None)
+    return state
+
+
+def test_outdated_vectors_are_recomputed_then_projection_refitted(refresh):
+    refresh["outdated"] = list(range(1, 121))
+
+    assert projection.refresh_projection() is True
+    assert [len(batch) for batch in refresh["computed"]] == [50, 50, 20]
+    assert refresh["fits"] == 1
+
+
+def test_idle_refresh_does_nothing(refresh):
+    refresh["projection"] = projection.Projection(np.zeros(2), np.eye(2), MODEL_VERSION)
+
+    assert projection.refresh_projection() is False
+    assert refresh["fits"] == 0
+
+
+def test_vectors_that_cannot_be_computed_do_not_trigger_refits(refresh):
+    refresh["projection"] = projection.Projection(np.zeros(2), np.eye(2), MODEL_VERSION)
+    refresh["outdated"] = [99]
+
+    assert projection.refresh_projection() is False
+    assert refresh["fits"] == 0
+
+
+def test_stale_projection_is_refitted(refresh):
+    refresh["projection"] = projection.Projection(np.zeros(2), np.eye(2), MODEL_VERSION - 1)
+
+    assert projection.refresh_projection() is True
+    assert refresh["projection"].model_version == MODEL_VERSION
+
+
+def test_corpus_too_small_is_not_refitted_in_a_loop(refresh):
+    refresh["fittable"] = False
+
+    assert projection.refresh_projection() is True
+    assert projection.refresh_projection() is False
+    assert refresh["fits"] == 1
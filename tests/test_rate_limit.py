@@ -0,0 +1,59 @@
+"""
+Tests of the token buckets of utils.rate_limit.
+"""
+
+import threading
+import time
+
+import pytest
+
+from utils.rate_limit import TokenBucket, get_rate_limiter, set_rate_limit
+
+
+def test_burst_is_served_without_waiting():
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() == pytest.approx(1, abs=0.05)
+
+
+def test_acquire_paces_requests_at_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    # The first token is available at once, the next five arrive every 50 ms
+    assert 0.24 <= elapsed < 0.5
+
+
+def test_threads_share_the_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    def acquire():
+        for _ in range(3):
+            bucket.acquire()
+
+    threads = [threading.Thread(target=acquire) for _ in range(3)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 9 requests in all: 8 waits of 50 ms whatever the number of threads
+    assert time.monotonic() - start >= 0.38
+
+
+def test_limiters_are_shared_per_host():
+    limiter = set_rate_limit("http://example.test/a", 5)
+
+    assert get_rate_limiter("http://example.test/b?page=2") is limiter
+    assert get_rate_limiter("http://other.test/a") is not limiter
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
@@ -0,0 +1,125 @@
+"""
+The review hash computed in Python must equal the review_hash column computed
+in PostgreSQL by REVIEW_HASH_SQL (sql/migrations/010_review_hash.sql), or the
+unique index would not catch duplicates between old and new reviews.
+"""
+
+import datetime
+import os
+
+import pytest
+
+from utils.db import REVIEW_HASH_SQL, get_cursor, hash_reviews, review_hash, save_review_changes
+
+REVIEWS = [
+    (1, "user_1_0", "2024-01-01", "cuisine service accueil"),
+    (12, "Élodie M", "2023-12-31", "Très bon accueil, un peu cher… 😀"),
+    (3, None, None, "avis sans auteur ni date"),
+    (4, "user", "2024-02-29", None),
+    (5, "", None, ""),
+]
+
+
+def test_date_objects_and_strings_hash_alike():
+    assert review_hash(1, "a", datetime.date(2024, 1, 2), "b") == review_hash(1, "a", "2024-01-02", "b")
+
+
+def test_missing_fields_hash_as_empty():
+    assert review_hash(1, None, None, None) == review_hash(1, "", "", "")
+    assert review_hash(1, "a", None, "b") != review_hash(2, "a", None, "b")
+
+
+needs_database = pytest.mark.skipif(
+    not os.environ.get("POSTGRES_HOST"), reason="needs a PostgreSQL database (POSTGRES_HOST)"
+)
+
+
+@needs_database
+@pytest.mark.parametrize("restaurant_id, user_name, date, review_text", REVIEWS)
+def test_python_hash_matches_sql(restaurant_id, user_name, date, review_text):
+    with get_cursor(cursor_factory=None) as cursor:
+        cursor.execute(
+            f"""
+            SELECT {REVIEW_HASH_SQL}
+            FROM (VALUES (%s::INT, %s::TEXT, %s::DATE, %s::TEXT))
+                AS reviews (restaurant_id, user_name, date, review_text)
+            """,
+            (restaurant_id, user_name, date, review_text)
+        )
+        (sql_hash,) = cursor.fetchone()
+
+    assert review_hash(restaurant_id, user_name, date, review_text) == sql_hash
+
+
+@pytest.fixture
+def restaurant_id():
+    """A restaurant without reviews, deleted with its reviews afterwards."""
+    with get_cursor(cursor_factory=None) as cursor:
+        cursor.execute("INSERT INTO restaurants (restaurant_name) VALUES ('Test review hash') RETURNING restaurant_id")
+        (restaurant_id,) = cursor.fetchone()
+        cursor.execute("INSERT INTO restaurant_review_stats (restaurant_id) VALUES (%s)", (restaurant_id,))
+    yield restaurant_id
+    with get_cursor(cursor_factory=None) as cursor:
+        cursor.execute("DELETE FROM reviews WHERE restaurant_id = %s", (restaurant_id,))
+        cursor.execute("DELETE FROM restaurant_review_stats WHERE restaurant_id = %s", (restaurant_id,))
+        cursor.execute("DELETE FROM restaurants WHERE restaurant_id = %s", (restaurant_id,))
+
+
+def _insert_review(restaurant_id, user_name, date, review_text, rating, hashed=True):
+    with get_cursor(cursor_factory=None) as cursor:
+        cursor.execute(
+            """
+            INSERT INTO reviews (restaurant_id, user_name, date, review_text, rating, review_hash)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING review_id
+            """,
+            (
+                restaurant_id, user_name, date, review_text, rating,
+                review_hash(restaurant_id, user_name, date, review_text) if hashed else None
+            )
+        )
+        review_id = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            UPDATE restaurant_review_stats SET review_count = review_count + 1, rating_sum = rating_sum + %s
+            WHERE restaurant_id = %s
+            """,
+            (rating, restaurant_id)
+        )
+    return review_id
+
+
+@needs_database
+def test_hash_reviews_pages_by_review_id(restaurant_id):
+    review_ids = [
+        _insert_review(restaurant_id, f"user_{i}", "2024-01-01", f"avis {i}", 4, hashed=i != 1)
+        for i in range(3)
+    ]
+    after_review_id = review_ids[0] - 1
+
+    assert hash_reviews(2, after_review_id) == (1, review_ids[1])
+    assert hash_reviews(2, review_ids[1]) == (0, review_ids[2])
+    assert hash_reviews(2, review_ids[2]) == (0, None)
+    with get_cursor(cursor_factory=None) as cursor:
+        cursor.execute("SELECT review_hash FROM reviews WHERE review_id = %s", (review_ids[1],))
+        assert cursor.fetchone()[0] == review_hash(restaurant_id, "user_1", "2024-01-01", "avis 1")
+
+
+@needs_database
+def test_edited_review_replaces_its_stored_copy(restaurant_id):
+    edited_id = _insert_review(restaurant_id, "Élodie M", "2024-01-01", "texte d'origine", 3)
+    # A copy of the review with its new text was stored by an earlier scrape
+    _insert_review(restaurant_id, "Élodie M", "2024-01-01", "texte modifié", 5)
+    review = {"user_name": "Élodie M", "date": "2024-01-01", "review_text": "texte modifié",
+              "contributions": 2, "rating": 5}
+
+    assert save_review_changes(restaurant_id, [], [(edited_id, 3, review)]) == []
+
+    with get_cursor(cursor_factory=None) as cursor:
+        cursor.execute("SELECT review_id, review_text FROM reviews WHERE restaurant_id = %s", (restaurant_id,))
+        assert cursor.fetchall() == [(edited_id, "texte modifié")]
+        cursor.execute(
+            "SELECT review_count, rating_sum FROM restaurant_review_stats WHERE restaurant_id = %s",
+            (restaurant_id,)
+        )
+        assert cursor.fetchone() == (1, 5)
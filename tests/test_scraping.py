@@ -0,0 +1,183 @@
+"""
+Tests of utils.scraping against the fake TripAdvisor server, with the database
+and the derived-data updates replaced by recorders.
+"""
+
+import time
+
+import pytest
+
+from benchmarks.fake_tripadvisor import REVIEWS_PER_PAGE, restaurant_url
+import utils.scraping as scraping
+from utils.db import review_text_hash
+from utils.rate_limit import set_rate_limit
+
+RESTAURANT_ID = 1
+PAGES = 5
+
+
+@pytest.fixture
+def derived_updates(monkeypatch):
+    """Record the updates of the embeddings, similarity index and term counts."""
+    calls = []
+    monkeypatch.setattr(scraping, "update_embeddings_with_reviews", lambda texts: calls.append(("embeddings", list(texts))))
+    monkeypatch.setattr(scraping, "refresh_restaurant_embedding", lambda id: calls.append(("similarity", id)))
+    monkeypatch.setattr(scraping, "index_restaurant_terms", lambda id: calls.append(("terms", id)))
+    return calls
+
+
+def test_scrape_restaurants_runs_restaurants_in_parallel(fake_tripadvisor):
+    fake_tripadvisor.latency = 0.05
+    restaurants = [(restaurant_url(restaurant_id), 0) for restaurant_id in range(1, 5)]
+
+    start = time.monotonic()
+    results = scraping.scrape_restaurants(restaurants, max_workers=4, url_base=fake_tripadvisor.url_base)
+    elapsed = time.monotonic() - start
+
+    assert {url: len(reviews) for url, reviews in results.items()} == {
+        url: PAGES * REVIEWS_PER_PAGE for url, _ in restaurants
+    }
+    # One restaurant after the other takes at least 4 * PAGES * 50 ms
+    assert elapsed < 4 * PAGES * fake_tripadvisor.latency
+
+
+def test_scrape_restaurants_share_the_host_rate(fake_tripadvisor):
+    set_rate_limit(fake_tripadvisor.url_base, 40)
+    restaurants = [(restaurant_url(restaurant_id), 0) for restaurant_id in range(1, 5)]
+
+    start = time.monotonic()
+    scraping.scrape_restaurants(restaurants, max_workers=4, url_base=fake_tripadvisor.url_base)
+    elapsed = time.monotonic() - start
+
+    # 4 * PAGES requests at 40 per second, the first one without waiting
+    assert elapsed >= (4 * PAGES - 1) / 40 - 0.05
+    assert fake_tripadvisor.requests_served == 4 * PAGES
+
+
+def test_failed_restaurant_does_not_stop_the_others(fake_tripadvisor, monkeypatch):
+    monkeypatch.setattr(scraping, "scrape_restaurant_reviews", _fail_on_restaurant_2(scraping.scrape_restaurant_reviews))
+    restaurants = [(restaurant_url(restaurant_id), 0) for restaurant_id in range(1, 4)]
+
+    results = scraping.scrape_restaurants(restaurants, url_base=fake_tripadvisor.url_base)
+
+    assert isinstance(results[restaurant_url(2)], RuntimeError)
+    assert len(results[restaurant_url(1)]) == len(results[restaurant_url(3)]) == PAGES * REVIEWS_PER_PAGE
+
+
+def _fail_on_restaurant_2(scrape_restaurant_reviews):
+    def scrape(scraper, url, total_reviews_expected, progress=None):
+        if url == restaurant_url(2):
+            raise RuntimeError("page introuvable")
+        return scrape_restaurant_reviews(scraper, url, total_reviews_expected, progress)
+    return scrape
+
+
+def _record_review_pages(monkeypatch):
+    saved = []
+
+    def save_review_page(restaurant_id, reviews, next_url, page):
+        saved.append((page, next_url, reviews))
+        return [review["review_text"] for review in reviews]
+
+    monkeypatch.setattr(scraping, "save_review_page", save_review_page)
+    return saved
+
+
+def test_download_resumes_from_checkpoint(monkeypatch, fake_tripadvisor, fake_reviews, derived_updates):
+    # The first two pages were saved before the previous attempt stopped
+    checkpoint = {"next_url": restaurant_url(RESTAURANT_ID, 2 * REVIEWS_PER_PAGE), "page": 2, "reviews_saved": 2 * REVIEWS_PER_PAGE}
+    monkeypatch.setattr(scraping, "get_scrape_checkpoint", lambda id: checkpoint)
+    saved = _record_review_pages(monkeypatch)
+
+    reviews_saved = scraping.download_restaurant_reviews(
+        RESTAURANT_ID, restaurant_url(RESTAURANT_ID), PAGES * REVIEWS_PER_PAGE, resume=True
+    )
+
+    assert reviews_saved == PAGES * REVIEWS_PER_PAGE
+    assert fake_tripadvisor.requests_served == PAGES - 2
+    assert [page for page, _, _ in saved] == [3, 4, 5]
+    assert [reviews for _, _, reviews in saved] == fake_reviews(RESTAURANT_ID)[2:]
+    # The last page has no next page: the checkpoint records the end of the scrape
+    assert saved[-1][1] is None
+    new_texts = [review["review_text"] for page in fake_reviews(RESTAURANT_ID)[2:] for review in page]
+    assert ("embeddings", new_texts) in derived_updates
+
+
+def test_download_after_last_page_saved_fetches_nothing(monkeypatch, fake_tripadvisor, derived_updates):
+    checkpoint = {"next_url": None, "page": PAGES, "reviews_saved": PAGES * REVIEWS_PER_PAGE}
+    monkeypatch.setattr(scraping, "get_scrape_checkpoint", lambda id: checkpoint)
+    saved = _record_review_pages(monkeypatch)
+
+    assert scraping.download_restaurant_reviews(RESTAURANT_ID, restaurant_url(RESTAURANT_ID), 0, resume=True) == PAGES * REVIEWS_PER_PAGE
+    assert fake_tripadvisor.requests_served == 0
+    assert saved == []
+
+
+def test_download_without_resume_ignores_checkpoint(monkeypatch, fake_tripadvisor, derived_updates):
+    monkeypatch.setattr(scraping, "get_scrape_checkpoint", lambda id: pytest.fail("checkpoint read"))
+    saved = _record_review_pages(monkeypatch)
+
+    assert scraping.download_restaurant_reviews(RESTAURANT_ID, restaurant_url(RESTAURANT_ID), 0) == PAGES * REVIEWS_PER_PAGE
+    assert fake_tripadvisor.requests_served == PAGES
+    assert [page for page, _, _ in saved] == list(range(1, PAGES + 1))
+
+
+def _stored_keys(pages):
+    return {
+        (review["user_name"], review["date"]): (index, review["rating"], review_text_hash(review["review_text"]))
+        for index, review in enumerate(review for page in pages for review in page)
+    }
+
+
+def _record_review_changes(monkeypatch):
+    saved = []
+
+    def save_review_changes(restaurant_id, new_reviews, changed_reviews):
+        saved.append((new_reviews, changed_reviews))
+        return [review["review_text"] for review in new_reviews]
+
+    monkeypatch.setattr(scraping, "save_review_changes", save_review_changes)
+    return saved
+
+
+def test_refresh_stops_after_first_page_without_new_reviews(monkeypatch, fake_tripadvisor, fake_reviews, derived_updates):
+    # Only the first page holds reviews that are not stored yet
+    pages = fake_reviews(RESTAURANT_ID)
+    monkeypatch.setattr(scraping, "get_review_keys", lambda id: _stored_keys(pages[1:]))
+    saved = _record_review_changes(monkeypatch)
+
+    inserted, updated = scraping.refresh_restaurant_reviews(
+        RESTAURANT_ID, restaurant_url(RESTAURANT_ID), PAGES * REVIEWS_PER_PAGE
+    )
+
+    assert (inserted, updated) == (REVIEWS_PER_PAGE, 0)
+    assert fake_tripadvisor.requests_served == 2
+    assert len(saved) == 1 and saved[0][0] == pages[0]
+    assert ("similarity", RESTAURANT_ID) in derived_updates
+
+
+def test_refresh_without_new_reviews_reads_one_page(monkeypatch, fake_tripadvisor, fake_reviews, derived_updates):
+    monkeypatch.setattr(scraping, "get_review_keys", lambda id: _stored_keys(fake_reviews(RESTAURANT_ID)))
+    saved = _record_review_changes(monkeypatch)
+
+    assert scraping.refresh_restaurant_reviews(RESTAURANT_ID, restaurant_url(RESTAURANT_ID), 0) == (0, 0)
+    assert fake_tripadvisor.requests_served == 1
+    assert saved == []
+    assert derived_updates == []
+
+
+def test_refresh_updates_changed_reviews(monkeypatch, fake_tripadvisor, fake_reviews, derived_updates):
+    pages = fake_reviews(RESTAURANT_ID)
+    stored = _stored_keys(pages[1:])
+    # A review of the second page was edited on TripAdvisor since it was stored
+    edited = pages[1][0]
+    review_id, rating, _ = stored[(edited["user_name"], edited["date"])]
+    stored[(edited["user_name"], edited["date"])] = (review_id, rating, review_text_hash("texte d'origine"))
+    monkeypatch.setattr(scraping, "get_review_keys", lambda id: stored)
+    saved = _record_review_changes(monkeypatch)
+
+    inserted, updated = scraping.refresh_restaurant_reviews(RESTAURANT_ID, restaurant_url(RESTAURANT_ID), 0)
+
+    assert (inserted, updated) == (REVIEWS_PER_PAGE, 1)
+    assert [review for _, _, review in saved[1][1]] == [edited]
+    assert fake_tripadvisor.requests_served == 2
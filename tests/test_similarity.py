@@ -0,0 +1,53 @@
+"""
+Tests of the restaurant index of utils.similarity, with the stored vectors
+replaced by arrays.
+"""
+
+import numpy as np
+import pytest
+
+import utils.similarity as similarity
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    stored = {
+        "versions": {"restaurant_embeddings": 1},
+        "embeddings": (np.array([1, 2, 3]), np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]])),
+        "reads": 0,
+    }
+
+    def get_restaurant_embeddings():
+        stored["reads"] += 1
+        return stored["embeddings"]
+
+    monkeypatch.setattr(similarity, "get_data_versions", lambda: dict(stored["versions"]))
+    monkeypatch.setattr(similarity, "get_restaurant_embeddings", get_restaurant_embeddings)
+    monkeypatch.setattr(similarity, "compute_restaurant_embeddings", lambda ids: pytest.fail("computed in the request"))
+    monkeypatch.setattr(similarity, "_index", None)
+    monkeypatch.setattr(similarity, "_index_version", None)
+    return stored
+
+
+def test_similar_restaurants(stored):
+    similar = similarity.similar_restaurants(1, k=2)
+
+    assert similar["restaurant_id"].tolist() == [2, 3]
+    assert similar["similarity"].iloc[0] > similar["similarity"].iloc[1]
+
+
+def test_index_is_rebuilt_only_when_vectors_change(stored):
+    index = similarity.get_restaurant_index()
+    assert similarity.get_restaurant_index() is index
+    assert stored["reads"] == 1
+
+    # The worker stored the vector of a new restaurant
+    stored["embeddings"] = (np.array([1, 2, 3, 4]), np.vstack([stored["embeddings"][1], [[0.1, 1.0]]]))
+    stored["versions"]["restaurant_embeddings"] = 2
+
+    assert len(similarity.get_restaurant_index()) == 4
+    assert similarity.similar_restaurants(4, k=1)["restaurant_id"].tolist() == [3]
+
+
+def test_restaurant_without_vector_has_no_similar_restaurants(stored):
+    assert similarity.similar_restaurants(5).empty
@@ -0,0 +1,154 @@
+"""
+Tests of the job handling of utils.worker, with the database and the scraping
+functions replaced by recorders.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.db import enqueue_scrape_job, finish_scrape_job, get_cursor
+import utils.worker as worker
+
+
+def _job(job_type="update", attempts=1, restaurant_id=1):
+    return {
+        "job_id": 7,
+        "job_type": job_type,
+        "restaurant_id": restaurant_id,
+        "restaurant_url": "/Restaurant_Review-g1-d1-Reviews-Fake_1.html",
+        "total_reviews": 75,
+        "attempts": attempts,
+    }
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(worker, "update_scrape_job", lambda job_id, **kwargs: None)
+    monkeypatch.setattr(worker, "get_scrape_checkpoint", lambda id: None)
+    monkeypatch.setattr(worker, "delete_reviews_by_restaurant_id", lambda id: calls.append(("delete", id)))
+
+    def download(restaurant_id, url, total, progress, resume=False):
+        calls.append(("download", resume))
+        return 75
+
+    monkeypatch.setattr(worker, "download_restaurant_reviews", download)
+    return calls
+
+
+def test_update_job_replaces_reviews(calls):
+    assert worker.run_job(_job()) == 75
+    assert calls == [("delete", 1), ("download", False)]
+
+
+def _checkpoint(monkeypatch, next_url):
+    checkpoint = {"next_url": next_url, "page": 2, "reviews_saved": 30}
+    monkeypatch.setattr(worker, "get_scrape_checkpoint", lambda id: checkpoint)
+
+
+@pytest.mark.parametrize("attempts", [1, 2])
+def test_run_job_resumes_from_pending_checkpoint(monkeypatch, calls, attempts):
+    _checkpoint(monkeypatch, "/Restaurant_Review-g1-d1-Reviews-or30-Fake_1.html")
+
+    assert worker.run_job(_job(attempts=attempts)) == 75
+    assert calls == [("download", True)]
+
+
+def test_run_job_restarts_after_completed_checkpoint(monkeypatch, calls):
+    _checkpoint(monkeypatch, None)
+
+    worker.run_job(_job(attempts=2))
+    assert calls == [("delete", 1), ("download", False)]
+
+
+def test_existing_restaurant_is_a_permanent_error(monkeypatch, calls):
+    monkeypatch.setattr(worker, "restaurant_exists", lambda url: True)
+
+    with pytest.raises(worker.PermanentJobError):
+        worker.run_job(_job("new", restaurant_id=None))
+    assert calls == []
+
+
+def _run_one_job(monkeypatch, run_job, attempts=1):
+    jobs = [_job(attempts=attempts)]
+    outcomes = []
+    monkeypatch.setattr(worker, "requeue_stale_scrape_jobs", lambda timeout, max_attempts: 0)
+    monkeypatch.setattr(worker, "claim_scrape_job", lambda name: jobs.pop() if jobs else None)
+    monkeypatch.setattr(worker, "_refresh_model_outputs", lambda: None)
+    monkeypatch.setattr(worker, "run_job", run_job)
+    monkeypatch.setattr(worker, "finish_scrape_job", lambda job_id, status, message=None: outcomes.append(status))
+    monkeypatch.setattr(worker, "retry_scrape_job", lambda job_id, message=None, delay=0: outcomes.append(("queued", delay)))
+    worker._run_jobs("test", poll_interval=0, once=True)
+    return outcomes
+
+
+@pytest.mark.parametrize("attempts, outcome", [
+    (1, ("queued", 60)),
+    (2, ("queued", 120)),
+    (worker.MAX_JOB_ATTEMPTS, "failed"),
+])
+def test_failed_job_is_requeued_with_backoff_until_max_attempts(monkeypatch, attempts, outcome):
+    monkeypatch.setattr(worker, "RETRY_BACKOFF", 60)
+
+    def run_job(job):
+        raise Exception("Échec de l'enregistrement de la page 3")
+
+    assert _run_one_job(monkeypatch, run_job, attempts) == [outcome]
+
+
+def test_permanent_error_is_not_retried(monkeypatch):
+    def run_job(job):
+        raise worker.PermanentJobError("Restaurant déjà existant")
+
+    assert _run_one_job(monkeypatch, run_job) == ["failed"]
+
+
+def test_heartbeat_is_sent_while_job_runs_without_progress(monkeypatch):
+    heartbeats = []
+    beaten = threading.Event()
+
+    def update_scrape_job(job_id, **kwargs):
+        heartbeats.append((job_id, kwargs))
+        if len(heartbeats) == 3:
+            beaten.set()
+
+    monkeypatch.setattr(worker, "update_scrape_job", update_scrape_job)
+    monkeypatch.setattr(worker, "HEARTBEAT_INTERVAL", 0.01)
+
+    # A long post-processing step, which reports no progress
+    def run_job(job):
+        assert beaten.wait(5)
+        return 75
+
+    assert _run_one_job(monkeypatch, run_job) == ["done"]
+    assert heartbeats[:3] == [(7, {})] * 3
+
+
+def test_heartbeat_stops_with_job(monkeypatch):
+    heartbeats = []
+    monkeypatch.setattr(worker, "update_scrape_job", lambda job_id, **kwargs: heartbeats.append(job_id))
+    monkeypatch.setattr(worker, "HEARTBEAT_INTERVAL", 0.01)
+
+    assert _run_one_job(monkeypatch, lambda job: 75) == ["done"]
+    sent = len(heartbeats)
+    threading.Event().wait(0.05)
+    assert len(heartbeats) == sent
+
+
+@pytest.mark.skipif(not os.environ.get("POSTGRES_HOST"), reason="needs a PostgreSQL database (POSTGRES_HOST)")
+def test_concurrent_enqueues_create_one_job():
+    url = "/Restaurant_Review-g0-d0-Reviews-Enqueue_Test.html"
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            job_ids = set(executor.map(lambda _: enqueue_scrape_job("new", url), range(16)))
+        assert len(job_ids) == 1 and None not in job_ids
+
+        # A finished job no longer blocks a new one
+        finish_scrape_job(job_ids.pop(), "done")
+        assert enqueue_scrape_job("new", url) is not None
+    finally:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute("DELETE FROM scrape_jobs WHERE restaurant_url = %s", (url,))
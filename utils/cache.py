@@ -0,0 +1,173 @@
+"""
+Streamlit caching layer of the application.
+
+Resources (connection pool, NLTK data) are loaded once per server process and
+shared across sessions, as the Word2Vec vectors already are (see
+utils.embeddings). Data reads are cached with a TTL and keyed on the versions of
+the data_versions table, which the save/delete helpers of utils.db bump in the
+same transaction as the change: an entry stays valid until the underlying
+restaurants or reviews actually change. The versions themselves are read at
+most once every DATA_VERSIONS_TTL seconds, so a change shows up after that delay.
+"""
+
+import os
+import streamlit as st
+from utils.db import (
+    get_pool,
+    get_connection,
+    get_data_versions,
+    get_downloaded_restaurants,
+    get_restaurant_by_id,
+    get_contributions_median,
+    get_restaurant_review_stats,
+    get_rating_histograms,
+    get_reviews_info_by_restaurant,
+    get_reviews_one_restaurant,
+)
+from utils.functions import clean_text_df, get_stop_words, load_nltk_resources
+
+CACHE_TTL = int(os.environ.get("STREAMLIT_CACHE_TTL", 3600))
+# Seconds during which the data versions are reused without reading the database
+DATA_VERSIONS_TTL = float(os.environ.get("DATA_VERSIONS_TTL", 5))
+
+
+################################################################
+# RESOURCES
+################################################################
+
+@st.cache_resource(show_spinner=False)
+def get_shared_pool():
+    """
+    Get the connection pool shared by all the sessions, waiting for the
+    database like any other query (see utils.db.get_connection).
+    """
+    with get_connection():
+        pass
+    return get_pool()
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_stop_words():
+    """
+    Load the NLTK resources once and get the stop words shared by all the sessions.
+    """
+    load_nltk_resources()
+    return frozenset(get_stop_words())
+
+
+################################################################
+# DATA
+################################################################
+
+@st.cache_data(ttl=DATA_VERSIONS_TTL, show_spinner=False)
+def _data_versions():
+    return get_data_versions()
+
+
+def _versions(*names):
+    versions = _data_versions()
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def _ids(restaurant_ids):
+    return tuple(int(id) for id in restaurant_ids)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _downloaded_restaurants(versions):
+    return get_downloaded_restaurants()
+
+
+def cached_downloaded_restaurants():
+    """
+    Cached get_downloaded_restaurants.
+    """
+    return _downloaded_restaurants(_versions("restaurants", "reviews"))
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _restaurant_reviews(versions, restaurant_ids, min_contributions):
+    return get_restaurant_by_id(list(restaurant_ids), min_contributions)
+
+
+def cached_restaurant_reviews(restaurant_ids, min_contributions=None):
+    """
+    Cached get_restaurant_by_id.
+    """
+    return _restaurant_reviews(_versions("reviews"), _ids(restaurant_ids), min_contributions)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _cleaned_reviews(versions, restaurant_ids, min_contributions, root_type):
+    return clean_text_df(
+        get_restaurant_by_id(list(restaurant_ids), min_contributions),
+        root_type,
+        get_shared_stop_words()
+    )
+
+
+def cached_cleaned_reviews(restaurant_ids, min_contributions=None, root_type="lemmatization"):
+    """
+    Cached get_restaurant_by_id followed by clean_text_df.
+    """
+    return _cleaned_reviews(_versions("reviews"), _ids(restaurant_ids), min_contributions, root_type)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _contributions_median(versions, restaurant_ids):
+    return get_contributions_median(list(restaurant_ids))
+
+
+def cached_contributions_median(restaurant_ids):
+    """
+    Cached get_contributions_median.
+    """
+    return _contributions_median(_versions("reviews"), _ids(restaurant_ids))
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _restaurant_review_stats(versions, restaurant_ids, min_contributions):
+    return get_restaurant_review_stats(list(restaurant_ids), min_contributions)
+
+
+def cached_restaurant_review_stats(restaurant_ids, min_contributions=None):
+    """
+    Cached get_restaurant_review_stats.
+    """
+    return _restaurant_review_stats(_versions("reviews"), _ids(restaurant_ids), min_contributions)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _rating_histograms(versions, restaurant_ids, min_contributions):
+    return get_rating_histograms(list(restaurant_ids), min_contributions)
+
+
+def cached_rating_histograms(restaurant_ids, min_contributions=None):
+    """
+    Cached get_rating_histograms.
+    """
+    return _rating_histograms(_versions("reviews"), _ids(restaurant_ids), min_contributions)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _reviews_info_by_restaurant(versions, restaurant_id):
+    return get_reviews_info_by_restaurant(restaurant_id)
+
+
+def cached_reviews_info_by_restaurant(restaurant_id):
+    """
+    Cached get_reviews_info_by_restaurant.
+    """
+    return _reviews_info_by_restaurant(_versions("reviews"), int(restaurant_id))
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _reviews_one_restaurant(versions, restaurant_id):
+    return get_reviews_one_restaurant(restaurant_id)
+
+
+def cached_reviews_one_restaurant(restaurant_id):
+    """
+    Cached get_reviews_one_restaurant.
+    """
+    return _reviews_one_restaurant(_versions("restaurants", "reviews"), int(restaurant_id))
@@ -1,7 +1,14 @@
 import os
+import hashlib
+import time
 import platform
+import threading
+import uuid
+from contextlib import contextmanager
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
@@ -13,33 +20,249 @@ if platform.system() == "Windows":
 else:
     load_dotenv()
 
-# Establish PostgreSQL connection
-try:
-    db = psycopg2.connect(
+# Connection pool settings
+POOL_MIN_CONNECTIONS = int(os.environ.get("POSTGRES_POOL_MIN", 1))
+POOL_MAX_CONNECTIONS = int(os.environ.get("POSTGRES_POOL_MAX", 10))
+CONNECT_RETRIES = int(os.environ.get("POSTGRES_CONNECT_RETRIES", 3))
+CONNECT_BACKOFF = float(os.environ.get("POSTGRES_CONNECT_BACKOFF", 0.5))
+
+# Explicit dtypes of the columns returned by the readers. Categorical dtypes are
+# only applied to review-level results, where restaurant attributes repeat.
+COLUMN_DTYPES = {
+    "date": "datetime64[ns]",
+    "rating": "int8",
+}
+CATEGORICAL_COLUMNS = ["restaurant_type", "restaurant_price"]
+FETCH_CHUNK_SIZE = int(os.environ.get("FETCH_CHUNK_SIZE", 2000))
+
+# Number of reviews written per INSERT statement / transaction
+REVIEWS_BATCH_SIZE = int(os.environ.get("REVIEWS_BATCH_SIZE", 500))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _create_pool():
+    """
+    Create the PostgreSQL connection pool. Connection failures are retried by
+    _checkout, so a single attempt is made here.
+
+    Returns:
+        psycopg2.pool.ThreadedConnectionPool: The connection pool.
+
+    Raises:
+        psycopg2.OperationalError: If the database is unreachable.
+    """
+    return psycopg2.pool.ThreadedConnectionPool(
+        POOL_MIN_CONNECTIONS,
+        POOL_MAX_CONNECTIONS,
         host=os.environ.get("POSTGRES_HOST"),
         user=os.environ.get("POSTGRES_USER"),
         password=os.environ.get("POSTGRES_PASSWORD"),
         dbname=os.environ.get("POSTGRES_DBNAME"),
         port=os.environ.get("POSTGRES_PORT")
     )
-except psycopg2.OperationalError as err:
-    print(f"Operational error: {err}")
-except psycopg2.Error as err:
-    print(f"Database connection error: {err}")
 
 
-def get_cursor():
+def get_pool():
     """
-    Validate and obtain a cursor for database operations.
+    Get the process-wide connection pool, creating it on first use.
 
     Returns:
-        cursor: A database cursor.
+        psycopg2.pool.ThreadedConnectionPool: The connection pool.
+    """
+    global _pool
+    if _pool is None or _pool.closed:
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                _pool = _create_pool()
+    return _pool
+
+
+def _is_healthy(connection):
+    """
+    Check that a pooled connection is still usable.
+
+    Args:
+        connection: A psycopg2 connection.
+
+    Returns:
+        bool: True if the connection answers a trivial query, False otherwise.
     """
+    if connection.closed:
+        return False
     try:
-        return db.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    except psycopg2.Error as err:
-        print(f"Error obtaining cursor: {err}")
-        return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout():
+    """
+    Check a healthy connection out of the pool.
+
+    The pool is created on first use. Unreachable databases, exhausted pools
+    and broken connections (discarded and replaced) are retried
+    CONNECT_RETRIES times, backing off between attempts so a restarting
+    database is not hammered.
+
+    Returns:
+        tuple: The pool and a healthy psycopg2 connection checked out of it.
+    """
+    last_error = None
+    for attempt in range(CONNECT_RETRIES + 1):
+        try:
+            pool = get_pool()
+            connection = pool.getconn()
+        except psycopg2.pool.PoolError as err:
+            # Pool exhausted: wait for another session to return a connection
+            connection, last_error = None, err
+        except psycopg2.OperationalError as err:
+            connection, last_error = None, err
+        if connection is not None:
+            if _is_healthy(connection):
+                return pool, connection
+            pool.putconn(connection, close=True)
+            last_error = psycopg2.OperationalError("Stale connection discarded")
+        if attempt < CONNECT_RETRIES:
+            time.sleep(CONNECT_BACKOFF * 2 ** attempt)
+    raise psycopg2.OperationalError(f"Could not obtain a database connection: {last_error}")
+
+
+@contextmanager
+def get_connection():
+    """
+    Check a connection out of the pool for the duration of a block.
+
+    The transaction is rolled back if the block raises, and the connection
+    is always returned to the pool.
+
+    Yields:
+        connection: A psycopg2 connection.
+    """
+    pool, connection = _checkout()
+    try:
+        yield connection
+    except Exception:
+        if not connection.closed:
+            connection.rollback()
+        raise
+    finally:
+        pool.putconn(connection, close=bool(connection.closed))
+
+
+@contextmanager
+def get_cursor(cursor_factory=psycopg2.extras.DictCursor):
+    """
+    Obtain a cursor on a pooled connection for database operations.
+
+    The transaction is committed when the block exits normally.
+
+    Args:
+        cursor_factory: The psycopg2 cursor class to use.
+
+    Yields:
+        cursor: A database cursor.
+    """
+    with get_connection() as connection:
+        with connection.cursor(cursor_factory=cursor_factory) as cursor:
+            yield cursor
+        connection.commit()
+
+
+def _apply_dtypes(df, categorical=False):
+    """
+    Cast the known columns of a DataFrame to their explicit dtypes.
+
+    Args:
+        df (pd.DataFrame): DataFrame built from a query result.
+        categorical (bool): Whether to store restaurant attributes as categoricals.
+
+    Returns:
+        pd.DataFrame: The DataFrame with converted columns.
+    """
+    for column, dtype in COLUMN_DTYPES.items():
+        if column not in df.columns:
+            continue
+        if dtype.startswith("datetime64"):
+            df[column] = pd.to_datetime(df[column])
+        elif not df[column].isna().any():
+            df[column] = df[column].astype(dtype)
+    if categorical:
+        for column in CATEGORICAL_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype("category")
+    return df
+
+
+def _rows_to_dataframe(cursor, rows, categorical=False):
+    """
+    Build a DataFrame column by column from tuple rows of an executed cursor.
+
+    Args:
+        cursor: The cursor the rows were fetched from.
+        rows (list): List of tuples returned by fetchall/fetchmany.
+        categorical (bool): Whether to store restaurant attributes as categoricals.
+
+    Returns:
+        pd.DataFrame: DataFrame with one column per selected field.
+    """
+    names = [column.name for column in cursor.description]
+    columns = zip(*rows) if rows else [()] * len(names)
+    df = pd.DataFrame({name: pd.Series(values, dtype=None if values else object)
+                       for name, values in zip(names, columns)})
+    return _apply_dtypes(df, categorical)
+
+
+def fetch_dataframe(query, params=None, categorical=False):
+    """
+    Run a query and return its result as a DataFrame.
+
+    Rows are fetched as plain tuples and transposed into columns, which avoids
+    building a Python dict for every row.
+
+    Args:
+        query (str): The SQL query.
+        params (tuple): Query parameters.
+        categorical (bool): Whether to store restaurant attributes as categoricals.
+
+    Returns:
+        pd.DataFrame: The query result.
+    """
+    with get_cursor(cursor_factory=None) as cursor:
+        cursor.execute(query, params)
+        return _rows_to_dataframe(cursor, cursor.fetchall(), categorical)
+
+
+def iter_dataframes(query, params=None, chunk_size=None, categorical=False):
+    """
+    Iterate over a query result in DataFrame chunks using a server-side cursor.
+
+    Only one chunk is held in memory at a time, which suits large review scans.
+
+    Args:
+        query (str): The SQL query.
+        params (tuple): Query parameters.
+        chunk_size (int): Number of rows per chunk. Defaults to FETCH_CHUNK_SIZE.
+        categorical (bool): Whether to store restaurant attributes as categoricals.
+
+    Yields:
+        pd.DataFrame: Successive chunks of the query result.
+    """
+    chunk_size = chunk_size or FETCH_CHUNK_SIZE
+    with get_connection() as connection:
+        with connection.cursor(name=f"fetch_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield _rows_to_dataframe(cursor, rows, categorical)
+        connection.commit()
 
 
 def get_all_reviews():
@@ -49,18 +272,11 @@ def get_all_reviews():
     Returns:
         pd.DataFrame: DataFrame containing all reviews.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return pd.DataFrame()
     try:
-        cursor.execute("SELECT * FROM REVIEWS")
-        reviews = cursor.fetchall()
-        return pd.DataFrame([dict(review) for review in reviews])
+        return fetch_dataframe("SELECT * FROM REVIEWS")
     except psycopg2.Error as err:
         print(err)
         return pd.DataFrame()
-    finally:
-        cursor.close()
 
 
 def get_all_restaurants():
@@ -70,18 +286,11 @@ def get_all_restaurants():
     Returns:
         pd.DataFrame: DataFrame containing all restaurants.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return pd.DataFrame()
     try:
-        cursor.execute("SELECT * FROM RESTAURANTS")
-        restaurants = cursor.fetchall()
-        return pd.DataFrame([dict(restaurant) for restaurant in restaurants])
+        return fetch_dataframe("SELECT * FROM RESTAURANTS")
     except psycopg2.Error as err:
         print(err)
         return pd.DataFrame()
-    finally:
-        cursor.close()
 
 
 def get_restaurant_by_type(restaurant_type):
@@ -94,21 +303,14 @@ def get_restaurant_by_type(restaurant_type):
     Returns:
         pd.DataFrame: DataFrame containing restaurants of the specified type.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return pd.DataFrame()
     try:
-        cursor.execute(
+        return fetch_dataframe(
             "SELECT * FROM RESTAURANTS WHERE restaurant_type = %s",
             (restaurant_type,)
         )
-        restaurants = cursor.fetchall()
-        return pd.DataFrame([dict(restaurant) for restaurant in restaurants])
     except psycopg2.Error as err:
         print(err)
         return pd.DataFrame()
-    finally:
-        cursor.close()
 
 
 def get_reviews_info_by_restaurant(restaurant_id):
@@ -121,272 +323,1531 @@ def get_reviews_info_by_restaurant(restaurant_id):
     Returns:
         pd.DataFrame: DataFrame containing summary of reviews for the specified restaurant.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return pd.DataFrame()
     try:
-        cursor.execute(
+        return fetch_dataframe(
             """
             SELECT 
-                COUNT(*) AS review_count, 
-                AVG(rating) AS average_rating, 
-                MAX(date) AS last_comment_date, 
-                MIN(date) AS first_comment_date 
-            FROM reviews 
-            WHERE restaurant_id = %s
+                COALESCE(s.review_count, 0) AS review_count, 
+                s.rating_sum::float / NULLIF(s.review_count, 0) AS average_rating, 
+                s.last_comment_date, 
+                s.first_comment_date 
+            FROM (SELECT %s AS restaurant_id) q
+            LEFT JOIN restaurant_review_stats s ON s.restaurant_id = q.restaurant_id
             """,
             (int(restaurant_id),)
         )
-        review_summary = cursor.fetchall()
-        return pd.DataFrame([dict(summary) for summary in review_summary])
     except psycopg2.Error as err:
         print(err)
         return pd.DataFrame()
-    finally:
-        cursor.close()
 
 
-def save_reviews_to_db(restaurant_id, reviews):
+def _update_review_stats(cursor, restaurant_id, inserted):
     """
-    Save reviews to the database.
+    Add freshly inserted reviews to the restaurant_review_stats summary.
 
     Args:
+        cursor: Cursor of the transaction that inserted the reviews.
         restaurant_id (int): The ID of the restaurant.
-        reviews (list): List of reviews to save.
+        inserted (list): List of (rating, date) tuples of the inserted reviews.
     """
-    cursor = get_cursor()
-    if cursor is None:
+    if not inserted:
         return
-    try:
-        for review in reviews:
-            cursor.execute(
-                """
-                INSERT INTO reviews (restaurant_id, user_name, review_text, date, contributions, rating)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    restaurant_id, review['user_name'], review['review_text'],
-                    review['date'], review['contributions'], review['rating']
-                )
-            )
-        db.commit()
-    except psycopg2.Error as err:
-        print(err)
-    finally:
-        cursor.close()
+    dates = [date for _, date in inserted if date is not None]
+    cursor.execute(
+        """
+        INSERT INTO restaurant_review_stats (restaurant_id, review_count, rating_sum, first_comment_date, last_comment_date)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (restaurant_id) DO UPDATE SET
+            review_count = restaurant_review_stats.review_count + EXCLUDED.review_count,
+            rating_sum = restaurant_review_stats.rating_sum + EXCLUDED.rating_sum,
+            first_comment_date = LEAST(restaurant_review_stats.first_comment_date, EXCLUDED.first_comment_date),
+            last_comment_date = GREATEST(restaurant_review_stats.last_comment_date, EXCLUDED.last_comment_date)
+        """,
+        (
+            int(restaurant_id), len(inserted), int(sum(rating for rating, _ in inserted)),
+            min(dates) if dates else None, max(dates) if dates else None
+        )
+    )
 
 
-def save_restaurant_to_db(restaurant_data):
+def _bump_data_version(cursor, name):
     """
-    Save restaurant data to the database.
+    Increment a data version in the current transaction, so the cached reads
+    of that data are invalidated once it is committed.
 
     Args:
-        restaurant_data (dict): Dictionary containing restaurant data.
+        cursor (cursor): The open cursor.
+        name (str): Name of the data ('restaurants', 'reviews', 'review_scores', 'word2vec'...).
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return
+    cursor.execute(
+        """
+        INSERT INTO data_versions (name, version) VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE
+        SET version = data_versions.version + 1, updated_at = NOW()
+        """,
+        (name,)
+    )
 
-    try:
-        # Clean and format data
-        restaurant_name = restaurant_data["restaurant_name"].replace("'", "''")
-        restaurant_avg_review = float(restaurant_data["restaurant_avg_review"])
-        restaurant_price = restaurant_data["restaurant_price"].replace("'", "''")
-        restaurant_reviews = int(restaurant_data["restaurant_reviews"])
-        restaurant_type_resto = restaurant_data["restaurant_type_resto"].replace("'", "''")
-        restaurant_url = restaurant_data["restaurant_url"]
 
-        address = restaurant_data["restauranta_address"]["address"].replace("'", "''")
-        latitude = float(restaurant_data["restauranta_address"]["latitude"])
-        longitude = float(restaurant_data["restauranta_address"]["longitude"])
-        zip_code = restaurant_data["restauranta_address"]["zip_code"].replace("'", "''")
-        country = restaurant_data["restauranta_address"]["country"].replace("'", "''")
-        ville = restaurant_data["restauranta_address"]["ville"].replace("'", "''")
+def bump_data_version(name):
+    """
+    Increment a data version in its own transaction.
 
-        # Insert restaurant data
-        cursor.execute(
-            """
-            INSERT INTO restaurants (restaurant_name, restaurant_avg_review, restaurant_price, restaurant_total_reviews, restaurant_type, restaurant_url)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING restaurant_id
-            """,
-            (restaurant_name, restaurant_avg_review, restaurant_price, restaurant_reviews, restaurant_type_resto, restaurant_url)
-        )
-        restaurant_id = cursor.fetchone()[0]
+    Args:
+        name (str): Name of the data.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            _bump_data_version(cursor, name)
+    except psycopg2.Error as err:
+        print(err)
 
-        # Insert location data
-        cursor.execute(
-            """
-            INSERT INTO locations (restaurant_id, address, latitude, longitude, code_postal, ville, country)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (restaurant_id, address, latitude, longitude, zip_code, ville, country)
-        )
 
-        db.commit()
-        return pd.DataFrame([{
-            "restaurant_id": restaurant_id,
-            "restaurant_name": restaurant_name,
-            "restaurant_avg_review": restaurant_avg_review,
-            "restaurant_price": restaurant_price,
-            "restaurant_total_reviews": restaurant_reviews,
-            "restaurant_type": restaurant_type_resto,
-            "restaurant_url": restaurant_url
-        }])
+def get_data_versions():
+    """
+    Fetch the current data versions.
+
+    Returns:
+        dict: Mapping of data name to its version.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute("SELECT name, version FROM data_versions")
+            return dict(cursor.fetchall())
     except psycopg2.Error as err:
         print(err)
-    finally:
-        cursor.close()
+        return {}
 
-def delete_reviews_by_restaurant_id(restaurant_id):
+
+def review_hash(restaurant_id, user_name, date, review_text):
     """
-    Delete all reviews for a specific restaurant.
+    Content hash identifying a review, equal to the review_hash column
+    computed by sql/migrations/010_review_hash.sql.
 
     Args:
         restaurant_id (int): The ID of the restaurant.
+        user_name (str): Name of the author.
+        date (str): Date of the review ('YYYY-MM-DD'), or None.
+        review_text (str): The text of the review.
+
+    Returns:
+        str: The hexadecimal MD5 digest.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return
-    try:
-        cursor.execute(
-            "DELETE FROM reviews WHERE restaurant_id = %s",
-            (restaurant_id,)
+    key = "\x1f".join((str(int(restaurant_id)), user_name or "", str(date) if date else "", review_text or ""))
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def _review_rows(restaurant_id, reviews):
+    # The same review can appear twice in a batch (pages shifted by a new
+    # review while scraping); a single INSERT ... ON CONFLICT DO UPDATE
+    # cannot touch a row twice, so only the last copy is kept
+    rows = {}
+    for review in reviews:
+        content_hash = review_hash(restaurant_id, review['user_name'], review['date'], review['review_text'])
+        rows[content_hash] = (
+            restaurant_id, review['user_name'], review['review_text'],
+            review['date'], review['contributions'], review['rating'], content_hash
         )
-        db.commit()
-    except psycopg2.Error as err:
-        print(err)
-    finally:
-        cursor.close()
-        
-        
-def restaurant_exists(restaurant_url):
+    return list(rows.values())
+
+
+def _insert_reviews(cursor, restaurant_id, rows):
     """
-    Check if a restaurant exists in the database by its URL.
+    Insert review rows with one multi-row INSERT, and update the
+    restaurant_review_stats summary and the reviews data version in the same
+    transaction.
+
+    Reviews already stored (same review_hash) are not inserted again; only
+    their number of contributions of the author is refreshed.
 
     Args:
-        restaurant_url (str): The URL of the restaurant.
+        cursor: Cursor of the transaction.
+        restaurant_id (int): The ID of the restaurant.
+        rows (list): Rows built by _review_rows.
 
     Returns:
-        bool: True if the restaurant exists, False otherwise.
+        list: Texts of the inserted reviews.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return False
+    returned = psycopg2.extras.execute_values(
+        cursor,
+        """
+        INSERT INTO reviews (restaurant_id, user_name, review_text, date, contributions, rating, review_hash)
+        VALUES %s
+        ON CONFLICT (restaurant_id, review_hash) DO UPDATE
+        SET contributions = EXCLUDED.contributions
+        WHERE reviews.contributions IS DISTINCT FROM EXCLUDED.contributions
+        RETURNING rating, date, review_text, xmax = 0
+        """,
+        rows,
+        page_size=max(len(rows), 1),
+        fetch=True
+    )
+    # xmax is 0 for the inserted rows and set for the updated ones
+    inserted = [(rating, date, review_text) for rating, date, review_text, is_insert in returned if is_insert]
+    _update_review_stats(cursor, restaurant_id, [(rating, date) for rating, date, _ in inserted])
+    if returned:
+        _bump_data_version(cursor, "reviews")
+    return [review_text for _, _, review_text in inserted]
+
+
+def save_reviews_to_db(restaurant_id, reviews, batch_size=None):
+    """
+    Save reviews to the database.
+
+    Reviews are written in batches with multi-row INSERT statements and
+    committed once per batch, so a failure only loses the current batch.
+    The restaurant_review_stats summary is updated in the same transaction.
+    Saving the same reviews again does not duplicate them.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        reviews (list): List of reviews to save.
+        batch_size (int): Number of reviews per batch. Defaults to REVIEWS_BATCH_SIZE.
+
+    Returns:
+        int: Number of reviews inserted.
+    """
+    batch_size = batch_size or REVIEWS_BATCH_SIZE
+    rows = _review_rows(restaurant_id, reviews)
+    inserted = 0
     try:
-        cursor.execute(
-            "SELECT 1 FROM restaurants WHERE restaurant_url = %s",
-            (restaurant_url,)
-        )
-        return cursor.fetchone() is not None
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                for start in range(0, len(rows), batch_size):
+                    inserted += len(_insert_reviews(cursor, restaurant_id, rows[start:start + batch_size]))
+                    connection.commit()
     except psycopg2.Error as err:
         print(err)
-        return False
-    finally:
-        cursor.close()
+    return inserted
 
-def get_downloaded_restaurants():
+
+def save_review_page(restaurant_id, reviews, next_url, page):
     """
-    Fetch restaurants that have been downloaded.
+    Save the reviews of a scraped page and the pagination checkpoint of the
+    restaurant in one transaction, so an interrupted scrape resumes after the
+    last saved page.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        reviews (list): Reviews of the page.
+        next_url (str): URL of the next page, None after the last page.
+        page (int): Number of the saved page.
 
     Returns:
-        pd.DataFrame: DataFrame containing downloaded restaurants.
+        list: Texts of the inserted reviews, None if the page could not be saved.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return pd.DataFrame()
+    rows = _review_rows(restaurant_id, reviews)
     try:
-        cursor.execute("""
-            SELECT r.restaurant_id,
-                r.restaurant_name,
-                r.restaurant_avg_review,
-                r.restaurant_price,
-                r.restaurant_type, 
-                r.restaurant_total_reviews,
-                r.restaurant_url,
-                r.restaurant_about,
-                l.address,
-                l.latitude, 
-                l.longitude,
-                l.country,
-                l.ville
-            FROM restaurants r
-            JOIN locations l ON r.restaurant_id = l.restaurant_id
-            WHERE r.restaurant_id IN (SELECT restaurant_id FROM REVIEWS)
-        """)
-        restaurants = cursor.fetchall()
-        return pd.DataFrame([dict(restaurant) for restaurant in restaurants])
+        with get_cursor(cursor_factory=None) as cursor:
+            inserted = _insert_reviews(cursor, restaurant_id, rows) if rows else []
+            cursor.execute(
+                """
+                INSERT INTO scrape_checkpoints (restaurant_id, next_url, page, reviews_saved)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (restaurant_id) DO UPDATE SET
+                    next_url = EXCLUDED.next_url,
+                    page = EXCLUDED.page,
+                    reviews_saved = scrape_checkpoints.reviews_saved + EXCLUDED.reviews_saved,
+                    updated_at = NOW()
+                """,
+                (int(restaurant_id), next_url, int(page), len(inserted))
+            )
+        return inserted
     except psycopg2.Error as err:
         print(err)
-        return pd.DataFrame()
-    finally:
-        cursor.close()
+        return None
 
 
-def get_restaurant_by_id(restaurant_ids):
+def get_scrape_checkpoint(restaurant_id):
     """
-    Fetch restaurants by their IDs.
+    Fetch the pagination checkpoint of a restaurant.
 
     Args:
-        restaurant_ids (list): List of restaurant IDs to fetch.
+        restaurant_id (int): The ID of the restaurant.
 
     Returns:
-        pd.DataFrame: DataFrame containing restaurants with the specified IDs.
+        dict: next_url (None once the last page is saved), page and
+        reviews_saved of the checkpoint, or None if there is none.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return pd.DataFrame()
     try:
-        query = """
-            SELECT 
-                r.restaurant_id,
-                r.restaurant_name,
-                r.restaurant_avg_review,
-                r.restaurant_type,
-                r.restaurant_price,
-                l.latitude,
-                l.longitude,
-                r2.rating,
-                r2.review_text,
-                r2.contributions 
-            FROM restaurants r
-            JOIN locations l ON l.restaurant_id = r.restaurant_id
-            JOIN reviews r2 ON r2.restaurant_id = r.restaurant_id 
-            WHERE r.restaurant_id IN (%s)
-        """ % ",".join(list(map(str, restaurant_ids)))
-        cursor.execute(query)
-        restaurants = cursor.fetchall()
-        return pd.DataFrame([dict(restaurant) for restaurant in restaurants])
+        with get_cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(
+                "SELECT next_url, page, reviews_saved FROM scrape_checkpoints WHERE restaurant_id = %s",
+                (int(restaurant_id),)
+            )
+            checkpoint = cursor.fetchone()
+            return dict(checkpoint) if checkpoint else None
     except psycopg2.Error as err:
         print(err)
-        return pd.DataFrame()
-    finally:
-        cursor.close()
+        return None
 
 
-def get_reviews_one_restaurant(id):
+def review_text_hash(review_text):
     """
-    Fetch reviews for a specific restaurant.
+    Hash of the text of a review, equal to md5(COALESCE(review_text, '')) in PostgreSQL.
 
     Args:
-        id (int): The ID of the restaurant.
+        review_text (str): The text of the review.
 
     Returns:
-        pd.DataFrame: DataFrame containing reviews for the specified restaurant.
+        str: The hexadecimal MD5 digest.
+    """
+    return hashlib.md5((review_text or "").encode("utf-8")).hexdigest()
+
+
+def get_review_keys(restaurant_id):
+    """
+    Fetch the natural keys of the stored reviews of a restaurant.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+
+    Returns:
+        dict: Mapping of (user_name, date as 'YYYY-MM-DD') to
+        (review_id, rating, text_hash) of each review.
     """
-    cursor = get_cursor()
-    if cursor is None:
-        return pd.DataFrame()
     try:
-        cursor.execute(
-            "SELECT * FROM REVIEWS WHERE restaurant_id = %s",
-            (int(id),)
-        )
-        reviews = cursor.fetchall()
-        print(reviews)
-        return pd.DataFrame([dict(review) for review in reviews])
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                SELECT user_name, to_char(date, 'YYYY-MM-DD'), review_id, rating, md5(COALESCE(review_text, ''))
+                FROM reviews
+                WHERE restaurant_id = %s
+                """,
+                (int(restaurant_id),)
+            )
+            return {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+    except psycopg2.Error as err:
+        print(err)
+        return {}
+
+
+def save_review_changes(restaurant_id, new_reviews, changed_reviews):
+    """
+    Insert the new reviews of a restaurant and update its changed reviews in
+    one transaction. The tokens and scores of the changed reviews are deleted
+    so they are computed again from their new text.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        new_reviews (list): Reviews to insert.
+        changed_reviews (list): (review_id, stored rating, review) of the reviews to update.
+
+    Returns:
+        list: Texts of the inserted reviews, None if the changes could not be saved.
+    """
+    rows = _review_rows(restaurant_id, new_reviews)
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            inserted = _insert_reviews(cursor, restaurant_id, rows) if rows else []
+            if changed_reviews:
+                review_ids = [int(review_id) for review_id, _, _ in changed_reviews]
+                hashes = [
+                    review_hash(restaurant_id, review['user_name'], review['date'], review['review_text'])
+                    for _, _, review in changed_reviews
+                ]
+                # Another stored copy of an edited review may already have its
+                # new text: it is deleted, or the unique index on review_hash
+                # would reject the update
+                cursor.execute(
+                    """
+                    DELETE FROM reviews
+                    WHERE restaurant_id = %s AND review_hash = ANY(%s) AND review_id <> ALL(%s)
+                    RETURNING rating
+                    """,
+                    (int(restaurant_id), hashes, review_ids)
+                )
+                duplicates = cursor.fetchall()
+                psycopg2.extras.execute_values(
+                    cursor,
+                    """
+                    UPDATE reviews SET
+                        review_text = v.review_text,
+                        contributions = v.contributions,
+                        rating = v.rating,
+                        review_hash = v.review_hash
+                    FROM (VALUES %s) AS v (review_id, review_text, contributions, rating, review_hash)
+                    WHERE reviews.review_id = v.review_id
+                    """,
+                    [
+                        (int(review_id), review['review_text'], review['contributions'], review['rating'], hash_)
+                        for (review_id, _, review), hash_ in zip(changed_reviews, hashes)
+                    ],
+                    template="(%s, %s, %s::INTEGER, %s::INTEGER, %s)",
+                    page_size=len(changed_reviews)
+                )
+                cursor.execute(
+                    """
+                    UPDATE restaurant_review_stats
+                    SET rating_sum = rating_sum + %s, review_count = review_count - %s
+                    WHERE restaurant_id = %s
+                    """,
+                    (
+                        int(sum((review['rating'] or 0) - (rating or 0) for _, rating, review in changed_reviews)
+                            - sum(rating or 0 for (rating,) in duplicates)),
+                        len(duplicates),
+                        int(restaurant_id)
+                    )
+                )
+                cursor.execute("DELETE FROM review_tokens WHERE review_id = ANY(%s)", (review_ids,))
+                cursor.execute("DELETE FROM review_scores WHERE review_id = ANY(%s)", (review_ids,))
+                _bump_data_version(cursor, "reviews")
+                _bump_data_version(cursor, "review_scores")
+        return inserted
+    except psycopg2.Error as err:
+        print(err)
+        return None
+
+
+# Same value as review_hash(), computed by PostgreSQL
+REVIEW_HASH_SQL = """
+    md5(concat_ws(E'\\x1f',
+        restaurant_id::TEXT,
+        COALESCE(user_name, ''),
+        COALESCE(to_char(date, 'YYYY-MM-DD'), ''),
+        COALESCE(review_text, '')
+    ))
+"""
+
+
+def add_review_hash_column():
+    """
+    Add the review_hash column to the reviews table if it is missing.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS review_hash CHAR(32)")
+    except psycopg2.Error as err:
+        print(err)
+
+
+def hash_reviews(limit, after_review_id=0):
+    """
+    Fill the missing review_hash of a batch of reviews.
+
+    Args:
+        limit (int): Maximum number of reviews examined.
+        after_review_id (int): Only examine reviews with a greater ID (keyset pagination).
+
+    Returns:
+        tuple: Number of reviews updated and the last review ID examined,
+        None once there is nothing left to examine.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                SELECT MAX(review_id) FROM (
+                    SELECT review_id FROM reviews
+                    WHERE review_id > %s
+                    ORDER BY review_id
+                    LIMIT %s
+                ) batch
+                """,
+                (int(after_review_id), int(limit))
+            )
+            (last_review_id,) = cursor.fetchone()
+            if last_review_id is None:
+                return 0, None
+            cursor.execute(
+                f"""
+                UPDATE reviews SET review_hash = {REVIEW_HASH_SQL}
+                WHERE review_id > %s AND review_id <= %s AND review_hash IS NULL
+                """,
+                (int(after_review_id), last_review_id)
+            )
+            return cursor.rowcount, last_review_id
+    except psycopg2.Error as err:
+        print(err)
+        return 0, None
+
+
+def delete_duplicate_reviews(limit, after_review_id=0):
+    """
+    Delete a batch of duplicate reviews, keeping the oldest copy of each
+    review_hash of a restaurant. The summary of the restaurants concerned is
+    rebuilt and their term counts are dropped in the same transaction.
+
+    Args:
+        limit (int): Maximum number of duplicates examined.
+        after_review_id (int): Only examine reviews with a greater ID (keyset pagination).
+
+    Returns:
+        tuple: Number of reviews deleted per restaurant (dict) and the last
+        review ID examined, None once there is nothing left to examine.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                DELETE FROM reviews WHERE review_id IN (
+                    SELECT r.review_id FROM reviews r
+                    WHERE r.review_id > %s
+                        AND r.review_hash IS NOT NULL
+                        AND EXISTS (
+                            SELECT 1 FROM reviews kept
+                            WHERE kept.restaurant_id = r.restaurant_id
+                                AND kept.review_hash = r.review_hash
+                                AND kept.review_id < r.review_id
+                        )
+                    ORDER BY r.review_id
+                    LIMIT %s
+                )
+                RETURNING restaurant_id, review_id
+                """,
+                (int(after_review_id), int(limit))
+            )
+            deleted = cursor.fetchall()
+            if not deleted:
+                return {}, None
+
+            removed = {}
+            for restaurant_id, _ in deleted:
+                removed[restaurant_id] = removed.get(restaurant_id, 0) + 1
+            restaurant_ids = list(removed)
+            cursor.execute(
+                """
+                UPDATE restaurant_review_stats s SET
+                    review_count = r.review_count,
+                    rating_sum = r.rating_sum,
+                    first_comment_date = r.first_comment_date,
+                    last_comment_date = r.last_comment_date
+                FROM (
+                    SELECT restaurant_id, COUNT(*) AS review_count, SUM(rating) AS rating_sum,
+                        MIN(date) AS first_comment_date, MAX(date) AS last_comment_date
+                    FROM reviews
+                    WHERE restaurant_id = ANY(%s)
+                    GROUP BY restaurant_id
+                ) r
+                WHERE s.restaurant_id = r.restaurant_id
+                """,
+                (restaurant_ids,)
+            )
+            cursor.execute(
+                "DELETE FROM review_term_counts WHERE restaurant_id = ANY(%s)",
+                (restaurant_ids,)
+            )
+            _bump_data_version(cursor, "reviews")
+            _bump_data_version(cursor, "review_scores")
+            return removed, max(review_id for _, review_id in deleted)
+    except psycopg2.Error as err:
+        print(err)
+        return {}, None
+
+
+def create_review_hash_index():
+    """
+    Create the unique index on (restaurant_id, review_hash) used by the
+    ON CONFLICT clause of the review inserts.
+
+    Returns:
+        bool: Whether the index exists.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_review_hash
+                ON reviews (restaurant_id, review_hash)
+                """
+            )
+        return True
+    except psycopg2.Error as err:
+        print(err)
+        return False
+
+
+def save_restaurant_to_db(restaurant_data):
+    """
+    Save restaurant data to the database.
+
+    Args:
+        restaurant_data (dict): Dictionary containing restaurant data.
+    """
+    try:
+        # Clean and format data
+        restaurant_name = restaurant_data["restaurant_name"].replace("'", "''")
+        restaurant_avg_review = float(restaurant_data["restaurant_avg_review"])
+        restaurant_price = restaurant_data["restaurant_price"].replace("'", "''")
+        restaurant_reviews = int(restaurant_data["restaurant_reviews"])
+        restaurant_type_resto = restaurant_data["restaurant_type_resto"].replace("'", "''")
+        restaurant_url = restaurant_data["restaurant_url"]
+
+        # Fields left empty by the geocoder are stored as NULL, see utils.geocoding
+        location = restaurant_data["restauranta_address"]
+        address = location["address"].replace("'", "''")
+        latitude = float(location["latitude"]) if location["latitude"] is not None else None
+        longitude = float(location["longitude"]) if location["longitude"] is not None else None
+        zip_code = location["zip_code"].replace("'", "''") if location["zip_code"] else None
+        country = location["country"].replace("'", "''") if location["country"] else None
+        ville = location["ville"].replace("'", "''") if location["ville"] else None
+
+        with get_cursor() as cursor:
+            # Insert restaurant data
+            cursor.execute(
+                """
+                INSERT INTO restaurants (restaurant_name, restaurant_avg_review, restaurant_price, restaurant_total_reviews, restaurant_type, restaurant_url)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING restaurant_id
+                """,
+                (restaurant_name, restaurant_avg_review, restaurant_price, restaurant_reviews, restaurant_type_resto, restaurant_url)
+            )
+            restaurant_id = cursor.fetchone()[0]
+
+            # Insert location data
+            cursor.execute(
+                """
+                INSERT INTO locations (restaurant_id, address, latitude, longitude, code_postal, ville, country)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """,
+                (restaurant_id, address, latitude, longitude, zip_code, ville, country)
+            )
+            _bump_data_version(cursor, "restaurants")
+
+        return pd.DataFrame([{
+            "restaurant_id": restaurant_id,
+            "restaurant_name": restaurant_name,
+            "restaurant_avg_review": restaurant_avg_review,
+            "restaurant_price": restaurant_price,
+            "restaurant_total_reviews": restaurant_reviews,
+            "restaurant_type": restaurant_type_resto,
+            "restaurant_url": restaurant_url
+        }])
+    except psycopg2.Error as err:
+        print(err)
+
+def delete_reviews_by_restaurant_id(restaurant_id):
+    """
+    Delete all reviews for a specific restaurant, along with its review summary,
+    term counts and scraping checkpoint.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+    """
+    try:
+        with get_cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM reviews WHERE restaurant_id = %s",
+                (int(restaurant_id),)
+            )
+            cursor.execute(
+                "DELETE FROM restaurant_review_stats WHERE restaurant_id = %s",
+                (int(restaurant_id),)
+            )
+            cursor.execute(
+                "DELETE FROM review_term_counts WHERE restaurant_id = %s",
+                (int(restaurant_id),)
+            )
+            cursor.execute(
+                "DELETE FROM scrape_checkpoints WHERE restaurant_id = %s",
+                (int(restaurant_id),)
+            )
+            _bump_data_version(cursor, "reviews")
+    except psycopg2.Error as err:
+        print(err)
+        
+        
+def restaurant_exists(restaurant_url):
+    """
+    Check if a restaurant exists in the database by its URL.
+
+    Args:
+        restaurant_url (str): The URL of the restaurant.
+
+    Returns:
+        bool: True if the restaurant exists, False otherwise.
+    """
+    try:
+        with get_cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM restaurants WHERE restaurant_url = %s",
+                (restaurant_url,)
+            )
+            return cursor.fetchone() is not None
+    except psycopg2.Error as err:
+        print(err)
+        return False
+
+def get_downloaded_restaurants():
+    """
+    Fetch restaurants that have been downloaded.
+
+    Returns:
+        pd.DataFrame: DataFrame containing downloaded restaurants.
+    """
+    try:
+        return fetch_dataframe("""
+            SELECT r.restaurant_id,
+                r.restaurant_name,
+                r.restaurant_avg_review,
+                r.restaurant_price,
+                r.restaurant_type, 
+                r.restaurant_total_reviews,
+                r.restaurant_url,
+                r.restaurant_about,
+                l.address,
+                l.latitude, 
+                l.longitude,
+                l.country,
+                l.ville
+            FROM restaurants r
+            JOIN locations l ON r.restaurant_id = l.restaurant_id
+            JOIN restaurant_review_stats s ON s.restaurant_id = r.restaurant_id
+            WHERE s.review_count > 0
+        """)
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def get_restaurant_by_id(restaurant_ids, min_contributions=None):
+    """
+    Fetch the reviews of restaurants by their IDs, with the restaurant attributes
+    needed by the NLP steps.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs to fetch.
+        min_contributions (float): If set, only keep reviews whose author has at
+                                   least this many contributions.
+
+    Returns:
+        pd.DataFrame: DataFrame containing one row per review of the specified restaurants.
+    """
+    try:
+        query = """
+            SELECT 
+                r.restaurant_id,
+                r.restaurant_name,
+                r.restaurant_type,
+                r.restaurant_price,
+                r2.review_id,
+                r2.rating,
+                r2.review_text,
+                r2.contributions 
+            FROM restaurants r
+            JOIN reviews r2 ON r2.restaurant_id = r.restaurant_id 
+            WHERE r.restaurant_id = ANY(%s)
+              AND (%s IS NULL OR r2.contributions >= %s)
+        """
+        params = ([int(id) for id in restaurant_ids], min_contributions, min_contributions)
+        return fetch_dataframe(query, params, categorical=True)
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def get_review_tokens(review_ids, config_hash):
+    """
+    Fetch the stored cleaned text of reviews for a preprocessing configuration.
+
+    Args:
+        review_ids (list): List of review IDs.
+        config_hash (str): Hash of the preprocessing configuration.
+
+    Returns:
+        dict: Mapping of review ID to cleaned text, for the reviews already processed.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                SELECT review_id, cleaned_text
+                FROM review_tokens
+                WHERE config_hash = %s AND review_id = ANY(%s)
+                """,
+                (config_hash, [int(id) for id in review_ids])
+            )
+            return dict(cursor.fetchall())
+    except psycopg2.Error as err:
+        print(err)
+        return {}
+
+
+def save_review_tokens(review_ids, cleaned_texts, config_hash):
+    """
+    Store the cleaned text of reviews for a preprocessing configuration.
+
+    Args:
+        review_ids (list): List of review IDs.
+        cleaned_texts (list): Cleaned text of each review.
+        config_hash (str): Hash of the preprocessing configuration.
+    """
+    rows = [(int(id), config_hash, text) for id, text in zip(review_ids, cleaned_texts)]
+    try:
+        with get_cursor() as cursor:
+            psycopg2.extras.execute_values(
+                cursor,
+                """
+                INSERT INTO review_tokens (review_id, config_hash, cleaned_text)
+                VALUES %s
+                ON CONFLICT (review_id, config_hash) DO UPDATE SET cleaned_text = EXCLUDED.cleaned_text
+                """,
+                rows,
+                page_size=REVIEWS_BATCH_SIZE
+            )
+    except psycopg2.Error as err:
+        print(err)
+
+
+# Columns of the review_scores table, besides review_id
+REVIEW_SCORE_COLUMNS = [
+    "polarity", "anger", "anticipation", "disgust", "fear",
+    "joy", "negative", "positive", "sadness", "surprise", "trust"
+]
+
+
+def get_review_scores(review_ids):
+    """
+    Fetch the stored sentiment and emotion scores of reviews.
+
+    Args:
+        review_ids (list): List of review IDs.
+
+    Returns:
+        pd.DataFrame: DataFrame with review_id and the score columns, for the reviews already scored.
+    """
+    try:
+        return fetch_dataframe(
+            "SELECT review_id, %s FROM review_scores WHERE review_id = ANY(%%s)" % ", ".join(REVIEW_SCORE_COLUMNS),
+            ([int(id) for id in review_ids],)
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def get_unscored_reviews(limit, after_review_id=0):
+    """
+    Fetch reviews that have no stored scores yet, in review ID order.
+
+    Args:
+        limit (int): Maximum number of reviews to fetch.
+        after_review_id (int): Only fetch reviews with a greater ID.
+
+    Returns:
+        pd.DataFrame: DataFrame with review_id and review_text.
+    """
+    try:
+        return fetch_dataframe(
+            """
+            SELECT r.review_id, r.review_text
+            FROM reviews r
+            LEFT JOIN review_scores s ON s.review_id = r.review_id
+            WHERE s.review_id IS NULL AND r.review_text IS NOT NULL
+              AND r.review_id > %s
+            ORDER BY r.review_id
+            LIMIT %s
+            """,
+            (int(after_review_id), int(limit))
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def save_review_scores(scores):
+    """
+    Store sentiment and emotion scores of reviews.
+
+    Args:
+        scores (pd.DataFrame): DataFrame with review_id and the score columns.
+    """
+    columns = ["review_id"] + REVIEW_SCORE_COLUMNS
+    rows = [
+        (int(row[0]),) + tuple(None if pd.isna(value) else float(value) for value in row[1:])
+        for row in scores[columns].itertuples(index=False)
+    ]
+    try:
+        with get_cursor() as cursor:
+            psycopg2.extras.execute_values(
+                cursor,
+                """
+                INSERT INTO review_scores (%s)
+                VALUES %%s
+                ON CONFLICT (review_id) DO UPDATE SET %s
+                """ % (
+                    ", ".join(columns),
+                    ", ".join(f"{column} = EXCLUDED.{column}" for column in REVIEW_SCORE_COLUMNS)
+                ),
+                rows,
+                page_size=REVIEWS_BATCH_SIZE
+            )
+            _bump_data_version(cursor, "review_scores")
+    except psycopg2.Error as err:
+        print(err)
+
+
+def get_restaurant_embeddings():
+    """
+    Fetch the stored vector of every restaurant.
+
+    Returns:
+        tuple: Array of restaurant IDs and (restaurants x vector_size) array of vectors.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute("SELECT restaurant_id, embedding FROM restaurant_embeddings ORDER BY restaurant_id")
+            rows = cursor.fetchall()
+    except psycopg2.Error as err:
+        print(err)
+        rows = []
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    restaurant_ids, embeddings = zip(*rows)
+    return np.array(restaurant_ids, dtype=np.int64), np.array(embeddings, dtype=np.float32)
+
+
+def save_restaurant_embeddings(restaurant_ids, embeddings, review_counts, model_version=0):
+    """
+    Store the vectors of restaurants.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+        embeddings (np.ndarray): (restaurants x vector_size) array of vectors.
+        review_counts (list): Number of reviews each vector was computed from.
+        model_version (int): Version of the Word2Vec model the vectors come from.
+    """
+    rows = [
+        (int(id), [float(value) for value in embedding], int(count), int(model_version))
+        for id, embedding, count in zip(restaurant_ids, embeddings, review_counts)
+    ]
+    try:
+        with get_cursor() as cursor:
+            psycopg2.extras.execute_values(
+                cursor,
+                """
+                INSERT INTO restaurant_embeddings (restaurant_id, embedding, review_count, model_version)
+                VALUES %s
+                ON CONFLICT (restaurant_id) DO UPDATE SET
+                    embedding = EXCLUDED.embedding,
+                    review_count = EXCLUDED.review_count,
+                    model_version = EXCLUDED.model_version,
+                    updated_at = now()
+                """,
+                rows
+            )
+            _bump_data_version(cursor, "restaurant_embeddings")
+    except psycopg2.Error as err:
+        print(err)
+
+
+def get_outdated_restaurant_embeddings(model_version):
+    """
+    Fetch the restaurants whose vector is missing or comes from an older
+    Word2Vec model. Restaurants without any review text have no vector and
+    are left out.
+
+    Args:
+        model_version (int): The current version of the model.
+
+    Returns:
+        list: Restaurant IDs.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                SELECT r.restaurant_id
+                FROM restaurants r
+                LEFT JOIN restaurant_embeddings e ON e.restaurant_id = r.restaurant_id
+                WHERE (e.restaurant_id IS NULL OR e.model_version < %s)
+                  AND EXISTS (
+                      SELECT 1 FROM reviews v
+                      WHERE v.restaurant_id = r.restaurant_id AND v.review_text IS NOT NULL
+                  )
+                ORDER BY r.restaurant_id
+                """,
+                (int(model_version),)
+            )
+            return [row[0] for row in cursor.fetchall()]
+    except psycopg2.Error as err:
+        print(err)
+        return []
+
+
+def get_term_counts(restaurant_ids, config_hash):
+    """
+    Fetch the term counts of restaurants, summed over the restaurants.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+        config_hash (str): Hash of the preprocessing configuration.
+
+    Returns:
+        pd.DataFrame: DataFrame with rating_bucket, term and term_count columns.
+    """
+    try:
+        return fetch_dataframe(
+            """
+            SELECT rating_bucket, term, SUM(term_count)::int AS term_count
+            FROM review_term_counts
+            WHERE config_hash = %s AND restaurant_id = ANY(%s)
+            GROUP BY rating_bucket, term
+            """,
+            (config_hash, [int(id) for id in restaurant_ids])
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame(columns=["rating_bucket", "term", "term_count"])
+
+
+def get_term_indexed_restaurants(restaurant_ids, config_hash):
+    """
+    Find which restaurants already have their term counts stored.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+        config_hash (str): Hash of the preprocessing configuration.
+
+    Returns:
+        set: IDs of the indexed restaurants.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                SELECT DISTINCT restaurant_id
+                FROM review_term_counts
+                WHERE config_hash = %s AND restaurant_id = ANY(%s)
+                """,
+                (config_hash, [int(id) for id in restaurant_ids])
+            )
+            return {row[0] for row in cursor.fetchall()}
+    except psycopg2.Error as err:
+        print(err)
+        return set()
+
+
+def save_term_counts(restaurant_id, config_hash, term_counts):
+    """
+    Replace the stored term counts of a restaurant.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        config_hash (str): Hash of the preprocessing configuration.
+        term_counts (pd.DataFrame): DataFrame with rating_bucket, term and term_count columns.
+    """
+    rows = [
+        (int(restaurant_id), config_hash, bucket, term, int(count))
+        for bucket, term, count in term_counts[["rating_bucket", "term", "term_count"]].itertuples(index=False)
+    ]
+    try:
+        with get_cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM review_term_counts WHERE restaurant_id = %s AND config_hash = %s",
+                (int(restaurant_id), config_hash)
+            )
+            psycopg2.extras.execute_values(
+                cursor,
+                """
+                INSERT INTO review_term_counts (restaurant_id, config_hash, rating_bucket, term, term_count)
+                VALUES %s
+                """,
+                rows,
+                page_size=REVIEWS_BATCH_SIZE
+            )
+    except psycopg2.Error as err:
+        print(err)
+
+
+def get_contributions_median(restaurant_ids):
+    """
+    Compute the median number of contributions of the authors of the reviews
+    of the specified restaurants.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+
+    Returns:
+        float: The median number of contributions, or None if unknown.
+    """
+    try:
+        with get_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY contributions)
+                FROM reviews
+                WHERE restaurant_id = ANY(%s)
+                """,
+                ([int(id) for id in restaurant_ids],)
+            )
+            return cursor.fetchone()[0]
+    except psycopg2.Error as err:
+        print(err)
+        return None
+
+
+def get_restaurant_review_stats(restaurant_ids, min_contributions=None):
+    """
+    Compute review statistics per restaurant in the database.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+        min_contributions (float): If set, only consider reviews whose author has
+                                   at least this many contributions.
+
+    Returns:
+        pd.DataFrame: One row per restaurant with review_count, average_rating,
+                      weighted_average_rating (weighted by contributions),
+                      median_contributions, first_comment_date and last_comment_date.
+    """
+    try:
+        return fetch_dataframe(
+            """
+            SELECT
+                r.restaurant_id,
+                r.restaurant_name,
+                COUNT(*) AS review_count,
+                AVG(r2.rating)::float AS average_rating,
+                (SUM(r2.rating * COALESCE(r2.contributions, 1))::float
+                    / NULLIF(SUM(COALESCE(r2.contributions, 1)), 0)) AS weighted_average_rating,
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY r2.contributions) AS median_contributions,
+                MIN(r2.date) AS first_comment_date,
+                MAX(r2.date) AS last_comment_date
+            FROM restaurants r
+            JOIN reviews r2 ON r2.restaurant_id = r.restaurant_id
+            WHERE r.restaurant_id = ANY(%s)
+              AND (%s IS NULL OR r2.contributions >= %s)
+            GROUP BY r.restaurant_id, r.restaurant_name
+            ORDER BY r.restaurant_name
+            """,
+            ([int(id) for id in restaurant_ids], min_contributions, min_contributions)
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def get_rating_histograms(restaurant_ids, min_contributions=None):
+    """
+    Count the reviews of each rating (1 to 5) per restaurant in the database.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+        min_contributions (float): If set, only consider reviews whose author has
+                                   at least this many contributions.
+
+    Returns:
+        pd.DataFrame: One row per restaurant with columns rating_1 to rating_5.
+    """
+    try:
+        return fetch_dataframe(
+            """
+            SELECT
+                r.restaurant_id,
+                r.restaurant_name,
+                COUNT(*) FILTER (WHERE r2.rating = 1) AS rating_1,
+                COUNT(*) FILTER (WHERE r2.rating = 2) AS rating_2,
+                COUNT(*) FILTER (WHERE r2.rating = 3) AS rating_3,
+                COUNT(*) FILTER (WHERE r2.rating = 4) AS rating_4,
+                COUNT(*) FILTER (WHERE r2.rating = 5) AS rating_5
+            FROM restaurants r
+            JOIN reviews r2 ON r2.restaurant_id = r.restaurant_id
+            WHERE r.restaurant_id = ANY(%s)
+              AND (%s IS NULL OR r2.contributions >= %s)
+            GROUP BY r.restaurant_id, r.restaurant_name
+            ORDER BY r.restaurant_name
+            """,
+            ([int(id) for id in restaurant_ids], min_contributions, min_contributions)
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def get_reviews_one_restaurant(id):
+    """
+    Fetch reviews for a specific restaurant.
+
+    Args:
+        id (int): The ID of the restaurant.
+
+    Returns:
+        pd.DataFrame: DataFrame containing reviews for the specified restaurant.
+    """
+    try:
+        return fetch_dataframe(
+            "SELECT * FROM REVIEWS WHERE restaurant_id = %s",
+            (int(id),)
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def enqueue_scrape_job(job_type, restaurant_url, restaurant_id=None, total_reviews=None):
+    """
+    Add a scraping job to the queue, unless the same restaurant already has a
+    queued or running job.
+
+    Args:
+        job_type (str): 'new' to scrape a new restaurant, 'update' to replace the reviews of a restaurant,
+            'refresh' to add its new reviews only.
+        restaurant_url (str): URL of the restaurant, relative to the TripAdvisor domain.
+        restaurant_id (int): The ID of the restaurant, for 'update' jobs.
+        total_reviews (int): Number of reviews announced by TripAdvisor, for 'update' jobs.
+
+    Returns:
+        int: The ID of the job (the existing one if the restaurant already has one).
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            # The partial unique index idx_scrape_jobs_active_url rejects a
+            # second active job for the restaurant, even from concurrent calls
+            for _ in range(3):
+                cursor.execute(
+                    """
+                    INSERT INTO scrape_jobs (job_type, restaurant_url, restaurant_id, total_reviews)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (restaurant_url) WHERE status IN ('queued', 'running') DO NOTHING
+                    RETURNING job_id
+                    """,
+                    (
+                        job_type, restaurant_url,
+                        None if restaurant_id is None else int(restaurant_id),
+                        None if total_reviews is None else int(total_reviews)
+                    )
+                )
+                inserted = cursor.fetchone()
+                if inserted:
+                    return inserted[0]
+                cursor.execute(
+                    """
+                    SELECT job_id FROM scrape_jobs
+                    WHERE restaurant_url = %s AND status IN ('queued', 'running')
+                    """,
+                    (restaurant_url,)
+                )
+                existing = cursor.fetchone()
+                # Otherwise the existing job finished between the two statements
+                if existing:
+                    return existing[0]
+            return None
+    except psycopg2.Error as err:
+        print(err)
+        return None
+
+
+def claim_scrape_job(worker):
+    """
+    Take the oldest queued job and mark it as running. Jobs locked by another
+    worker are skipped, so several workers can poll the queue, and so are the
+    retried jobs whose backoff delay is not over.
+
+    Args:
+        worker (str): Name of the worker.
+
+    Returns:
+        dict: The claimed job, or None if the queue is empty.
+    """
+    try:
+        with get_cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(
+                """
+                UPDATE scrape_jobs
+                SET status = 'running', worker = %s, attempts = attempts + 1,
+                    started_at = NOW(), heartbeat_at = NOW()
+                WHERE job_id = (
+                    SELECT job_id FROM scrape_jobs
+                    WHERE status = 'queued'
+                      AND (not_before IS NULL OR not_before <= NOW())
+                    ORDER BY job_id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING *
+                """,
+                (worker,)
+            )
+            job = cursor.fetchone()
+            return dict(job) if job else None
+    except psycopg2.Error as err:
+        print(err)
+        return None
+
+
+def update_scrape_job(job_id, progress=None, message=None, log=None, restaurant_id=None,
+                      total_reviews=None, reviews_downloaded=None):
+    """
+    Record the progress of a running job and refresh its heartbeat.
+
+    Args:
+        job_id (int): The ID of the job.
+        progress (float): Progress between 0 and 1.
+        message (str): Current status message.
+        log (str): Line appended to the logs of the job.
+        restaurant_id (int): The ID of the restaurant, once created by a 'new' job.
+        total_reviews (int): Number of reviews announced by TripAdvisor, once scraped by a 'new' job.
+        reviews_downloaded (int): Number of reviews saved so far.
+    """
+    try:
+        with get_cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE scrape_jobs
+                SET progress = COALESCE(%s, progress),
+                    message = COALESCE(%s, message),
+                    logs = CASE WHEN %s IS NULL THEN logs ELSE array_append(logs, %s) END,
+                    restaurant_id = COALESCE(%s, restaurant_id),
+                    total_reviews = COALESCE(%s, total_reviews),
+                    reviews_downloaded = COALESCE(%s, reviews_downloaded),
+                    heartbeat_at = NOW()
+                WHERE job_id = %s
+                """,
+                (
+                    progress, message, log, log,
+                    None if restaurant_id is None else int(restaurant_id),
+                    None if total_reviews is None else int(total_reviews),
+                    reviews_downloaded, int(job_id)
+                )
+            )
+    except psycopg2.Error as err:
+        print(err)
+
+
+def finish_scrape_job(job_id, status, message=None):
+    """
+    Mark a job as done or failed.
+
+    Args:
+        job_id (int): The ID of the job.
+        status (str): 'done' or 'failed'.
+        message (str): Final status message, also appended to the logs.
+    """
+    try:
+        with get_cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE scrape_jobs
+                SET status = %s,
+                    progress = CASE WHEN %s = 'done' THEN 1 ELSE progress END,
+                    message = COALESCE(%s, message),
+                    logs = CASE WHEN %s IS NULL THEN logs ELSE array_append(logs, %s) END,
+                    finished_at = NOW(), heartbeat_at = NOW()
+                WHERE job_id = %s
+                """,
+                (status, status, message, message, message, int(job_id))
+            )
+    except psycopg2.Error as err:
+        print(err)
+
+
+def retry_scrape_job(job_id, message=None, delay=0):
+    """
+    Put a failed job back in the queue, to be run again by any worker once
+    the delay is over.
+
+    Args:
+        job_id (int): The ID of the job.
+        message (str): Status message, also appended to the logs.
+        delay (float): Seconds before the job can be claimed again.
+    """
+    try:
+        with get_cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE scrape_jobs
+                SET status = 'queued',
+                    worker = NULL,
+                    message = COALESCE(%s, message),
+                    logs = CASE WHEN %s IS NULL THEN logs ELSE array_append(logs, %s) END,
+                    heartbeat_at = NOW(),
+                    not_before = NOW() + make_interval(secs => %s)
+                WHERE job_id = %s
+                """,
+                (message, message, message, float(delay), int(job_id))
+            )
+    except psycopg2.Error as err:
+        print(err)
+
+
+def requeue_stale_scrape_jobs(timeout, max_attempts):
+    """
+    Put back in the queue the running jobs whose worker stopped sending
+    heartbeats, and fail the ones that already used all their attempts.
+
+    Args:
+        timeout (int): Seconds without heartbeat after which a job is stale.
+        max_attempts (int): Maximum number of runs of a job.
+
+    Returns:
+        int: Number of requeued jobs.
+    """
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                UPDATE scrape_jobs
+                SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+                    message = 'Worker interrompu',
+                    worker = NULL,
+                    finished_at = CASE WHEN attempts >= %s THEN NOW() END
+                WHERE status = 'running'
+                  AND heartbeat_at < NOW() - make_interval(secs => %s)
+                RETURNING status
+                """,
+                (max_attempts, max_attempts, timeout)
+            )
+            return sum(1 for (status,) in cursor.fetchall() if status == "queued")
+    except psycopg2.Error as err:
+        print(err)
+        return 0
+
+
+def get_scrape_jobs(limit=20):
+    """
+    Fetch the most recent scraping jobs.
+
+    Args:
+        limit (int): Maximum number of jobs.
+
+    Returns:
+        pd.DataFrame: DataFrame of the jobs with the name of their restaurant.
+    """
+    try:
+        return fetch_dataframe(
+            """
+            SELECT j.job_id, j.job_type, j.restaurant_url, j.restaurant_id, r.restaurant_name,
+                   j.status, j.progress, j.message, j.logs, j.reviews_downloaded,
+                   j.created_at, j.started_at, j.finished_at
+            FROM scrape_jobs j
+            LEFT JOIN restaurants r ON r.restaurant_id = j.restaurant_id
+            ORDER BY j.job_id DESC
+            LIMIT %s
+            """,
+            (int(limit),)
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def get_geocode_cache(backend, address_keys, ttl):
+    """
+    Fetch the cached geocoding results of normalized addresses.
+
+    Args:
+        backend (str): Name of the geocoding backend.
+        address_keys (list): Normalized addresses.
+        ttl (float): Maximum age of the entries, in seconds.
+
+    Returns:
+        dict: Mapping of each cached address key to its result (dict, or None
+        if the backend found no match). Missing and expired keys are absent.
+    """
+    if not address_keys:
+        return {}
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            cursor.execute(
+                """
+                SELECT address_key, result FROM geocode_cache
+                WHERE backend = %s AND address_key = ANY(%s)
+                  AND updated_at > NOW() - %s * INTERVAL '1 second'
+                """,
+                (backend, list(address_keys), float(ttl))
+            )
+            return dict(cursor.fetchall())
+    except psycopg2.Error as err:
+        print(err)
+        return {}
+
+
+def save_geocode_cache(backend, entries):
+    """
+    Store geocoding results, replacing the previous ones.
+
+    Args:
+        backend (str): Name of the geocoding backend.
+        entries (list): (address_key, address, result) tuples, result being None if no match was found.
+    """
+    if not entries:
+        return
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            psycopg2.extras.execute_values(
+                cursor,
+                """
+                INSERT INTO geocode_cache (backend, address_key, address, result)
+                VALUES %s
+                ON CONFLICT (backend, address_key) DO UPDATE SET
+                    address = EXCLUDED.address,
+                    result = EXCLUDED.result,
+                    updated_at = NOW()
+                """,
+                [
+                    (backend, address_key, address, None if result is None else psycopg2.extras.Json(result))
+                    for address_key, address, result in entries
+                ],
+                page_size=len(entries)
+            )
+    except psycopg2.Error as err:
+        print(err)
+
+
+def get_locations_without_coordinates(limit, after_location_id=0):
+    """
+    Fetch locations that have an address but no coordinates, in location ID order.
+
+    Args:
+        limit (int): Maximum number of locations to fetch.
+        after_location_id (int): Only fetch locations with a greater ID.
+
+    Returns:
+        pd.DataFrame: DataFrame with location_id, restaurant_id and address.
+    """
+    try:
+        return fetch_dataframe(
+            """
+            SELECT location_id, restaurant_id, address
+            FROM locations
+            WHERE (latitude IS NULL OR longitude IS NULL) AND address IS NOT NULL
+              AND location_id > %s
+            ORDER BY location_id
+            LIMIT %s
+            """,
+            (int(after_location_id), int(limit))
+        )
+    except psycopg2.Error as err:
+        print(err)
+        return pd.DataFrame()
+
+
+def update_location_coordinates(locations):
+    """
+    Update the geocoded fields of locations.
+
+    Args:
+        locations (list): (location_id, result) tuples, result being a dict
+            as returned by utils.geocoding.geocode.
+    """
+    if not locations:
+        return
+    try:
+        with get_cursor(cursor_factory=None) as cursor:
+            psycopg2.extras.execute_values(
+                cursor,
+                """
+                UPDATE locations SET
+                    address = COALESCE(v.address, locations.address),
+                    latitude = v.latitude,
+                    longitude = v.longitude,
+                    code_postal = COALESCE(v.code_postal, locations.code_postal),
+                    ville = COALESCE(v.ville, locations.ville),
+                    country = COALESCE(v.country, locations.country)
+                FROM (VALUES %s) AS v (location_id, address, latitude, longitude, code_postal, ville, country)
+                WHERE locations.location_id = v.location_id
+                """,
+                [
+                    (
+                        int(location_id), result.get("address"), result.get("latitude"), result.get("longitude"),
+                        result.get("zip_code"), result.get("ville"), result.get("country")
+                    )
+                    for location_id, result in locations
+                ],
+                template="(%s, %s, %s::REAL, %s::REAL, %s, %s, %s)",
+                page_size=len(locations)
+            )
+            _bump_data_version(cursor, "restaurants")
     except psycopg2.Error as err:
         print(err)
-        return pd.DataFrame()
-    finally:
-        cursor.close()
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Removal of the duplicate reviews of existing tables.
+
+Reviews are identified by their review_hash (see utils.db.review_hash). This
+job fills the missing hashes, deletes the duplicates in batches, keeping the
+oldest copy of each review, then creates the unique index that prevents new
+duplicates:
+
+    python -m utils.dedup [--batch-size 500]
+"""
+
+import argparse
+from utils.db import (
+    REVIEWS_BATCH_SIZE,
+    add_review_hash_column,
+    hash_reviews,
+    delete_duplicate_reviews,
+    create_review_hash_index,
+)
+
+
+def deduplicate_reviews(batch_size: int = None) -> dict:
+    """
+    Delete the duplicate reviews, batch by batch.
+
+    Args:
+        batch_size (int): Number of reviews hashed or deleted and committed at once.
+                          Defaults to REVIEWS_BATCH_SIZE.
+
+    Returns:
+        dict: Number of reviews removed per restaurant ID.
+    """
+    batch_size = batch_size or REVIEWS_BATCH_SIZE
+    add_review_hash_column()
+
+    hashed = 0
+    last_review_id = 0
+    while True:
+        count, last_review_id = hash_reviews(batch_size, last_review_id)
+        if last_review_id is None:
+            break
+        if count:
+            hashed += count
+            print(f"Hashed {hashed} reviews")
+
+    removed = {}
+    last_review_id = 0
+    while True:
+        batch, last_review_id = delete_duplicate_reviews(batch_size, last_review_id)
+        for restaurant_id, count in batch.items():
+            removed[restaurant_id] = removed.get(restaurant_id, 0) + count
+        if last_review_id is None:
+            break
+        print(f"Removed {sum(removed.values())} duplicate reviews")
+
+    if not create_review_hash_index():
+        print("The unique index on review_hash could not be created")
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove the duplicate reviews.")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    removed = deduplicate_reviews(args.batch_size)
+    for restaurant_id, count in sorted(removed.items()):
+        print(f"  restaurant {restaurant_id}: {count} duplicate reviews removed")
+    print(f"Done: {sum(removed.values())} duplicate reviews removed from {len(removed)} restaurants")
@@ -0,0 +1,294 @@
+"""
+Corpus-wide Word2Vec model of the review vocabulary.
+
+The model is trained once on every review in the database and saved under
+MODELS_DIR. Its KeyedVectors are saved separately and memory-mapped for the
+lookups of the similarity analysis; each save writes new files and switches
+the pointer file KEYED_VECTORS_POINTER to them. When new reviews are scraped, the model is
+updated incrementally (new words added to the vocabulary, then trained on the
+new reviews only). Each save bumps the 'word2vec' data version, which the
+vectors derived from the model record (see utils.projection).
+"""
+
+import os
+import glob
+import time
+import threading
+from itertools import chain
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from gensim.models import Word2Vec, KeyedVectors
+
+MODELS_DIR = os.environ.get(
+    "MODELS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+)
+WORD2VEC_PATH = os.path.join(MODELS_DIR, "word2vec.model")
+# Holds the file name of the current KeyedVectors, e.g. word2vec-<timestamp>.kv
+KEYED_VECTORS_POINTER = os.path.join(MODELS_DIR, "word2vec.kv.current")
+
+WORD2VEC_PARAMS = {
+    "vector_size": 100,
+    "window": 5,
+    "min_count": 1,
+    "workers": 4,
+    "sg": 0,  # 1 = skip-gram, 0 = CBOW
+    "seed": 42,
+}
+
+# Reentrant: build_word2vec_from_database holds it while train_word2vec takes it
+_model_lock = threading.RLock()
+_keyed_vectors = None
+_keyed_vectors_name = None
+
+
+def tokenize_reviews(df):
+    """
+    Tokenize the cleaned text of reviews for Word2Vec.
+
+    The cleaned text is already made of space-separated tokens, so it is only
+    lower-cased and split.
+
+    Args:
+        df (pd.DataFrame): The input dataframe containing 'cleaned_text' column.
+
+    Returns:
+        list: One list of tokens per review.
+    """
+    return df["cleaned_text"].str.lower().str.split().tolist()
+
+
+def _current_keyed_vectors_name():
+    try:
+        with open(KEYED_VECTORS_POINTER, encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _save_keyed_vectors(model):
+    """
+    Save the model's KeyedVectors with the vectors in a separate .npy file so
+    they can be memory-mapped. Each save writes files under a new name, then
+    switches the pointer file to them with a single rename: saved files are
+    never rewritten, so a reader always gets the vocabulary and the vectors of
+    the same save. The files of the previous save are kept for the readers
+    that are still loading them; older ones are deleted.
+    """
+    name = f"word2vec-{time.time_ns()}.kv"
+    model.wv.save(os.path.join(MODELS_DIR, name), separately=["vectors"])
+
+    previous = _current_keyed_vectors_name()
+    temporary_path = f"{KEYED_VECTORS_POINTER}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        file.write(name)
+    os.replace(temporary_path, KEYED_VECTORS_POINTER)
+
+    kept = {name, previous}
+    for path in glob.glob(os.path.join(MODELS_DIR, "word2vec-*.kv*")):
+        if os.path.basename(path).split(".vectors.npy")[0] not in kept:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def train_word2vec(token_lists):
+    """
+    Train the Word2Vec model from scratch and save it.
+
+    Args:
+        token_lists (list): One list of tokens per review.
+
+    Returns:
+        KeyedVectors: The memory-mapped word vectors.
+    """
+    with _model_lock:
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        model = Word2Vec(sentences=token_lists, **WORD2VEC_PARAMS)
+        model.save(WORD2VEC_PATH)
+        _save_keyed_vectors(model)
+        _bump_model_version()
+    return load_keyed_vectors()
+
+
+def update_word2vec(token_lists):
+    """
+    Update the saved Word2Vec model with new reviews.
+
+    New words are added to the vocabulary and the model is trained on the new
+    reviews only. The model is trained from scratch if none is saved yet.
+
+    Args:
+        token_lists (list): One list of tokens per new review.
+
+    Returns:
+        KeyedVectors: The memory-mapped word vectors.
+    """
+    token_lists = [tokens for tokens in token_lists if tokens]
+    if not os.path.exists(WORD2VEC_PATH):
+        return build_word2vec_from_database()
+    if not token_lists:
+        return load_keyed_vectors()
+    with _model_lock:
+        model = Word2Vec.load(WORD2VEC_PATH)
+        model.build_vocab(token_lists, update=True)
+        model.train(token_lists, total_examples=len(token_lists), epochs=model.epochs)
+        model.save(WORD2VEC_PATH)
+        _save_keyed_vectors(model)
+        _bump_model_version()
+    return load_keyed_vectors()
+
+
+def _bump_model_version():
+    # Imported here as utils.functions depends on this module
+    from utils.db import bump_data_version
+    bump_data_version("word2vec")
+
+
+def get_model_version():
+    """
+    Get the version of the saved Word2Vec model, incremented each time it is saved.
+
+    Returns:
+        int: The version, 0 if the model was never saved.
+    """
+    from utils.db import get_data_versions
+    return int(get_data_versions().get("word2vec") or 0)
+
+
+def load_keyed_vectors():
+    """
+    Load the saved word vectors, memory-mapped, reloading them if they were updated.
+
+    Returns:
+        KeyedVectors: The word vectors, or None if no model has been trained yet.
+    """
+    global _keyed_vectors, _keyed_vectors_name
+    name = _current_keyed_vectors_name()
+    if name is None:
+        return None
+    if _keyed_vectors is None or name != _keyed_vectors_name:
+        _keyed_vectors = KeyedVectors.load(os.path.join(MODELS_DIR, name), mmap="r")
+        _keyed_vectors_name = name
+    return _keyed_vectors
+
+
+def build_word2vec_from_database():
+    """
+    Train the Word2Vec model on every review of the database, unless another
+    thread trained it while this one was waiting for the model lock.
+
+    Returns:
+        KeyedVectors: The memory-mapped word vectors, or None if there are no reviews.
+    """
+    # Imported here as utils.functions depends on this module
+    from utils.db import get_all_reviews
+    from utils.functions import clean_text_df
+
+    with _model_lock:
+        if os.path.exists(WORD2VEC_PATH):
+            if _current_keyed_vectors_name() is None:
+                # Model saved before the vectors were versioned: export them again
+                os.makedirs(MODELS_DIR, exist_ok=True)
+                _save_keyed_vectors(Word2Vec.load(WORD2VEC_PATH))
+            return load_keyed_vectors()
+        reviews = get_all_reviews()
+        if reviews.empty:
+            return None
+        reviews = reviews[reviews["review_text"].notna()]
+        token_lists = [tokens for tokens in tokenize_reviews(clean_text_df(reviews)) if tokens]
+        if not token_lists:
+            return None
+        return train_word2vec(token_lists)
+
+
+def get_keyed_vectors():
+    """
+    Get the corpus-wide word vectors, training the model on first use.
+
+    Returns:
+        KeyedVectors: The memory-mapped word vectors, or None if there are no reviews.
+    """
+    keyed_vectors = load_keyed_vectors()
+    if keyed_vectors is None:
+        keyed_vectors = build_word2vec_from_database()
+    return keyed_vectors
+
+
+def update_embeddings_with_reviews(review_texts):
+    """
+    Update the Word2Vec model with newly saved reviews. Only the reviews that
+    were just inserted are passed, so the reviews already in the model are not
+    trained on again.
+
+    Args:
+        review_texts (list): Texts of the inserted reviews.
+
+    Returns:
+        KeyedVectors: The memory-mapped word vectors.
+    """
+    from utils.functions import clean_text_df
+
+    review_texts = [text for text in review_texts if text]
+    if not review_texts:
+        return load_keyed_vectors()
+    reviews = clean_text_df(pd.DataFrame({"review_text": review_texts}))
+    return update_word2vec(tokenize_reviews(reviews))
+
+
+def review_vectors(token_lists, keyed_vectors):
+    """
+    Compute the mean word vector of each review.
+
+    Tokens are mapped to their index in the vocabulary to build a sparse
+    (reviews x words) count matrix, whose product with the embedding rows
+    gives the sum of the vectors of each review. Out-of-vocabulary tokens are
+    ignored and reviews without known tokens get a zero vector.
+
+    Args:
+        token_lists (list): One list of tokens per review.
+        keyed_vectors (KeyedVectors): The word vectors.
+
+    Returns:
+        np.ndarray: (reviews x vector_size) array of mean vectors.
+    """
+    token_lists = list(token_lists)
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+    word_ids = pd.Series(list(chain.from_iterable(token_lists)), dtype=object).map(keyed_vectors.key_to_index)
+    known = word_ids.notna().to_numpy()
+    reviews = np.repeat(np.arange(len(token_lists)), lengths)[known]
+
+    # Only read the embedding rows that are actually used
+    used_ids, columns = np.unique(word_ids[known].astype(np.int64).to_numpy(), return_inverse=True)
+    counts = sparse.csr_matrix(
+        (np.ones(len(columns)), (reviews, columns)),
+        shape=(len(token_lists), len(used_ids))
+    )
+    sums = counts @ np.asarray(keyed_vectors.vectors[used_ids], dtype=np.float64)
+    known_counts = np.asarray(counts.sum(axis=1)).ravel()
+    return np.divide(sums, known_counts[:, None], out=np.zeros_like(sums), where=known_counts[:, None] > 0)
+
+
+def restaurant_centroids(vectors, restaurant_ids, weights):
+    """
+    Compute the weighted mean vector of each restaurant with a single segment sum.
+
+    Args:
+        vectors (np.ndarray): (reviews x vector_size) array of review vectors.
+        restaurant_ids (array-like): Restaurant ID of each review.
+        weights (array-like): Weight of each review (its author's contributions).
+
+    Returns:
+        tuple: Sorted array of restaurant IDs and (restaurants x vector_size) array of centroids.
+    """
+    codes, restaurants = pd.factorize(np.asarray(restaurant_ids), sort=True)
+    weights = np.asarray(weights, dtype=np.float64)
+    segments = sparse.csr_matrix(
+        (weights, (codes, np.arange(len(codes)))),
+        shape=(len(restaurants), len(codes))
+    )
+    sums = segments @ vectors
+    totals = np.bincount(codes, weights=weights, minlength=len(restaurants))
+    centroids = np.divide(sums, totals[:, None], out=np.zeros_like(sums), where=totals[:, None] != 0)
+    return np.asarray(restaurants), centroids
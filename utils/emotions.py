@@ -0,0 +1,126 @@
+"""
+Vectorized NRC emotion lexicon scorer.
+
+The NRC lexicon shipped with NRCLex is loaded once into a sparse
+(vocabulary x emotions) matrix; a batch of tokenized reviews is then scored
+with a single sparse matrix product instead of one NRCLex object per review.
+
+Reviews are scored from the tokens of clean_text_df (lemmatized, lower case,
+without stop words), whereas NRCLex matched the raw words of the text, so the
+scores differ from the NRCLex ones; benchmarks.bench_emotions reports by how much.
+"""
+
+from itertools import chain
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from nrclex import NRCLex
+
+EMOTIONS = [
+    "anger", "anticipation", "disgust", "fear", "joy",
+    "negative", "positive", "sadness", "surprise", "trust"
+]
+# Older NRCLex releases abbreviate this emotion
+_EMOTION_ALIASES = {"anticip": "anticipation"}
+
+
+def load_nrc_lexicon() -> dict:
+    """
+    Load the NRC word -> emotions lexicon bundled with NRCLex.
+
+    Returns:
+        dict: Mapping of word to the list of its emotions.
+    """
+    lexicon = getattr(NRCLex, "lexicon", None)
+    if lexicon is None:
+        # NRCLex >= 4 loads the lexicon per instance
+        lexicon = getattr(NRCLex(), "__lexicon__")
+    return lexicon
+
+
+class NRCEmotionScorer:
+    """
+    Score tokenized texts against the NRC emotion lexicon.
+
+    Attributes:
+        vocabulary (dict): Mapping of lexicon word to its row in the matrix.
+        matrix (scipy.sparse.csr_matrix): Word x emotion indicator matrix.
+    """
+
+    def __init__(self, lexicon: dict = None) -> None:
+        lexicon = lexicon if lexicon is not None else load_nrc_lexicon()
+        emotion_index = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+        self.vocabulary = {}
+        rows, columns = [], []
+        for word, emotions in lexicon.items():
+            row = self.vocabulary.setdefault(word.lower(), len(self.vocabulary))
+            for emotion in emotions:
+                column = emotion_index.get(_EMOTION_ALIASES.get(emotion, emotion))
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(len(self.vocabulary), len(EMOTIONS))
+        )
+        # Entries merged into one row (same word in another case, or an emotion
+        # under both of its names) are summed: clip to 1 for an element-wise max
+        self.matrix.data = np.minimum(self.matrix.data, 1)
+
+    def raw_scores(self, token_lists) -> np.ndarray:
+        """
+        Count the emotion words of each tokenized text.
+
+        Args:
+            token_lists (list): One list of lower-case tokens per text.
+
+        Returns:
+            np.ndarray: (texts x emotions) array of emotion word counts.
+        """
+        token_lists = list(token_lists)
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        word_ids = pd.Series(list(chain.from_iterable(token_lists)), dtype=object).map(self.vocabulary)
+        known = word_ids.notna().to_numpy()
+        documents = np.repeat(np.arange(len(token_lists)), lengths)[known]
+        counts = sparse.csr_matrix(
+            (np.ones(known.sum()), (documents, word_ids[known].astype(np.int64).to_numpy())),
+            shape=(len(token_lists), len(self.vocabulary))
+        )
+        return (counts @ self.matrix).toarray()
+
+    def score(self, token_lists) -> pd.DataFrame:
+        """
+        Compute the normalized emotion scores of each tokenized text.
+
+        Each score is the share of the emotion among all the emotion words found
+        in the text, as NRCLex raw_emotion_scores normalized by their total;
+        emotions that do not appear are NaN.
+
+        Args:
+            token_lists (list): One list of lower-case tokens per text.
+
+        Returns:
+            pd.DataFrame: One row per text and one column per emotion.
+        """
+        raw = self.raw_scores(token_lists)
+        totals = raw.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            proportions = raw / totals
+        proportions[raw == 0] = np.nan
+        return pd.DataFrame(proportions, columns=EMOTIONS)
+
+
+_scorer = None
+
+
+def get_emotion_scorer() -> NRCEmotionScorer:
+    """
+    Get the process-wide emotion scorer, building it on first use.
+
+    Returns:
+        NRCEmotionScorer: The scorer.
+    """
+    global _scorer
+    if _scorer is None:
+        _scorer = NRCEmotionScorer()
+    return _scorer
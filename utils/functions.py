@@ -1,25 +1,48 @@
 import re
 import os
+import json
+import hashlib
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from textblob import TextBlob
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
 from sklearn.decomposition import PCA
 import nltk
-from nltk.stem.snowball import SnowballStemmer
-from nltk.tokenize import word_tokenize
-from gensim.models import Word2Vec
 from collections import Counter
 import altair as alt
 import requests
-from nrclex import NRCLex  # Add this import
+from utils.db import get_review_tokens, save_review_tokens
+from utils.normalization import normalize_texts
+from utils.scoring import EMOTIONS, get_or_compute_review_scores, score_reviews
+from utils.embeddings import (
+    get_keyed_vectors,
+    tokenize_reviews,
+    review_vectors,
+    restaurant_centroids,
+)
+from utils.projection import get_projection
+from utils.image_cache import render_wordcloud_png
+from utils.geocoding import GoogleGeocoder
+
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "wordnet": "corpora/wordnet",
+    "stopwords": "corpora/stopwords",
+}
+
+
+def load_nltk_resources():
+    """
+    Download the NLTK resources that are not installed yet.
+    """
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(name)
+
 
-nltk.download("punkt")
-nltk.download("punkt_tab")
-nltk.download("wordnet")
-nltk.download("stopwords")
+load_nltk_resources()
 from nltk.corpus import stopwords
 
 
@@ -138,107 +161,126 @@ def filter_by_regex(text: str, pattern: str) -> str:
     return match if match else None
 
 
-def clean_text_df(df: pd.DataFrame, root_type: str = "lemmatization") -> pd.DataFrame:
+def get_stop_words() -> set:
+    """
+    Get the words removed from reviews by clean_text_df.
+
+    Returns:
+        set: French stop words and words_not_relevant.
+    """
+    stop_words = set(stopwords.words("french"))
+    stop_words.update(words_not_relevant)
+    return stop_words
+
+
+def get_preprocessing_config_hash(root_type: str, stop_words: set) -> str:
+    """
+    Hash the text preprocessing configuration, to key the stored cleaned text.
+
+    Args:
+        root_type (str): The type of root processing ('stemming' or 'lemmatization').
+        stop_words (set): The stop words removed from the text.
+
+    Returns:
+        str: A short hexadecimal hash of the configuration.
+    """
+    config = {
+        "root_type": root_type,
+        "stop_words": sorted(stop_words),
+        "words_not_relevant": sorted(set(words_not_relevant)),
+    }
+    payload = json.dumps(config, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def clean_text_df(df: pd.DataFrame, root_type: str = "lemmatization", stop_words=None) -> pd.DataFrame:
     """
     Clean the text in the dataframe by removing stop words and applying stemming or lemmatization.
 
+    When the dataframe has a 'review_id' column, the cleaned text is read from the
+    review_tokens store and only the reviews not processed yet with this
+    configuration are cleaned (and then stored). Cleaning runs through the
+    batched engine of utils.normalization.
+
     Args:
         df (pd.DataFrame): The input dataframe containing a 'review_text' column.
         root_type (str): The type of root processing to apply ('stemming' or 'lemmatization').
+        stop_words (set): The stop words to remove. Defaults to get_stop_words().
 
     Returns:
         pd.DataFrame: The dataframe with an additional 'cleaned_text' column.
     """
-    stop_words = set(stopwords.words("french"))
-    stop_words.update(words_not_relevant)
-    stemmer = SnowballStemmer("french")
-    lemmatizer = nltk.WordNetLemmatizer()
-
-    def process_text(text):
-        tokens = nltk.word_tokenize(text, language="french")
-        if root_type == "stemming":
-            tokens = [
-                stemmer.stem(word.lower()).lower() for word in tokens if word.lower() not in stop_words
-            ]
-        else:
-            tokens = [
-                lemmatizer.lemmatize(word.lower()).lower()
-                for word in tokens
-                if word.lower() not in stop_words
-            ]
-        return " ".join(tokens)
-
-    df["cleaned_text"] = df["review_text"].apply(lambda x: process_text(x))
+    if stop_words is None:
+        stop_words = get_stop_words()
+
+    stored = "review_id" in df.columns
+    if stored:
+        config_hash = get_preprocessing_config_hash(root_type, stop_words)
+        stored_texts = get_review_tokens(df["review_id"].tolist(), config_hash)
+        df["cleaned_text"] = df["review_id"].map(stored_texts).astype(object)
+    else:
+        df["cleaned_text"] = None
+
+    missing = df["cleaned_text"].isna()
+    if missing.any():
+        df.loc[missing, "cleaned_text"] = normalize_texts(df.loc[missing, "review_text"], root_type, stop_words)
+        if stored:
+            save_review_tokens(
+                df.loc[missing, "review_id"].tolist(),
+                df.loc[missing, "cleaned_text"].tolist(),
+                config_hash
+            )
 
     return df
 
 
-def generate_wordcloud(df: pd.DataFrame, ignored_words=list()) -> WordCloud:
+def filter_frequencies(frequencies: Counter, ignored_words=list()) -> Counter:
     """
-    Generate a word cloud from the cleaned text in the dataframe.
+    Remove the non relevant and ignored words from term frequencies.
 
     Args:
-        df (pd.DataFrame): The input dataframe containing 'restaurant_name' and 'cleaned_text' columns.
+        frequencies (Counter): Term frequencies.
+        ignored_words (list): List of words to ignore.
 
     Returns:
-        WordCloud: The generated word cloud.
+        Counter: The remaining term frequencies.
     """
-    if not {"restaurant_name", "cleaned_text"}.issubset(df.columns):
-        raise ValueError(
-            "Dataframe must contain 'restaurant_name' and 'cleaned_text' columns."
-        )
-    
-    # Join the filtered tokens back into a string
-    text = " ".join(review for review in df["cleaned_text"])
-    text_separed = text.lower().split(" ")
-    print(len(text_separed))
-    text_separed = [word for word in text_separed if word not in words_not_relevant]
-    print(len(text_separed))
-    text_separed = [word for word in text_separed if word not in ignored_words]
-    print(len(text_separed))
-    text = " ".join(text_separed)
-    # text = " ".join([word.lower() for word in text.split() if word.lower() not in words_not_relevant or word.lower() not in ignored_words])
-    wordcloud = WordCloud(width=800, height=400, background_color="white").generate(
-        text
-    )
+    excluded = frequencies.keys() & (set(words_not_relevant) | set(ignored_words))
+    return Counter({word: count for word, count in frequencies.items() if word not in excluded})
+
 
-    return wordcloud
+def generate_wordcloud(frequencies: Counter, ignored_words=list()) -> bytes:
+    """
+    Generate a word cloud image from term frequencies. Images are cached on
+    disk (see utils.image_cache).
+
+    Args:
+        frequencies (Counter): Term frequencies of the cleaned text (see utils.term_index).
+        ignored_words (list): List of words to ignore.
+
+    Returns:
+        bytes: The word cloud as a PNG image.
+    """
+    return render_wordcloud_png(filter_frequencies(frequencies, ignored_words))
 
 
-def generate_word_frequencies_chart(df: pd.DataFrame, ignored_words=list(), color: str = "blue") -> alt.Chart:
+def generate_word_frequencies_chart(frequencies: Counter, ignored_words=list(), color: str = "blue") -> alt.Chart:
     """
-    Generate a bar chart of the 20 most frequent words from the cleaned text in the dataframe.
+    Generate a bar chart of the 10 most frequent words from term frequencies.
 
     Args:
-        df (pd.DataFrame): The input dataframe containing 'cleaned_text' column.
+        frequencies (Counter): Term frequencies of the cleaned text (see utils.term_index).
         ignored_words (list): List of words to ignore in the frequency count.
         color (str): Color of the bars in the chart.
 
     Returns:
         alt.Chart: The generated bar chart of word frequencies.
     """
-    # Clean special characters and separations
-    df.loc[:, "cleaned_text"] = df["cleaned_text"].str.lower().str.replace(r"[^\w\s]", "", regex=True)
-
-    # Join the filtered tokens back into a string
-    text = " ".join(review for review in df["cleaned_text"])
-    text_separated = text.lower().split(" ")
-    text_separated = [word for word in text_separated if word not in words_not_relevant]
-    text_separated = [word for word in text_separated if word not in ignored_words]
-    text = " ".join(text_separated)
-
-    # Generate word frequencies
-    word_freq = Counter(text.split())
-    word_freq_df = pd.DataFrame(word_freq.items(), columns=["word", "frequency"])
-
     # Filter out words that are not relevant
-    word_freq_df = word_freq_df[~word_freq_df["word"].isin(words_not_relevant)]
-    word_freq_df = word_freq_df[~word_freq_df["word"].isin(ignored_words)]
-    
-    # Get the 20 most frequent words
-    total_words = word_freq_df['word'].count()
-    word_freq_df = word_freq_df.nlargest(10, "frequency")
-    
+    word_freq = filter_frequencies(frequencies, ignored_words)
+    word_freq_df = pd.DataFrame(word_freq.most_common(10), columns=["word", "frequency"])
+    total_words = len(word_freq)
+
     # Create bar chart
     bar_chart = (
         alt.Chart(word_freq_df)
@@ -252,7 +294,12 @@ def generate_word_frequencies_chart(df: pd.DataFrame, ignored_words=list(), colo
 
 def generate_word2vec(df: pd.DataFrame, three_dimensional: bool = False):
     """
-    Generate a Word2Vec model from the cleaned text in the dataframe.
+    Project the restaurants of the dataframe using the corpus-wide Word2Vec model.
+
+    Word vectors are looked up in the persisted model of utils.embeddings and
+    projected with the corpus-wide projection of utils.projection; nothing is
+    trained or fitted here (a PCA is only fitted as a fallback when the corpus
+    is too small for the projection).
 
     Args:
         df (pd.DataFrame): The input dataframe containing 'cleaned_text' column.
@@ -269,88 +316,62 @@ def generate_word2vec(df: pd.DataFrame, three_dimensional: bool = False):
     #     raise ValueError("Dataframe must contain 'cleaned_text' column.")
 
     df_reviews = df.copy()
-    df_reviews["tokens"] = df_reviews["cleaned_text"].apply(
-        lambda x: word_tokenize(x.lower())
-    )
 
+    # Modèle Word2Vec entraîné une fois sur tout le corpus
+    word_vectors = get_keyed_vectors()
 
-    # Entraîner le modèle Word2Vec
-    model = Word2Vec(
-        sentences=df_reviews["tokens"],  # df["tokens"],
-        vector_size=100,
-        window=5,
-        min_count=1,
-        workers=4,
-        sg = 0 # 1 = skip-gram, 0 = CBOW
-    )
+    # Vecteur moyen de chaque avis
+    vectors = review_vectors(tokenize_reviews(df_reviews), word_vectors)
 
-    # Prétraitement des avis
-    # Fonction pour obtenir le vecteur moyen d'un avis
-    def get_avg_vector(tokens):
-        vectors = [model.wv[word] for word in tokens if word in model.wv]
-        if len(vectors) == 0:
-            return np.zeros(100)
-        # return vectors
-        return np.mean(vectors, axis=0)
-
-    # Calculer les vecteurs moyens pour chaque restaurant
-    df_reviews["avg_vector"] = df_reviews["tokens"].apply(get_avg_vector)
-
-    df_reviews["contributions"] = df_reviews["contributions"].fillna(1)
-
-
-    def weighted_avg_vector(vectors, weights):
-        vectors = np.vstack(vectors)
-        return np.average(vectors, axis=0, weights=weights)
-    
-    weighted_reviews = df_reviews.groupby("restaurant_id").agg(
-        weighted_avg_vector=pd.NamedAgg(
-            column="avg_vector",
-            aggfunc=lambda x: weighted_avg_vector(x, df_reviews.loc[x.index, 'contributions'])
-        )
+    # Vecteur de chaque restaurant : moyenne des avis pondérée par les contributions
+    weights = df_reviews["contributions"].fillna(1).to_numpy()
+    restaurant_ids, restaurant_vectors = restaurant_centroids(
+        vectors, df_reviews["restaurant_id"], weights
     )
 
-
-    # Agréger les vecteurs par restaurant
-    # restaurant_vectors = (
-    #     df_reviews.groupby("restaurant_id")
-    #     .agg(
-    #         {"avg_vector": lambda x: np.mean(list(x), axis=0), "restaurant_id": "first"}
-    #     )
-    #     .reset_index(drop=True)
-    # )
-
-    # restaurant_vectors = restaurant_vectors.drop_duplicates(subset="restaurant_id")
-    # restaurant_vectors = restaurant_vectors.set_index("restaurant_id")
-    # restaurant_vectors["restaurant_name"] = df_reviews.drop_duplicates(
-    #     subset="restaurant_id"
-    # ).set_index("restaurant_id")["restaurant_name"]
-    # restaurant_vectors.reset_index(inplace=True)
-    # restaurant_names = restaurant_vectors["restaurant_name"]
-
-    weighted_reviews["restaurant_name"] = df_reviews.drop_duplicates(subset="restaurant_id").set_index("restaurant_id")["restaurant_name"]
-    weighted_reviews["restaurant_type"] = df_reviews.drop_duplicates(subset="restaurant_id").set_index("restaurant_id")["restaurant_type"]
-    weighted_reviews["restaurant_price"] = df_reviews.drop_duplicates(subset="restaurant_id").set_index("restaurant_id")["restaurant_price"]
-    weighted_reviews.reset_index(inplace=True)
-    # restaurant_info_supp = pd.DataFrame()
-    # restaurant_info_supp["restaurant_name"] = weighted_reviews["restaurant_name"]
-    # restaurant_info_supp["restaurant_type"] = weighted_reviews["restaurant_type"]
-    # restaurant_info_supp["restaurant_price"] = weighted_reviews["restaurant_price"]
+    weighted_reviews = (
+        df_reviews.drop_duplicates(subset="restaurant_id")
+        .set_index("restaurant_id")
+        .loc[restaurant_ids, ["restaurant_name", "restaurant_type", "restaurant_price"]]
+        .reset_index()
+    )
 
     restaurant_names = weighted_reviews["restaurant_name"]
     if three_dimensional:
         ncp = 3
     else:
         ncp = 2
-    # Réduction de dimensionnalité avec ACP
-    pca = PCA(n_components=ncp)
-    restaurant_coords = pca.fit_transform(
-        np.array(weighted_reviews["weighted_avg_vector"].tolist())
-    )
+    # Réduction de dimensionnalité avec l'ACP calculée sur tout le corpus
+    projection = get_projection()
+    if projection is not None:
+        restaurant_coords = projection.transform(restaurant_vectors, ncp)
+    else:
+        pca = PCA(n_components=ncp)
+        restaurant_coords = pca.fit_transform(restaurant_vectors)
 
     return restaurant_coords, restaurant_names
 
 
+def generate_review_projection(df: pd.DataFrame, three_dimensional: bool = False):
+    """
+    Project each review of the dataframe onto the similarity map.
+
+    Args:
+        df (pd.DataFrame): The input dataframe containing 'cleaned_text' and 'restaurant_name' columns.
+        three_dimensional (bool): Whether the analysis should be done in 3D.
+
+    Returns:
+        review_coords (np.array): Projected coordinates of the reviews, or None if no projection is available.
+        review_restaurants (pd.Series): Restaurant name of each review.
+    """
+    projection = get_projection()
+    if projection is None:
+        return None, df["restaurant_name"]
+    vectors = review_vectors(tokenize_reviews(df), get_keyed_vectors())
+    review_coords = projection.transform(vectors, 3 if three_dimensional else 2)
+    return review_coords, df["restaurant_name"].reset_index(drop=True)
+
+
 def generate_spider_plot(emotions_df):
     """
     Générer un spider plot interactif pour un restaurant spécifique avec Plotly.
@@ -409,14 +430,26 @@ def generate_sentiments_analysis(df: pd.DataFrame):
     """
     Analyze the sentiment of the reviews in the dataframe.
 
+    The polarity and emotion scores of each review are read from the
+    review_scores table (see utils.scoring), so only the aggregation runs here.
+
     Args:
-        df (pd.DataFrame): The input dataframe containing 'cleaned_text' column.
+        df (pd.DataFrame): The input dataframe containing 'review_text' column.
 
     Returns:
         pd.DataFrame: The dataframe with an additional 'sentiment' column.
     """
+    # Scores de sentiment et d'émotions, calculés une seule fois par avis
+    df = df.reset_index(drop=True)
+    if "review_id" in df.columns:
+        scores = get_or_compute_review_scores(df)
+    else:
+        df["review_id"] = df.index
+        scores = score_reviews(df, stored_tokens=False)
+    df = df.merge(scores, on="review_id", how="left")
+
     # Ajout d'une colonne "sentiment" avec la polarité des reviews
-    df["sentiment"] = df["review_text"].apply(lambda x: TextBlob(x).sentiment.polarity)
+    df["sentiment"] = df["polarity"]
     # La polarité est comprise entre -1 et 1 (négatif à positif)
 
     # reviews par restaurant
@@ -454,32 +487,11 @@ def generate_sentiments_analysis(df: pd.DataFrame):
         height=600,
     )
 
-    # Fonction pour extraire les scores d'émotions
-    def extract_emotions(text):
-        """
-        Fonction qui extrait les scores d'émotions d'un texte.
-        Pour chaque émotion, on calcule le score en fonction du nombre d'occurrences.
-        """
-        emotion_scores = NRCLex(text).raw_emotion_scores
-        # Normaliser par le nombre total d'émotions détectées (optionnel)
-        total = sum(emotion_scores.values())
-        if total > 0:
-            return {emotion: score / total for emotion, score in emotion_scores.items()}
-        return emotion_scores
-
-    # Appliquer la fonction sur la colonne "review_text" et créer un DataFrame d'émotions
-    emotion_data = df["review_text"].apply(extract_emotions)
-    emotion_df = pd.DataFrame(emotion_data.tolist())
-
-    # Reset index to be able to concatenate
-    df.reset_index(drop=True, inplace=True)
-    emotion_df.reset_index(drop=True, inplace=True)
-
-    # Ajouter les scores d'émotions au DataFrame "df"
-    df = pd.concat([df, emotion_df], axis=1)
+    # Émotions détectées dans au moins un avis
+    emotion_columns = [emotion for emotion in EMOTIONS if df[emotion].notna().any()]
 
     # Calculer les moyennes des émotions pour chaque restaurant
-    emotions_par_resto = df.groupby("restaurant_id")[emotion_df.columns].mean()
+    emotions_par_resto = df.groupby("restaurant_id")[emotion_columns].mean()
 
     # Before returning, add restaurant names to emotions_par_resto
     restaurant_names = (
@@ -492,39 +504,20 @@ def generate_sentiments_analysis(df: pd.DataFrame):
     return emotions_par_resto, fig
 
 def get_coordinates(address, api_key):
-    base_url = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {
-        "address": address,
-        "key": api_key
-    }
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        if data['status'] == 'OK':
-            formatted_address = data['results'][0]['formatted_address']
-            address_components = data['results'][0]['address_components']
-            location = data['results'][0]['geometry']['location']
-            latitud = location['lat']
-            longitud = location['lng']
-            zip_code = next(
-                (component['long_name'] for component in address_components 
-                 if "postal_code" in component['types']), None)
-            country = next(
-                (component['long_name'] for component in address_components 
-                 if "country" in component['types']), None)
-            ville = next(
-                (component['long_name'] for component in address_components 
-                 if "locality" in component['types']), None)
-            return {
-                "address": formatted_address,
-                "latitude": latitud,
-                "longitude": longitud,
-                "zip_code": zip_code,
-                "country": country,
-                "ville": ville
-            }
-        else:
-            return None
-    else:
+    """
+    Geocode an address with the Google Geocoding API, without the cache of
+    utils.geocoding.
+
+    Args:
+        address (str): The address.
+        api_key (str): The Google Maps API key.
+
+    Returns:
+        dict: address, latitude, longitude, zip_code, country and ville, or None.
+    """
+    try:
+        return GoogleGeocoder(api_key).geocode(address)
+    except (requests.RequestException, ValueError) as err:
+        print(err)
         return None
             
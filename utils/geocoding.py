@@ -0,0 +1,310 @@
+"""
+Geocoding of the restaurant addresses.
+
+Addresses are resolved by a pluggable backend: the Google Geocoding API, or an
+offline stand-in for tests and air-gapped runs that reads a local JSON file and
+otherwise only parses the postcode, city and country out of the address.
+Results are cached in the geocode_cache table, keyed by backend and normalized
+address, for GEOCODE_CACHE_TTL seconds. Several addresses are geocoded at once
+by geocode_batch, with at most GEOCODE_CONCURRENCY requests in flight.
+
+Locations saved without coordinates can be geocoded in batches with:
+
+    python -m utils.geocoding [--batch-size 100] [--backend offline]
+"""
+
+import os
+import re
+import json
+import argparse
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from utils.db import (
+    get_geocode_cache,
+    save_geocode_cache,
+    get_locations_without_coordinates,
+    update_location_coordinates,
+)
+
+GOOGLE_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+# Backend used by default: 'google' when an API key is set, 'offline' otherwise
+GEOCODE_BACKEND = os.environ.get("GEOCODE_BACKEND")
+GEOCODE_TIMEOUT = float(os.environ.get("GEOCODE_TIMEOUT", 10))
+GEOCODE_CACHE_TTL = float(os.environ.get("GEOCODE_CACHE_TTL", 90 * 24 * 3600))
+GEOCODE_CONCURRENCY = int(os.environ.get("GEOCODE_CONCURRENCY", 4))
+# JSON file mapping addresses to results, read by the offline backend
+GEOCODE_OFFLINE_FILE = os.environ.get("GEOCODE_OFFLINE_FILE")
+
+_POSTCODE_CITY = re.compile(r"\b(\d{5})\s+([^,\d]+)")
+
+
+def normalize_address(address):
+    """
+    Normalize an address for the cache lookups: Unicode NFKC, lower case,
+    single spaces and no space before commas.
+
+    Args:
+        address (str): The address.
+
+    Returns:
+        str: The normalized address.
+    """
+    address = unicodedata.normalize("NFKC", address).lower()
+    address = re.sub(r"\s+", " ", address)
+    return re.sub(r"\s*,\s*", ", ", address).strip(" ,")
+
+
+class GoogleGeocoder:
+    """
+    Backend of the Google Geocoding API.
+
+    Args:
+        api_key (str): The Google Maps API key.
+        timeout (float): Seconds to wait for an answer.
+    """
+
+    name = "google"
+
+    def __init__(self, api_key, timeout=GEOCODE_TIMEOUT):
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def geocode(self, address):
+        """
+        Args:
+            address (str): The address.
+
+        Returns:
+            dict: address, latitude, longitude, zip_code, country and ville,
+            or None if the address matches nothing.
+
+        Raises:
+            requests.RequestException: If the request fails.
+            ValueError: If the API answers with an error status.
+        """
+        response = self._session().get(
+            GOOGLE_GEOCODE_URL,
+            params={"address": address, "key": self.api_key},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        if data["status"] == "ZERO_RESULTS":
+            return None
+        if data["status"] != "OK":
+            raise ValueError(f"Geocoding API error: {data['status']}")
+
+        result = data["results"][0]
+
+        def component(component_type):
+            return next(
+                (component["long_name"] for component in result["address_components"]
+                 if component_type in component["types"]), None)
+
+        location = result["geometry"]["location"]
+        return {
+            "address": result["formatted_address"],
+            "latitude": location["lat"],
+            "longitude": location["lng"],
+            "zip_code": component("postal_code"),
+            "country": component("country"),
+            "ville": component("locality"),
+        }
+
+
+class OfflineGeocoder:
+    """
+    Backend that sends no request. Addresses found in the JSON file are
+    resolved from it; for the others, only the postcode, city and country
+    are read from the address and the coordinates are None.
+
+    Args:
+        path (str): JSON file mapping addresses to results with the keys
+            returned by geocode. Defaults to GEOCODE_OFFLINE_FILE.
+    """
+
+    name = "offline"
+
+    def __init__(self, path=None):
+        path = path or GEOCODE_OFFLINE_FILE
+        self.known = {}
+        if path:
+            with open(path, encoding="utf-8") as file:
+                self.known = {normalize_address(address): result for address, result in json.load(file).items()}
+
+    def geocode(self, address):
+        """
+        Args:
+            address (str): The address.
+
+        Returns:
+            dict: address, latitude, longitude, zip_code, country and ville.
+        """
+        known = self.known.get(normalize_address(address))
+        if known is not None:
+            return dict({"address": address}, **known)
+        match = _POSTCODE_CITY.search(address)
+        ville = match.group(2).strip() if match else None
+        # TripAdvisor writes "69002 Lyon France" without a comma before the country
+        country = "France" if re.search(r"\bFrance\s*$", address) else None
+        if ville and country:
+            ville = re.sub(r"\s*\bFrance$", "", ville) or None
+        return {
+            "address": address,
+            "latitude": None,
+            "longitude": None,
+            "zip_code": match.group(1) if match else None,
+            "country": country,
+            "ville": ville,
+        }
+
+
+def _google_backend():
+    return GoogleGeocoder(os.getenv("GOOGLE_MAPS_API_KEY"))
+
+
+BACKENDS = {
+    "google": _google_backend,
+    "offline": OfflineGeocoder,
+}
+
+
+def register_backend(name, factory):
+    """
+    Make a geocoding backend available to get_geocoder.
+
+    Args:
+        name (str): Name of the backend, also used to key its cached results.
+        factory (callable): Called without arguments, returns an object with a
+            geocode(address) method.
+    """
+    BACKENDS[name] = factory
+
+
+def get_geocoder(backend=None):
+    """
+    Create a geocoding backend.
+
+    Args:
+        backend (str): Name of the backend. Defaults to GEOCODE_BACKEND, or to
+            'google' if GOOGLE_MAPS_API_KEY is set and 'offline' otherwise.
+
+    Returns:
+        The backend, with its name in the `name` attribute.
+    """
+    backend = backend or GEOCODE_BACKEND or ("google" if os.getenv("GOOGLE_MAPS_API_KEY") else "offline")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown geocoding backend: {backend}")
+    geocoder = BACKENDS[backend]()
+    geocoder.name = backend
+    return geocoder
+
+
+def geocode_batch(addresses, geocoder=None, max_workers=None, ttl=None):
+    """
+    Geocode several addresses, from the cache when possible. The other
+    addresses are sent to the backend in parallel and their results are
+    cached, including the absence of match; failed requests are not cached.
+
+    Args:
+        addresses (list): The addresses.
+        geocoder: Backend returned by get_geocoder. Defaults to get_geocoder().
+        max_workers (int): Requests sent at the same time. Defaults to GEOCODE_CONCURRENCY.
+        ttl (float): Maximum age of the cached results, in seconds. Defaults to GEOCODE_CACHE_TTL.
+
+    Returns:
+        dict: Mapping of each address to its result (see GoogleGeocoder.geocode),
+        None when nothing was found or the request failed.
+    """
+    geocoder = geocoder or get_geocoder()
+    ttl = GEOCODE_CACHE_TTL if ttl is None else ttl
+    keys = {address: normalize_address(address) for address in addresses if address}
+    results = get_geocode_cache(geocoder.name, set(keys.values()), ttl)
+
+    missing = {}
+    for address, key in keys.items():
+        if key not in results:
+            missing.setdefault(key, address)
+
+    def geocode(address):
+        try:
+            return geocoder.geocode(address)
+        except (requests.RequestException, ValueError) as err:
+            print(f"Geocoding failed for {address}: {err}")
+            return err
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers or GEOCODE_CONCURRENCY) as executor:
+            fetched = dict(zip(missing, executor.map(geocode, missing.values())))
+        entries = [
+            (key, missing[key], result)
+            for key, result in fetched.items() if not isinstance(result, Exception)
+        ]
+        save_geocode_cache(geocoder.name, entries)
+        results.update({key: result for key, _, result in entries})
+
+    return {address: results.get(key) for address, key in keys.items()}
+
+
+def geocode(address, geocoder=None):
+    """
+    Geocode one address, see geocode_batch.
+
+    Args:
+        address (str): The address.
+        geocoder: Backend returned by get_geocoder. Defaults to get_geocoder().
+
+    Returns:
+        dict: The result, None when nothing was found or the request failed.
+    """
+    return geocode_batch([address], geocoder).get(address)
+
+
+def geocode_locations(batch_size=100, backend=None):
+    """
+    Geocode the saved locations that have no coordinates, batch by batch.
+
+    Args:
+        batch_size (int): Number of locations geocoded and committed at once.
+        backend (str): Name of the backend, see get_geocoder.
+
+    Returns:
+        int: Number of locations updated.
+    """
+    geocoder = get_geocoder(backend)
+    updated = 0
+    last_location_id = 0
+    while True:
+        batch = get_locations_without_coordinates(batch_size, last_location_id)
+        if batch.empty:
+            break
+        results = geocode_batch(batch["address"].tolist(), geocoder)
+        locations = [
+            (location_id, results[address])
+            for location_id, address in zip(batch["location_id"], batch["address"])
+            if results.get(address) and results[address]["latitude"] is not None
+        ]
+        update_location_coordinates(locations)
+        updated += len(locations)
+        last_location_id = int(batch["location_id"].max())
+        print(f"Geocoded {updated} locations")
+        if len(batch) < batch_size:
+            break
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocode the locations without coordinates.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--backend", default=None, choices=sorted(BACKENDS))
+    args = parser.parse_args()
+    print(f"Done: {geocode_locations(args.batch_size, args.backend)} locations geocoded")
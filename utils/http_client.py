@@ -0,0 +1,188 @@
+"""
+HTTP client of the scrapers.
+
+Each thread reuses one requests.Session (keep-alive connection pool) and
+requests are sent with explicit timeouts. Failed requests (connection errors,
+429 and 5xx answers) are retried by fetch_page with exponential backoff,
+honouring Retry-After; each attempt first takes a token from the rate limiter,
+so retries are paced like any other request. Pages
+are revalidated with their ETag / Last-Modified headers: a 304 answer reuses
+the content downloaded the previous time instead of downloading it again.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = float(os.environ.get("SCRAPE_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("SCRAPE_READ_TIMEOUT", 30))
+RETRIES = int(os.environ.get("SCRAPE_RETRIES", 3))
+RETRY_BACKOFF = float(os.environ.get("SCRAPE_RETRY_BACKOFF", 1))
+PAGE_CACHE_SIZE = int(os.environ.get("SCRAPE_PAGE_CACHE_SIZE", 128))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
+    "accept-language": "en-US,en;q=0.9,fr;q=0.8",
+    "Referer": "https://www.tripadvisor.fr/Hotels",
+    "Origin": "https://www.tripadvisor.fr",
+    "accept-encoding": "gzip, deflate, br",
+    "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
+}
+
+_local = threading.local()
+
+
+def create_session():
+    """
+    Create a session with keep-alive connections. It does not retry by itself:
+    retries are made by fetch_page, through the rate limiter.
+
+    Returns:
+        requests.Session: The session.
+    """
+    adapter = HTTPAdapter(max_retries=0)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session():
+    """
+    Get the session of the current thread.
+
+    Returns:
+        requests.Session: The session.
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = create_session()
+    return session
+
+
+class PageCache:
+    """
+    Thread-safe LRU cache of the raw content of the pages and of their
+    validators (ETag and Last-Modified headers), keyed by URL. Pages are
+    parsed again by each caller, so no parsed tree is shared between threads.
+    """
+
+    def __init__(self, max_size=PAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Args:
+            url (str): URL of the page.
+
+        Returns:
+            dict: Entry with 'etag', 'last_modified' and 'content' keys, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url, etag, last_modified, content):
+        """
+        Store a page, if the server sent validators for it.
+
+        Args:
+            url (str): URL of the page.
+            etag (str): ETag header of the answer.
+            last_modified (str): Last-Modified header of the answer.
+            content (bytes): Body of the answer.
+        """
+        if self.max_size <= 0 or not (etag or last_modified):
+            return
+        with self._lock:
+            self._entries[url] = {"etag": etag, "last_modified": last_modified, "content": content}
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all the pages."""
+        with self._lock:
+            self._entries.clear()
+
+
+page_cache = PageCache()
+
+
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            try:
+                return max((parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds(), 0)
+            except (TypeError, ValueError):
+                pass
+    return RETRY_BACKOFF * 2 ** attempt
+
+
+def fetch_page(url, parse, headers=None, session=None, cache=page_cache, rate_limiter=None):
+    """
+    GET a page and parse it, revalidating the cached version if there is one.
+
+    Connection errors, timeouts and 429/5xx answers are retried up to RETRIES
+    times, waiting RETRY_BACKOFF * 2 ** attempt seconds or the Retry-After
+    delay of the answer.
+
+    Args:
+        url (str): URL of the page.
+        parse (callable): Called with the content of the answer, returns the parsed page.
+        headers (dict): Additional request headers.
+        session (requests.Session): Session to use. Defaults to the session of the current thread.
+        cache (PageCache): Cache of the page contents, None to disable it.
+        rate_limiter (TokenBucket): Acquired before each attempt, see utils.rate_limit.
+
+    Returns:
+        The parsed page.
+
+    Raises:
+        requests.HTTPError: If the answer is an error.
+        requests.RequestException: If the last attempt fails to connect or times out.
+    """
+    headers = dict(headers or {})
+    entry = cache.get(url) if cache is not None else None
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    session = session or get_session()
+    for attempt in range(RETRIES + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            response = session.get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == RETRIES:
+                raise
+            time.sleep(_retry_delay(None, attempt))
+            continue
+        if response.status_code not in RETRY_STATUSES or attempt == RETRIES:
+            break
+        time.sleep(_retry_delay(response, attempt))
+
+    if entry and response.status_code == 304:
+        return parse(entry["content"])
+    response.raise_for_status()
+
+    if cache is not None:
+        cache.put(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), response.content)
+    return parse(response.content)
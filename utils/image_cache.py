@@ -0,0 +1,130 @@
+"""
+On-disk cache of the rendered wordcloud images.
+
+Images are content-addressed: the key is a hash of the term frequencies and of
+the rendering options, so a wordcloud is only rendered once for a given
+selection, ignored words and rating bucket. PNG files are stored under
+WORDCLOUD_CACHE_DIR and the least recently used ones are evicted when there are
+more than WORDCLOUD_CACHE_SIZE of them.
+"""
+
+import os
+import io
+import json
+import hashlib
+import tempfile
+import threading
+from wordcloud import WordCloud
+
+WORDCLOUD_CACHE_DIR = os.environ.get(
+    "WORDCLOUD_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "wordclouds"),
+)
+WORDCLOUD_CACHE_SIZE = int(os.environ.get("WORDCLOUD_CACHE_SIZE", 256))
+
+WORDCLOUD_OPTIONS = {"width": 800, "height": 400, "background_color": "white"}
+
+_eviction_lock = threading.Lock()
+
+
+def image_key(frequencies, options) -> str:
+    """
+    Compute the cache key of a wordcloud.
+
+    Args:
+        frequencies (dict): Term frequencies of the wordcloud.
+        options (dict): Rendering options passed to WordCloud.
+
+    Returns:
+        str: Hex digest identifying the image.
+    """
+    payload = json.dumps(
+        {"frequencies": sorted((str(term), int(count)) for term, count in frequencies.items()),
+         "options": options},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _image_path(key):
+    return os.path.join(WORDCLOUD_CACHE_DIR, f"{key}.png")
+
+
+def get_cached_image(key):
+    """
+    Read an image from the cache and mark it as recently used.
+
+    Args:
+        key (str): Cache key of the image.
+
+    Returns:
+        bytes: The PNG image, or None if it is not cached.
+    """
+    path = _image_path(key)
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        os.utime(path)
+        return data
+    except OSError:
+        return None
+
+
+def _evict():
+    with _eviction_lock:
+        try:
+            entries = [entry for entry in os.scandir(WORDCLOUD_CACHE_DIR) if entry.name.endswith(".png")]
+        except OSError:
+            return
+        if len(entries) <= WORDCLOUD_CACHE_SIZE:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - WORDCLOUD_CACHE_SIZE]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def put_cached_image(key, data):
+    """
+    Store an image in the cache, evicting the least recently used images.
+
+    Args:
+        key (str): Cache key of the image.
+        data (bytes): The PNG image.
+    """
+    try:
+        os.makedirs(WORDCLOUD_CACHE_DIR, exist_ok=True)
+        # Ecriture atomique pour ne jamais servir un fichier partiel
+        fd, tmp_path = tempfile.mkstemp(dir=WORDCLOUD_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, _image_path(key))
+    except OSError as err:
+        print(err)
+        return
+    _evict()
+
+
+def render_wordcloud_png(frequencies, **options) -> bytes:
+    """
+    Render a wordcloud to PNG bytes, using the cache when possible.
+
+    Args:
+        frequencies (dict): Term frequencies of the wordcloud.
+        **options: Rendering options overriding WORDCLOUD_OPTIONS.
+
+    Returns:
+        bytes: The PNG image.
+    """
+    options = {**WORDCLOUD_OPTIONS, **options}
+    key = image_key(frequencies, options)
+    data = get_cached_image(key)
+    if data is None:
+        image = WordCloud(**options).generate_from_frequencies(frequencies).to_image()
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        data = buffer.getvalue()
+        put_cached_image(key, data)
+    return data
@@ -0,0 +1,123 @@
+"""
+Batched text normalization engine: tokenization, stop-word removal and
+stemming/lemmatization of review texts, spread over a process pool.
+
+This module only depends on NLTK so that worker processes start quickly.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import nltk
+from nltk.stem.snowball import SnowballStemmer
+
+NORMALIZATION_WORKERS = int(os.environ.get("NORMALIZATION_WORKERS", os.cpu_count() or 1))
+NORMALIZATION_CHUNK_SIZE = int(os.environ.get("NORMALIZATION_CHUNK_SIZE", 250))
+# Below this number of texts, starting the pool costs more than it saves
+NORMALIZATION_PARALLEL_THRESHOLD = int(os.environ.get("NORMALIZATION_PARALLEL_THRESHOLD", 1000))
+
+
+class TextNormalizer:
+    """
+    Normalize texts with a fixed preprocessing configuration.
+
+    The root (stem or lemma) of each distinct token is computed once and
+    memoized, as review vocabulary is heavily repeated.
+
+    Attributes:
+        root_type (str): The type of root processing ('stemming' or 'lemmatization').
+        stop_words (frozenset): Lower-case tokens to drop.
+    """
+
+    def __init__(self, root_type: str, stop_words) -> None:
+        self.root_type = root_type
+        self.stop_words = frozenset(stop_words)
+        if root_type == "stemming":
+            self._root = SnowballStemmer("french").stem
+        else:
+            self._root = nltk.WordNetLemmatizer().lemmatize
+        self._roots = {}
+
+    def root(self, token: str) -> str:
+        """
+        Get the lower-case root of a lower-case token.
+
+        Args:
+            token (str): The token.
+
+        Returns:
+            str: Its stem or lemma.
+        """
+        root = self._roots.get(token)
+        if root is None:
+            root = self._root(token).lower()
+            self._roots[token] = root
+        return root
+
+    def normalize(self, text: str) -> str:
+        """
+        Normalize a single text.
+
+        Args:
+            text (str): The raw review text.
+
+        Returns:
+            str: The space-separated roots of the tokens that are not stop words.
+        """
+        tokens = (word.lower() for word in nltk.word_tokenize(text, language="french"))
+        return " ".join(self.root(token) for token in tokens if token not in self.stop_words)
+
+    def normalize_batch(self, texts) -> list:
+        """
+        Normalize a batch of texts.
+
+        Args:
+            texts (list): The raw review texts.
+
+        Returns:
+            list: The normalized texts, in the same order.
+        """
+        return [self.normalize(text) for text in texts]
+
+
+_worker_normalizer = None
+
+
+def _init_worker(root_type, stop_words):
+    global _worker_normalizer
+    _worker_normalizer = TextNormalizer(root_type, stop_words)
+
+
+def _normalize_chunk(texts):
+    return _worker_normalizer.normalize_batch(texts)
+
+
+def normalize_texts(texts, root_type: str, stop_words, workers: int = None, chunk_size: int = None) -> list:
+    """
+    Normalize texts, in parallel chunks over a process pool for large corpora.
+
+    Args:
+        texts (list): The raw review texts.
+        root_type (str): The type of root processing ('stemming' or 'lemmatization').
+        stop_words (set): Lower-case tokens to drop.
+        workers (int): Number of worker processes. Defaults to NORMALIZATION_WORKERS.
+        chunk_size (int): Number of texts sent to a worker at once. Defaults to NORMALIZATION_CHUNK_SIZE.
+
+    Returns:
+        list: The normalized texts, in the same order.
+    """
+    texts = list(texts)
+    workers = workers or NORMALIZATION_WORKERS
+    chunk_size = chunk_size or NORMALIZATION_CHUNK_SIZE
+    if workers <= 1 or len(texts) < NORMALIZATION_PARALLEL_THRESHOLD:
+        return TextNormalizer(root_type, stop_words).normalize_batch(texts)
+
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        initializer=_init_worker,
+        initargs=(root_type, tuple(stop_words))
+    ) as executor:
+        normalized = []
+        for chunk in executor.map(_normalize_chunk, chunks):
+            normalized.extend(chunk)
+    return normalized
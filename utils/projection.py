@@ -0,0 +1,192 @@
+"""
+Projection of restaurant and review vectors onto a fixed 2D/3D map.
+
+An IncrementalPCA is fitted once, batch by batch, over every restaurant vector
+and every review vector of the corpus, and its components are saved under
+MODELS_DIR. New points are then projected with a single matrix product, so the
+similarity map no longer refits a PCA (nor holds every vector in memory) on
+each request.
+
+The application only loads the saved projection. After the Word2Vec model
+changes, the worker recomputes the outdated restaurant vectors and refits the
+projection when its queue is empty (see refresh_projection); it can also be
+run by hand with:
+
+    python -m utils.projection
+"""
+
+import os
+import argparse
+import numpy as np
+from sklearn.decomposition import IncrementalPCA
+from utils.db import iter_dataframes, get_restaurant_embeddings, get_outdated_restaurant_embeddings
+from utils.embeddings import (
+    MODELS_DIR,
+    get_keyed_vectors,
+    get_model_version,
+    tokenize_reviews,
+    review_vectors,
+)
+from utils.similarity import compute_restaurant_embeddings
+
+PROJECTION_PATH = os.path.join(MODELS_DIR, "projection.npz")
+PROJECTION_COMPONENTS = 3
+PROJECTION_BATCH_SIZE = int(os.environ.get("PROJECTION_BATCH_SIZE", 2000))
+# Restaurants whose vectors are recomputed together after a model update
+RESTAURANT_BATCH_SIZE = int(os.environ.get("RESTAURANT_BATCH_SIZE", 50))
+
+_projection = None
+_projection_mtime = None
+# Model version for which the corpus was too small to fit a projection
+_unfitted_model_version = None
+
+
+class Projection:
+    """
+    Linear projection onto the first principal components.
+
+    Attributes:
+        mean (np.ndarray): Mean vector of the fitted data.
+        components (np.ndarray): (components x vector_size) principal axes.
+        model_version (int): Version of the Word2Vec model it was fitted on.
+    """
+
+    def __init__(self, mean, components, model_version):
+        self.mean = np.asarray(mean)
+        self.components = np.asarray(components)
+        self.model_version = int(model_version)
+
+    def transform(self, vectors, n_components=2):
+        """
+        Project vectors onto the first principal components.
+
+        Args:
+            vectors (np.ndarray): (points x vector_size) array.
+            n_components (int): 2 or 3.
+
+        Returns:
+            np.ndarray: (points x n_components) coordinates.
+        """
+        return (np.asarray(vectors) - self.mean) @ self.components[:n_components].T
+
+    def save(self, path=PROJECTION_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = path + ".tmp.npz"
+        np.savez(temporary_path, mean=self.mean, components=self.components, model_version=self.model_version)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path=PROJECTION_PATH):
+        with np.load(path) as data:
+            # Projections saved before the model versions have no version: refitted on the next refresh
+            model_version = data["model_version"] if "model_version" in data.files else -1
+            return cls(data["mean"], data["components"], model_version)
+
+
+def _corpus_vector_batches(batch_size):
+    """Yield batches of restaurant vectors, then of review vectors of the whole corpus."""
+    # Imported here as utils.functions depends on utils.embeddings
+    from utils.functions import clean_text_df
+
+    _, restaurant_vectors = get_restaurant_embeddings()
+    if len(restaurant_vectors):
+        yield restaurant_vectors
+    keyed_vectors = get_keyed_vectors()
+    for chunk in iter_dataframes(
+        "SELECT review_id, review_text FROM reviews WHERE review_text IS NOT NULL ORDER BY review_id",
+        chunk_size=batch_size
+    ):
+        yield review_vectors(tokenize_reviews(clean_text_df(chunk)), keyed_vectors)
+
+
+def fit_projection(batch_size=None, model_version=None):
+    """
+    Fit the projection over the whole corpus and save it.
+
+    Args:
+        batch_size (int): Number of vectors per partial fit. Defaults to PROJECTION_BATCH_SIZE.
+        model_version (int): Version of the Word2Vec model. Defaults to the current one.
+
+    Returns:
+        Projection: The fitted projection, or None if the corpus is too small.
+    """
+    global _projection, _projection_mtime
+    model_version = get_model_version() if model_version is None else model_version
+    batch_size = max(batch_size or PROJECTION_BATCH_SIZE, PROJECTION_COMPONENTS)
+    pca = IncrementalPCA(n_components=PROJECTION_COMPONENTS)
+    pending = []
+    fitted = False
+    for batch in _corpus_vector_batches(batch_size):
+        pending.append(batch)
+        if sum(len(vectors) for vectors in pending) >= batch_size:
+            pca.partial_fit(np.vstack(pending))
+            pending, fitted = [], True
+    # partial_fit needs at least as many samples as components
+    if pending and sum(len(vectors) for vectors in pending) >= PROJECTION_COMPONENTS:
+        pca.partial_fit(np.vstack(pending))
+        fitted = True
+    if not fitted:
+        return None
+
+    projection = Projection(pca.mean_, pca.components_, model_version)
+    projection.save()
+    _projection, _projection_mtime = projection, os.path.getmtime(PROJECTION_PATH)
+    return projection
+
+
+def get_projection():
+    """
+    Get the saved projection, reloading it when the worker saved a new one.
+    It is never fitted here, see refresh_projection.
+
+    Returns:
+        Projection: The projection, or None if none was fitted yet.
+    """
+    global _projection, _projection_mtime
+    if not os.path.exists(PROJECTION_PATH):
+        return _projection
+    mtime = os.path.getmtime(PROJECTION_PATH)
+    if _projection is None or mtime != _projection_mtime:
+        _projection, _projection_mtime = Projection.load(), mtime
+    return _projection
+
+
+def refresh_projection(batch_size=None):
+    """
+    Bring the outputs of the Word2Vec model up to date after it changed:
+    compute the restaurant vectors that are missing or come from an older
+    model, then refit the projection if vectors were computed or it was fitted
+    on an older model. Does nothing when both are up to date.
+
+    Args:
+        batch_size (int): Number of vectors per partial fit. Defaults to PROJECTION_BATCH_SIZE.
+
+    Returns:
+        bool: Whether anything was recomputed.
+    """
+    global _unfitted_model_version
+    model_version = get_model_version()
+    outdated = get_outdated_restaurant_embeddings(model_version)
+    recomputed = 0
+    for start in range(0, len(outdated), RESTAURANT_BATCH_SIZE):
+        ids, _ = compute_restaurant_embeddings(outdated[start:start + RESTAURANT_BATCH_SIZE])
+        recomputed += len(ids)
+
+    projection = get_projection()
+    stale = (
+        (projection is None or projection.model_version != model_version)
+        # The corpus was already too small for this model: wait for new reviews
+        and _unfitted_model_version != model_version
+    )
+    if not recomputed and not stale:
+        return False
+    if fit_projection(batch_size, model_version) is None:
+        _unfitted_model_version = model_version
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the restaurant vectors and refit the projection.")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    print("Done" if refresh_projection(args.batch_size) else "Already up to date")
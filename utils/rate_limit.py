@@ -0,0 +1,110 @@
+"""
+Token-bucket rate limiting of the requests sent to each host.
+
+Every request of the scrapers takes a token from the bucket of its host, so the
+request rate to TripAdvisor stays the same whatever the number of restaurants
+scraped in parallel.
+"""
+
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+
+# Requests per second allowed to a host, and burst size
+SCRAPE_RATE = float(os.environ.get("SCRAPE_RATE", 0.5))
+SCRAPE_BURST = int(os.environ.get("SCRAPE_BURST", 1))
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: tokens are added at `rate` per second, up to
+    `capacity`, and each request takes one.
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens if they are available.
+
+        Args:
+            tokens (int): Number of tokens to take.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait before they are available.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Wait until tokens are available and take them.
+
+        Args:
+            tokens (int): Number of tokens to take.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+def get_rate_limiter(url):
+    """
+    Get the rate limiter shared by all the requests to the host of a URL.
+
+    Args:
+        url (str): URL of the request.
+
+    Returns:
+        TokenBucket: The limiter of the host.
+    """
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = TokenBucket(SCRAPE_RATE, SCRAPE_BURST)
+        return limiter
+
+
+def set_rate_limit(url, rate, capacity=1):
+    """
+    Replace the rate limiter of the host of a URL.
+
+    Args:
+        url (str): URL on the host.
+        rate (float): Requests per second.
+        capacity (int): Burst size.
+
+    Returns:
+        TokenBucket: The new limiter of the host.
+    """
+    limiter = TokenBucket(rate, capacity)
+    with _limiters_lock:
+        _limiters[urlsplit(url).netloc] = limiter
+    return limiter
@@ -0,0 +1,114 @@
+"""
+Sentiment polarity and NRC emotion scoring of reviews.
+
+Scores are computed once per review and stored in the review_scores table.
+Existing reviews can be backfilled in batches with:
+
+    python -m utils.scoring [--batch-size 500]
+"""
+
+import argparse
+import pandas as pd
+from textblob import TextBlob
+from utils.emotions import EMOTIONS, get_emotion_scorer
+from utils.db import (
+    REVIEW_SCORE_COLUMNS,
+    REVIEWS_BATCH_SIZE,
+    get_review_scores,
+    get_unscored_reviews,
+    save_review_scores,
+)
+
+
+# Preprocessing of the texts the emotion scores are computed from. It is fixed,
+# whatever the preprocessing chosen on the page, so a stored score does not
+# depend on the page that computed it first.
+SCORING_ROOT_TYPE = "lemmatization"
+
+
+def score_reviews(df: pd.DataFrame, stored_tokens: bool = True) -> pd.DataFrame:
+    """
+    Score a batch of reviews.
+
+    The polarity comes from TextBlob. The emotion scores are the share of each
+    NRC emotion among the emotion words of the review (NaN when absent),
+    computed for the whole batch by the vectorized scorer of utils.emotions
+    from the tokens produced by clean_text_df with SCORING_ROOT_TYPE and the
+    default stop words. A 'cleaned_text' column of the input is ignored.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing 'review_id' and 'review_text' columns.
+        stored_tokens (bool): Whether the review IDs are those of the reviews table,
+                              so their cleaned text can be read from review_tokens.
+
+    Returns:
+        pd.DataFrame: DataFrame with review_id, polarity and one column per emotion.
+    """
+    # Imported here as utils.functions depends on this module
+    from utils.functions import clean_text_df
+
+    columns = ["review_id", "review_text"] if stored_tokens else ["review_text"]
+    cleaned = clean_text_df(df[columns].copy(), root_type=SCORING_ROOT_TYPE)
+
+    scores = get_emotion_scorer().score(cleaned["cleaned_text"].str.split())
+    scores.insert(0, "polarity", [TextBlob(text).sentiment.polarity for text in df["review_text"]])
+    scores.insert(0, "review_id", df["review_id"].to_numpy())
+    return scores[["review_id"] + REVIEW_SCORE_COLUMNS]
+
+
+def get_or_compute_review_scores(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Get the scores of reviews, scoring and storing the ones not scored yet.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing 'review_id' and 'review_text' columns.
+
+    Returns:
+        pd.DataFrame: DataFrame with review_id, polarity and one column per emotion.
+    """
+    reviews = df[["review_id", "review_text"]].drop_duplicates("review_id")
+    stored = get_review_scores(reviews["review_id"].tolist())
+    if stored.empty:
+        stored = pd.DataFrame(columns=["review_id"] + REVIEW_SCORE_COLUMNS)
+
+    missing = reviews[~reviews["review_id"].isin(stored["review_id"])]
+    if missing.empty:
+        return stored
+
+    computed = score_reviews(missing)
+    save_review_scores(computed)
+    return pd.concat([stored.astype(computed.dtypes.to_dict()), computed], ignore_index=True)
+
+
+def backfill_review_scores(batch_size: int = None) -> int:
+    """
+    Score every review that has no stored scores yet, batch by batch.
+
+    Args:
+        batch_size (int): Number of reviews scored and committed at once.
+                          Defaults to REVIEWS_BATCH_SIZE.
+
+    Returns:
+        int: Number of reviews scored.
+    """
+    batch_size = batch_size or REVIEWS_BATCH_SIZE
+    total = 0
+    last_review_id = 0
+    while True:
+        batch = get_unscored_reviews(batch_size, last_review_id)
+        if batch.empty:
+            break
+        save_review_scores(score_reviews(batch))
+        total += len(batch)
+        last_review_id = int(batch["review_id"].max())
+        print(f"Scored {total} reviews")
+        if len(batch) < batch_size:
+            break
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the review_scores table.")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    print(f"Done: {backfill_review_scores(args.batch_size)} reviews scored")
@@ -0,0 +1,214 @@
+"""
+Scraping of the restaurants and of their reviews, outside of Streamlit.
+
+These functions are run by the worker process (see utils.worker) and report
+their progress through a callback instead of Streamlit widgets.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.tripAdvisorScraper import TripAdvisorSpecificRestaurantScraper
+from utils.db import (
+    save_review_page,
+    get_scrape_checkpoint,
+    get_review_keys,
+    review_text_hash,
+    save_review_changes,
+)
+from utils.embeddings import update_embeddings_with_reviews
+from utils.similarity import refresh_restaurant_embedding
+from utils.term_index import index_restaurant_terms
+
+# Number of reviews per page on TripAdvisor
+REVIEWS_PER_PAGE = 15
+# Restaurants scraped in parallel; the request rate is bounded by utils.rate_limit
+SCRAPE_CONCURRENCY = int(os.environ.get("SCRAPE_CONCURRENCY", 4))
+
+
+def scrape_restaurant_info(url, retries=5, delay=5):
+    """
+    Scrape the information of a restaurant from its page.
+
+    Args:
+        url (str): URL of the restaurant, relative to the TripAdvisor domain.
+        retries (int): Number of attempts.
+        delay (float): Seconds to wait between attempts.
+
+    Returns:
+        dict: The restaurant information, see TripAdvisorSpecificRestaurantScraper.get_restaurant_info.
+    """
+    last_error = None
+    for _ in range(retries):
+        try:
+            scraper = TripAdvisorSpecificRestaurantScraper()
+            scraper.fetch_page(url)
+            info = scraper.get_restaurant_info()
+            if info.get("restaurant_name") is not None:
+                return info
+        except Exception as err:
+            last_error = err
+            print(f"Erreur lors de la récupération des informations {err}")
+        time.sleep(delay)
+    raise Exception(f"Impossible de récupérer les informations du restaurant ({last_error})")
+
+
+def _total_pages(total_reviews_expected):
+    return int(total_reviews_expected or 0) // REVIEWS_PER_PAGE + 5
+
+
+def scrape_restaurant_reviews(scraper, url, total_reviews_expected, progress=None):
+    """
+    Scrape all the reviews of a restaurant.
+
+    Args:
+        scraper (TripAdvisorSpecificRestaurantScraper): The scraper.
+        url (str): URL of the restaurant, relative to the TripAdvisor domain.
+        total_reviews_expected (int): Number of reviews announced by TripAdvisor, used for the progress.
+        progress (callable): Called with (page, total_pages) after each page.
+
+    Returns:
+        list: The parsed reviews.
+    """
+    reviews = []
+    total_pages = _total_pages(total_reviews_expected)
+    for page, page_reviews, _ in scraper.iter_review_pages(url):
+        reviews.extend(page_reviews)
+        if progress:
+            progress(page, total_pages)
+
+    return reviews
+
+
+def scrape_restaurants(restaurants, max_workers=None, url_base=None, progress=None):
+    """
+    Scrape the reviews of several restaurants in parallel. Pages are fetched
+    concurrently but the requests to each host stay paced by its rate limiter.
+
+    Args:
+        restaurants (list): (url, total_reviews_expected) of each restaurant.
+        max_workers (int): Number of restaurants scraped at the same time. Defaults to SCRAPE_CONCURRENCY.
+        url_base (str): Base URL of the site, see TripAdvisorScraper.
+        progress (callable): Called with (url, page, total_pages) after each page.
+
+    Returns:
+        dict: Mapping of each URL to its list of reviews, or to the exception raised while scraping it.
+    """
+    def scrape(url, total_reviews_expected):
+        scraper = TripAdvisorSpecificRestaurantScraper(url_base)
+        page_progress = (lambda page, total_pages: progress(url, page, total_pages)) if progress else None
+        return scrape_restaurant_reviews(scraper, url, total_reviews_expected, page_progress)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers or SCRAPE_CONCURRENCY) as executor:
+        futures = {executor.submit(scrape, url, total): url for url, total in restaurants}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as err:
+                results[futures[future]] = err
+    return results
+
+
+def download_restaurant_reviews(restaurant_id, restaurant_url, total_reviews_expected, progress=None, resume=False):
+    """
+    Scrape the reviews of a restaurant page by page, save each page with its
+    pagination checkpoint, then update the derived data (embeddings,
+    similarity index and term counts).
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        restaurant_url (str): URL of the restaurant, relative to the TripAdvisor domain.
+        total_reviews_expected (int): Number of reviews announced by TripAdvisor.
+        progress (callable): Called with (page, total_pages) after each page.
+        resume (bool): Resume after the last page saved by an interrupted scrape.
+
+    Returns:
+        int: Number of reviews saved, reviews already stored excluded.
+    """
+    url, first_page, reviews_saved = restaurant_url, 1, 0
+    new_texts = []
+    checkpoint = get_scrape_checkpoint(restaurant_id) if resume else None
+    if checkpoint:
+        url, first_page, reviews_saved = checkpoint["next_url"], checkpoint["page"] + 1, checkpoint["reviews_saved"]
+
+    # url is None when the interrupted scrape had already saved its last page
+    if url:
+        scraper = TripAdvisorSpecificRestaurantScraper()
+        total_pages = _total_pages(total_reviews_expected)
+        for page, reviews, next_url in scraper.iter_review_pages(url, first_page):
+            saved = save_review_page(restaurant_id, reviews, next_url, page)
+            if saved is None:
+                raise Exception(f"Échec de l'enregistrement de la page {page}")
+            reviews_saved += len(saved)
+            new_texts.extend(saved)
+            if progress:
+                progress(page, total_pages)
+
+    update_embeddings_with_reviews(new_texts)
+    refresh_restaurant_embedding(restaurant_id)
+    index_restaurant_terms(restaurant_id)
+    return reviews_saved
+
+
+def refresh_restaurant_reviews(restaurant_id, restaurant_url, total_reviews_expected, progress=None):
+    """
+    Add the new reviews of a restaurant without downloading its whole history.
+
+    Reviews are listed newest first: pages are scraped until one only holds
+    reviews already stored, matched on (user_name, date). New reviews are
+    inserted and stored reviews whose text or rating changed are updated, page
+    by page, so the cost of a refresh follows the new activity of the
+    restaurant instead of its number of reviews.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        restaurant_url (str): URL of the restaurant, relative to the TripAdvisor domain.
+        total_reviews_expected (int): Number of reviews announced by TripAdvisor, used for the progress.
+        progress (callable): Called with (page, total_pages) after each page.
+
+    Returns:
+        tuple: Number of reviews inserted and number of reviews updated.
+    """
+    stored = get_review_keys(restaurant_id)
+    total_pages = _total_pages(max(int(total_reviews_expected or 0) - len(stored), 0))
+    inserted = updated = 0
+    new_texts = []
+
+    scraper = TripAdvisorSpecificRestaurantScraper()
+    for page, reviews, _ in scraper.iter_review_pages(restaurant_url):
+        new_reviews, changed_reviews = [], []
+        for review in reviews:
+            key = (review["user_name"], review["date"])
+            if key not in stored:
+                new_reviews.append(review)
+                # Several cards with the same key on the pages are saved once
+                stored[key] = (None, review["rating"], review_text_hash(review["review_text"]))
+                continue
+            review_id, rating, text_hash = stored[key]
+            if review_id is not None and (
+                text_hash != review_text_hash(review["review_text"])
+                or int(rating or 0) != int(review["rating"] or 0)
+            ):
+                changed_reviews.append((review_id, rating, review))
+                stored[key] = (None, review["rating"], review_text_hash(review["review_text"]))
+
+        if new_reviews or changed_reviews:
+            saved = save_review_changes(restaurant_id, new_reviews, changed_reviews)
+            if saved is None:
+                raise Exception(f"Échec de l'enregistrement de la page {page}")
+            inserted += len(saved)
+            new_texts.extend(saved)
+            new_texts.extend(review["review_text"] for _, _, review in changed_reviews)
+        updated += len(changed_reviews)
+        if progress:
+            progress(page, max(total_pages, page))
+        # Every review of the page was already stored: the rest is history
+        if not new_reviews:
+            break
+
+    if inserted or updated:
+        update_embeddings_with_reviews(new_texts)
+        refresh_restaurant_embedding(restaurant_id)
+        index_restaurant_terms(restaurant_id)
+    return inserted, updated
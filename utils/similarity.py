@@ -0,0 +1,240 @@
+"""
+Restaurant vectors and nearest-neighbour search ("restaurants similar to X").
+
+Each restaurant's vector is the contribution-weighted mean of its review
+vectors, as in the similarity analysis, computed over all of its reviews and
+stored in the restaurant_embeddings table. An in-memory index over those
+vectors answers cosine-similarity queries: an exact matrix search by default,
+or an approximate HNSW index when hnswlib is installed and the number of
+restaurants exceeds SIMILARITY_ANN_THRESHOLD.
+"""
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+from utils.db import (
+    get_restaurant_by_id,
+    get_restaurant_embeddings,
+    save_restaurant_embeddings,
+    get_data_versions,
+)
+from utils.embeddings import (
+    get_keyed_vectors,
+    get_model_version,
+    tokenize_reviews,
+    review_vectors,
+    restaurant_centroids,
+)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+SIMILARITY_ANN_THRESHOLD = int(os.environ.get("SIMILARITY_ANN_THRESHOLD", 5000))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class RestaurantIndex:
+    """
+    Cosine nearest-neighbour index over restaurant vectors.
+
+    Attributes:
+        restaurant_ids (np.ndarray): Restaurant ID of each row.
+        vectors (np.ndarray): L2-normalized vectors, one row per restaurant.
+    """
+
+    def __init__(self, restaurant_ids, vectors, approximate=None):
+        """
+        Build the index.
+
+        Args:
+            restaurant_ids (array-like): Restaurant IDs.
+            vectors (np.ndarray): (restaurants x vector_size) array of vectors.
+            approximate (bool): Whether to use an HNSW index. Defaults to True when
+                                hnswlib is installed and the number of restaurants
+                                exceeds SIMILARITY_ANN_THRESHOLD.
+        """
+        self.restaurant_ids = np.asarray(restaurant_ids, dtype=np.int64)
+        self.vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        self._positions = {int(id): i for i, id in enumerate(self.restaurant_ids)}
+        if approximate is None:
+            approximate = hnswlib is not None and len(self.restaurant_ids) > SIMILARITY_ANN_THRESHOLD
+        self._hnsw = self._build_hnsw() if approximate and len(self.restaurant_ids) else None
+        self._lock = threading.Lock()
+
+    def _build_hnsw(self):
+        index = hnswlib.Index(space="cosine", dim=self.vectors.shape[1])
+        index.init_index(max_elements=max(2 * len(self.restaurant_ids), 1024), ef_construction=200, M=16)
+        index.add_items(self.vectors, self.restaurant_ids)
+        index.set_ef(64)
+        return index
+
+    def __len__(self):
+        return len(self.restaurant_ids)
+
+    def update(self, restaurant_id, vector):
+        """
+        Add or replace the vector of a restaurant.
+
+        Args:
+            restaurant_id (int): The ID of the restaurant.
+            vector (np.ndarray): Its vector.
+        """
+        vector = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        with self._lock:
+            position = self._positions.get(int(restaurant_id))
+            if position is not None:
+                self.vectors[position] = vector[0]
+            else:
+                if len(self.restaurant_ids) == 0:
+                    self.vectors = np.empty((0, vector.shape[1]), dtype=np.float32)
+                self._positions[int(restaurant_id)] = len(self.restaurant_ids)
+                self.restaurant_ids = np.append(self.restaurant_ids, int(restaurant_id))
+                self.vectors = np.vstack([self.vectors, vector])
+            if self._hnsw is not None:
+                if self._hnsw.get_current_count() >= self._hnsw.get_max_elements():
+                    self._hnsw.resize_index(2 * self._hnsw.get_max_elements())
+                # hnswlib replaces the vector of an existing label
+                self._hnsw.add_items(vector, [int(restaurant_id)])
+
+    def search(self, vector, k=5, exclude=None):
+        """
+        Find the restaurants most similar to a vector.
+
+        Args:
+            vector (np.ndarray): The query vector.
+            k (int): Number of restaurants to return.
+            exclude (int): A restaurant ID to leave out of the results.
+
+        Returns:
+            pd.DataFrame: restaurant_id and similarity (cosine), most similar first.
+        """
+        if len(self.restaurant_ids) == 0:
+            return pd.DataFrame(columns=["restaurant_id", "similarity"])
+        query = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        wanted = min(k + (exclude is not None), len(self.restaurant_ids))
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(query, k=wanted)
+            ids, similarities = labels[0].astype(np.int64), 1 - distances[0]
+        else:
+            scores = self.vectors @ query[0]
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            top = top[np.argsort(-scores[top])]
+            ids, similarities = self.restaurant_ids[top], scores[top]
+        results = pd.DataFrame({"restaurant_id": ids, "similarity": similarities})
+        if exclude is not None:
+            results = results[results["restaurant_id"] != int(exclude)]
+        return results.head(k).reset_index(drop=True)
+
+    def similar_to(self, restaurant_id, k=5):
+        """
+        Find the restaurants most similar to an indexed restaurant.
+
+        Args:
+            restaurant_id (int): The ID of the restaurant.
+            k (int): Number of restaurants to return.
+
+        Returns:
+            pd.DataFrame: restaurant_id and similarity (cosine), most similar first.
+        """
+        position = self._positions.get(int(restaurant_id))
+        if position is None:
+            return pd.DataFrame(columns=["restaurant_id", "similarity"])
+        return self.search(self.vectors[position], k, exclude=restaurant_id)
+
+
+def compute_restaurant_embeddings(restaurant_ids):
+    """
+    Compute and store the vectors of restaurants from all of their reviews,
+    with the version of the Word2Vec model they come from.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+
+    Returns:
+        tuple: Array of restaurant IDs and (restaurants x vector_size) array of vectors.
+    """
+    # Imported here as utils.functions depends on utils.embeddings
+    from utils.functions import clean_text_df
+
+    # Read before the vectors: if the model is updated meanwhile, these
+    # restaurants are recorded as outdated and computed again
+    model_version = get_model_version()
+    keyed_vectors = get_keyed_vectors()
+    reviews = get_restaurant_by_id(restaurant_ids)
+    if reviews.empty or keyed_vectors is None:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+    reviews = clean_text_df(reviews[reviews["review_text"].notna()].copy())
+    vectors = review_vectors(tokenize_reviews(reviews), keyed_vectors)
+    ids, centroids = restaurant_centroids(
+        vectors, reviews["restaurant_id"], reviews["contributions"].fillna(1).to_numpy()
+    )
+    review_counts = reviews.groupby("restaurant_id").size().loc[ids].to_numpy()
+    save_restaurant_embeddings(ids, centroids, review_counts, model_version)
+    return ids, centroids
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def _embeddings_version():
+    return get_data_versions().get("restaurant_embeddings", 0)
+
+
+def get_restaurant_index():
+    """
+    Get the process-wide restaurant index, rebuilding it when the stored
+    vectors changed since it was built, in this process or another one
+    (e.g. the scraping worker).
+
+    The index is built from the stored vectors only: restaurants without a
+    vector yet are computed by the worker (see utils.projection.refresh_projection),
+    not during the request.
+
+    Returns:
+        RestaurantIndex: The index.
+    """
+    global _index, _index_version
+    version = _embeddings_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            version = _embeddings_version()
+            if _index is None or _index_version != version:
+                # Version read before the vectors: a later change triggers another rebuild
+                _index = RestaurantIndex(*get_restaurant_embeddings())
+                _index_version = version
+    return _index
+
+
+def refresh_restaurant_embedding(restaurant_id):
+    """
+    Recompute the vector of a restaurant after its reviews were (re-)scraped.
+    Storing it bumps the 'restaurant_embeddings' data version, so the indexes
+    of all the processes are rebuilt on their next use.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+    """
+    compute_restaurant_embeddings([restaurant_id])
+
+
+def similar_restaurants(restaurant_id, k=5):
+    """
+    Find the restaurants most similar to a restaurant across the whole database.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        k (int): Number of restaurants to return.
+
+    Returns:
+        pd.DataFrame: restaurant_id and similarity (cosine), most similar first.
+    """
+    return get_restaurant_index().similar_to(restaurant_id, k)
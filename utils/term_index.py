@@ -0,0 +1,199 @@
+"""
+Term-frequency index of the cleaned review text, per restaurant and rating bucket.
+
+Counts are stored in the review_term_counts table when a restaurant's reviews
+are saved (or on first use), so the wordcloud tab merges stored counters
+instead of re-reading and re-splitting every review.
+"""
+
+import re
+from collections import Counter
+import pandas as pd
+from utils.db import (
+    get_restaurant_by_id,
+    get_term_counts,
+    get_term_indexed_restaurants,
+    save_term_counts,
+)
+from utils.functions import (
+    clean_text_df,
+    get_preprocessing_config_hash,
+    get_stop_words,
+    words_not_relevant,
+)
+from utils.normalization import normalize_texts
+
+# Ratings of the reviews of each bucket
+RATING_BUCKETS = {"bad": [1, 2], "neutral": [3], "good": [4, 5]}
+
+
+def rating_buckets(ratings: pd.Series) -> pd.Series:
+    """
+    Get the rating bucket of each review.
+
+    Args:
+        ratings (pd.Series): Review ratings.
+
+    Returns:
+        pd.Series: 'bad', 'neutral' or 'good' for each review.
+    """
+    mapping = {rating: bucket for bucket, values in RATING_BUCKETS.items() for rating in values}
+    return ratings.astype(int).map(mapping)
+
+
+def _tokenize(texts: pd.Series) -> pd.Series:
+    return texts.str.lower().str.replace(r"[^\w\s]", "", regex=True).str.split()
+
+
+def count_terms(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count the terms of the cleaned text of reviews per rating bucket.
+
+    Punctuation is removed and words_not_relevant are left out.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing 'cleaned_text' and 'rating' columns.
+
+    Returns:
+        pd.DataFrame: DataFrame with rating_bucket, term and term_count columns.
+    """
+    terms = pd.DataFrame({
+        "rating_bucket": rating_buckets(df["rating"]).to_numpy(),
+        "term": _tokenize(df["cleaned_text"]).to_numpy(),
+    }).explode("term")
+    terms = terms[terms["term"].notna() & ~terms["term"].isin(set(words_not_relevant))]
+    return terms.groupby(["rating_bucket", "term"]).size().rename("term_count").reset_index()
+
+
+def bucket_counters(term_counts: pd.DataFrame) -> dict:
+    """
+    Turn term counts into one Counter per rating bucket.
+
+    Args:
+        term_counts (pd.DataFrame): DataFrame with rating_bucket, term and term_count columns.
+
+    Returns:
+        dict: Mapping of rating bucket to its term Counter.
+    """
+    counters = {bucket: Counter() for bucket in RATING_BUCKETS}
+    for bucket, counts in term_counts.groupby("rating_bucket"):
+        counters[bucket] = Counter(dict(zip(counts["term"], counts["term_count"])))
+    return counters
+
+
+def _config_hash(root_type):
+    return get_preprocessing_config_hash(root_type, get_stop_words())
+
+
+def index_restaurant_terms(restaurant_id, root_type: str = "lemmatization"):
+    """
+    Count and store the terms of all the reviews of a restaurant.
+
+    Args:
+        restaurant_id (int): The ID of the restaurant.
+        root_type (str): The type of root processing ('stemming' or 'lemmatization').
+    """
+    reviews = get_restaurant_by_id([restaurant_id])
+    reviews = reviews[reviews["review_text"].notna()] if not reviews.empty else reviews
+    if reviews.empty:
+        return
+    reviews = clean_text_df(reviews.copy(), root_type)
+    save_term_counts(restaurant_id, _config_hash(root_type), count_terms(reviews))
+
+
+def get_bucket_counters(restaurant_ids, root_type: str = "lemmatization") -> dict:
+    """
+    Get the merged term counters of restaurants per rating bucket, indexing
+    the restaurants that are not indexed yet.
+
+    Args:
+        restaurant_ids (list): List of restaurant IDs.
+        root_type (str): The type of root processing ('stemming' or 'lemmatization').
+
+    Returns:
+        dict: Mapping of rating bucket to its term Counter.
+    """
+    config_hash = _config_hash(root_type)
+    indexed = get_term_indexed_restaurants(restaurant_ids, config_hash)
+    for restaurant_id in restaurant_ids:
+        if int(restaurant_id) not in indexed:
+            index_restaurant_terms(restaurant_id, root_type)
+    return bucket_counters(get_term_counts(restaurant_ids, config_hash))
+
+
+def parse_highlighted_terms(text: str, root_type: str = "lemmatization") -> list:
+    """
+    Parse the highlighted terms typed by the user. Words are separated by
+    spaces and phrases are written between double quotes, e.g.
+    'prix "service rapide"'. Each term is normalized like the indexed reviews,
+    so it matches their cleaned text; terms made only of stop words are dropped.
+
+    Args:
+        text (str): The text typed by the user.
+        root_type (str): The type of root processing ('stemming' or 'lemmatization').
+
+    Returns:
+        list: The distinct terms, each as a tuple of tokens.
+    """
+    phrases = [phrase or word for phrase, word in re.findall(r'"([^"]+)"|(\S+)', text or "")]
+    if not phrases:
+        return []
+    normalized = _tokenize(pd.Series(normalize_texts(phrases, root_type, get_stop_words())))
+    terms = []
+    for tokens in map(tuple, normalized):
+        # Les mots d'une seule lettre ne sont pas significatifs
+        if tokens and (len(tokens) > 1 or len(tokens[0]) > 1) and tokens not in terms:
+            terms.append(tokens)
+    return terms
+
+
+def _counts_table(terms, counters: dict) -> pd.DataFrame:
+    table = pd.DataFrame({"word": [" ".join(term) for term in terms]})
+    for bucket in RATING_BUCKETS:
+        table[f"{bucket}_count"] = [counters[bucket][term] for term in terms]
+    table["count"] = table[[f"{bucket}_count" for bucket in RATING_BUCKETS]].sum(axis=1)
+    return table[table["count"] > 0].reset_index(drop=True)
+
+
+def count_highlighted_terms(df: pd.DataFrame, terms: list) -> pd.DataFrame:
+    """
+    Count the occurrences of highlighted words and phrases per rating bucket,
+    in one pass over the tokens of each review.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing 'cleaned_text' and 'rating' columns.
+        terms (list): Terms as returned by parse_highlighted_terms.
+
+    Returns:
+        pd.DataFrame: DataFrame with word, bad_count, neutral_count, good_count
+        and count columns, for the terms found at least once.
+    """
+    targets = set(terms)
+    lengths = sorted({len(term) for term in targets})
+    counters = {bucket: Counter() for bucket in RATING_BUCKETS}
+    for bucket, tokens in zip(rating_buckets(df["rating"]), _tokenize(df["cleaned_text"].fillna(""))):
+        counter = counters[bucket]
+        for n in lengths:
+            counter.update(
+                gram for gram in zip(*(tokens[i:] for i in range(n))) if gram in targets
+            )
+    return _counts_table(terms, counters)
+
+
+def highlighted_counts_from_index(counters: dict, terms: list) -> pd.DataFrame:
+    """
+    Count highlighted single words per rating bucket from term counters,
+    without reading the reviews. Phrases are not in the index and count 0.
+
+    Args:
+        counters (dict): Mapping of rating bucket to its term Counter.
+        terms (list): Terms as returned by parse_highlighted_terms.
+
+    Returns:
+        pd.DataFrame: Same table as count_highlighted_terms.
+    """
+    unigram_counters = {
+        bucket: Counter({(term[0],): counters[bucket][term[0]] for term in terms if len(term) == 1})
+        for bucket in RATING_BUCKETS
+    }
+    return _counts_table(terms, unigram_counters)
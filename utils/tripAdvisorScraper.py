@@ -1,6 +1,6 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, NavigableString
+import os
 import time
-import requests
 import random
 import string
 import locale
@@ -9,48 +9,135 @@ from datetime import datetime
 from utils.functions import (
     clean_text, 
     extract_by_regex, 
-    filter_by_regex, 
-    get_keys, 
-    get_coordinates)
+    filter_by_regex)
+from utils.geocoding import geocode
+from utils.rate_limit import get_rate_limiter
+from utils.http_client import fetch_page, get_session, page_cache
+
+TRIPADVISOR_URL_BASE = os.environ.get("TRIPADVISOR_URL_BASE", "https://www.tripadvisor.fr")
 
 try:
     locale.setlocale(locale.LC_TIME, 'fr_FR.UTF-8')
 except locale.Error:
     locale.setlocale(locale.LC_TIME, 'C')
 
+# lxml is much faster than the built-in parser, use it when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+NEXT_BUTTON_CLASS = "BrOJk u j z _F wSSLS tIqAi unMkR"
+REVIEW_CARD_CLASS = "_c"
+RESTAURANT_CARD_CLASS = "vIjFZ Gi o VOEhq"
+# Refetches of a page without review cards, with exponential backoff (seconds)
+EMPTY_PAGE_RETRIES = int(os.environ.get("SCRAPE_EMPTY_PAGE_RETRIES", 5))
+EMPTY_PAGE_BACKOFF = float(os.environ.get("SCRAPE_EMPTY_PAGE_BACKOFF", 2))
+
+# (tag, class) of the fields of a review card, matched like BeautifulSoup's
+# class_ argument: the whole class attribute, or one class for a single word
+REVIEW_CARD_FIELDS = {
+    ("div", "biGQs _P pZUbB KxBGd"): "review_text",
+    ("span", "b"): "contributions",
+    ("div", "biGQs _P pZUbB ncFvv osNWb"): "date",
+    ("a", "BMQDV _F Gv wSSLS SwZTJ FGwzt ukgoS"): "user_name",
+    ("svg", "UctUV d H0"): "rating",
+}
+RESTAURANT_CARD_FIELDS = {
+    ("a", "BMQDV _F Gv wSSLS SwZTJ FGwzt ukgoS"): "name",
+    ("span", "IiChw"): "reviews",
+    ("span", "Qqwyj"): "median_reviews",
+}
+RESTAURANT_TYPE_CLASS = ("span", "YECgr Tsrjt")
+
+
+def _class_keys(tag):
+    """Class values a tag can be matched on: its whole class attribute and each of its classes."""
+    classes = tag.get("class")
+    if not classes:
+        return ()
+    if len(classes) == 1:
+        return (classes[0],)
+    return (" ".join(classes),) + tuple(classes)
+
+
+def _find_fields(card, fields):
+    """Find the first tag of each field of a card in one pass over its tags."""
+    found = {}
+    for tag in card.find_all(True):
+        for class_key in _class_keys(tag):
+            field = fields.get((tag.name, class_key))
+            if field is not None and field not in found:
+                found[field] = tag
+    return found
+
+
+def _has_class(attrs, value):
+    classes = attrs.get("class") or ""
+    if not isinstance(classes, str):
+        classes = " ".join(classes)
+    return classes == value or value in classes.split()
+
+
+def _page_strainer(card_class):
+    """Keep only the cards and the next page button when parsing a page."""
+    return SoupStrainer(
+        lambda name, attrs: (name == "div" and _has_class(attrs, card_class))
+        or (name == "a" and _has_class(attrs, NEXT_BUTTON_CLASS))
+    )
+
+
+REVIEW_PAGE_STRAINER = _page_strainer(REVIEW_CARD_CLASS)
+RESTAURANT_PAGE_STRAINER = _page_strainer(RESTAURANT_CARD_CLASS)
+
+
+def parse_html(content, parse_only=None):
+    """
+    Parse a page with the fastest available parser.
+
+    Args:
+        content (bytes): The HTML page.
+        parse_only (SoupStrainer): Only keep the matching tags.
+
+    Returns:
+        BeautifulSoup: The soup.
+    """
+    return BeautifulSoup(content, HTML_PARSER, parse_only=parse_only)
+
 class TripAdvisorScraper:
     """
     Base class for TripAdvisor scraping.
     All other classes inherit from this.
     """
-    def __init__(self):
-        self.url_base = "https://www.tripadvisor.fr"
+    def __init__(self, url_base=None, session=None):
+        self.url_base = url_base or TRIPADVISOR_URL_BASE
+        # Keep-alive session, shared by the scrapers of the same thread
+        self.session = session or get_session()
         self.soup = None
         self.url = None
         self.full_url = None
 
-    def fetch_page(self, url):
-        """Fetch a page and set the soup."""
+    def fetch_page(self, url, parse_only=None, revalidate=True):
+        """Fetch a page and set the soup. Unchanged pages are revalidated
+        and reused from the page cache (see utils.http_client), unless
+        revalidate is False. With parse_only, only the matching tags are
+        kept in the soup."""
         self.url = url
         self.full_url = self.url_base + url
         random_request_id = "".join(
             random.choice(string.ascii_lowercase + string.digits) for _ in range(180)
         )
 
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
-            "accept-language": "en-US,en;q=0.9,fr;q=0.8",
-            "X-Requested-By": random_request_id,
-            "Referer": "https://www.tripadvisor.fr/Hotels",
-            "Origin": "https://www.tripadvisor.fr",
-            "accept-encoding": "gzip, deflate, br",
-            "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
-            "encoding": "utf-8",
-        }
-
-        response = requests.get(self.full_url, headers=headers)
-        response.raise_for_status()
-        self.soup = BeautifulSoup(response.content, "html.parser")
+        # Requests to a host, retries included, are paced by its shared token bucket
+        self.soup = fetch_page(
+            self.full_url,
+            lambda content: parse_html(content, parse_only),
+            headers={"X-Requested-By": random_request_id},
+            session=self.session,
+            cache=page_cache if revalidate else None,
+            rate_limiter=get_rate_limiter(self.full_url),
+        )
         
     def get_soup(self):
         """Get the soup."""
@@ -67,21 +154,25 @@ class TripAdvisorScraper:
         """Get the next page's URL."""
         next_button = self.soup.find(
             "a", 
-            class_="BrOJk u j z _F wSSLS tIqAi unMkR",
+            class_=NEXT_BUTTON_CLASS,
             attrs={"aria-label": "Page suivante"},
         )
         return next_button["href"] if next_button else None
 
 class TripAdvisorSpecificRestaurantScraper(TripAdvisorScraper):
     """Scraper for reviews of a specific restaurant."""
-    def __init__(self):
-        super().__init__()
+    def __init__(self, url_base=None):
+        super().__init__(url_base)
         self.restaurant_data = []
 
+    def fetch_review_page(self, url, revalidate=True):
+        """Fetch a page of reviews, keeping only the review cards and the next page button."""
+        self.fetch_page(url, REVIEW_PAGE_STRAINER, revalidate)
+
     def get_review_cards(self):
         """Extract review cards."""
         if self.soup:
-            return self.soup.find_all("div", class_="_c")
+            return self.soup.find_all("div", class_=REVIEW_CARD_CLASS)
         print("Soup not initialized. Fetch the page first.")
         return []
     
@@ -90,9 +181,7 @@ class TripAdvisorSpecificRestaurantScraper(TripAdvisorScraper):
         address = self.soup.find('span', class_="biGQs _P pZUbB KxBGd", attrs={"data-automation": "restaurantsMapLinkOnName"})
         if address:
             address = address.text
-            google_key = get_keys()['google_maps_api_key']
-            if google_key:
-                coordinates = get_coordinates(address, google_key)
+            coordinates = geocode(address)
 
             return {
                 "address": coordinates['address'] if coordinates else address,
@@ -155,17 +244,16 @@ class TripAdvisorSpecificRestaurantScraper(TripAdvisorScraper):
 
     def parse_review(self, review_card):
         """Parse data from a single review card."""
-        review_text_class = "biGQs _P pZUbB KxBGd"
-        contributions_class = "b"
-        date_class = "biGQs _P pZUbB ncFvv osNWb"
-        user_name_class = "BMQDV _F Gv wSSLS SwZTJ FGwzt ukgoS"
-        rating_class = "UctUV d H0"
-
-        review_text = review_card.find("div", class_=review_text_class).get_text(strip=True) if review_card.find("div", class_=review_text_class) else None
-        contributions = review_card.find("span", class_=contributions_class).get_text(strip=True) if review_card.find("span", class_=contributions_class) else None
-        date = review_card.find("div", class_=date_class).get_text(strip=True) if review_card.find("div", class_=date_class) else None
-        user_name = review_card.find("a", class_=user_name_class).get_text(strip=True) if review_card.find("a", class_=user_name_class) else None
-        rating = review_card.find("svg", class_=rating_class).title.text if review_card.find("svg", class_=rating_class) else None
+        fields = _find_fields(review_card, REVIEW_CARD_FIELDS)
+
+        def text(field):
+            return fields[field].get_text(strip=True) if field in fields else None
+
+        review_text = text("review_text")
+        contributions = text("contributions")
+        date = text("date")
+        user_name = text("user_name")
+        rating = fields["rating"].title.text if "rating" in fields else None
 
         date = filter_by_regex(date, r"Rédigé le") if date else None
         rating = extract_by_regex(rating, r"(\d\,\d)") if rating else None
@@ -183,40 +271,61 @@ class TripAdvisorSpecificRestaurantScraper(TripAdvisorScraper):
             "rating": rating,
         }
 
+    def get_page_review_cards(self):
+        """Extract the review cards of the current page, fetching it again
+        with exponential backoff while it has none."""
+        review_cards = self.get_review_cards()
+        tries = 0
+        while not review_cards:
+            tries += 1
+            if tries > EMPTY_PAGE_RETRIES:
+                raise Exception("No review cards found - Aborting")
+            time.sleep(EMPTY_PAGE_BACKOFF * 2 ** (tries - 1))
+            self.fetch_review_page(self.url, revalidate=False)
+            review_cards = self.get_review_cards()
+        return review_cards
+
+    def iter_review_pages(self, url=None, page=1):
+        """
+        Scrape the reviews page by page. The next page is only fetched once
+        the reviews of the current one have been consumed.
+
+        Args:
+            url (str): URL of the first page. Defaults to the current page.
+            page (int): Number of the first page.
+
+        Yields:
+            tuple: (page number, reviews of the page, URL of the next page or None).
+        """
+        if url is not None:
+            self.fetch_review_page(url)
+        while self.url:
+            reviews = [self.parse_review(card) for card in self.get_page_review_cards()]
+            next_url = self.get_next_url()
+            yield page, reviews, next_url
+            self.url = next_url
+            if self.url:
+                self.fetch_review_page(self.url)
+            page += 1
+
     def get_all_reviews(self):
         """Get all reviews from the restaurant."""
         reviews = []
-        page = 1
-        tries = 0
-        while self.url:
-            time.sleep(random.uniform(1, 3))
-            review_cards = self.get_review_cards()
-            if not review_cards:
-                tries += 1
-                if tries > 10:
-                    raise Exception("No restaurant cards found - Aborting")
-                else:
-                    continue
+        for page, page_reviews, _ in self.iter_review_pages():
             print(f"Scraping page {page}")
-            tries = 0
-            for card in review_cards:
-                reviews.append(self.parse_review(card))
-            self.url = self.get_next_url()
-            if self.url:
-                self.fetch_page(self.url)
-            page += 1   
+            reviews.extend(page_reviews)
         return reviews
 
 class TripAdvisorRestaurantsScraper(TripAdvisorScraper):
     """Scraper for the list of restaurants."""
-    def __init__(self):
-        super().__init__()
+    def __init__(self, url_base=None):
+        super().__init__(url_base)
         self.restaurant_data = []
 
     def get_restaurant_cards(self):
         """Extract restaurant cards."""
         if self.soup:
-            cards = self.soup.find_all("div", class_="vIjFZ Gi o VOEhq")
+            cards = self.soup.find_all("div", class_=RESTAURANT_CARD_CLASS)
             if not cards:
                 print("No restaurant cards found. Check the structure.")
             return cards
@@ -225,26 +334,27 @@ class TripAdvisorRestaurantsScraper(TripAdvisorScraper):
 
     def parse_restaurant(self, restaurant_card):
         """Parse data from a single restaurant card."""
-        name_class = "BMQDV _F Gv wSSLS SwZTJ FGwzt ukgoS"
-        url_class = "BMQDV _F Gv wSSLS SwZTJ FGwzt ukgoS"
-        reviews_class = "IiChw"
-        median_reviews_class = "Qqwyj"
-        restaurant_type = "YECgr Tsrjt"
-        restautant_price = "biGQs _P pZUbB KxBGd"
-
-        name = restaurant_card.find("a", class_=name_class).get_text(strip=True) if restaurant_card.find("a", class_=name_class) else None
-        url = restaurant_card.find("a", class_=url_class)["href"] if restaurant_card.find("a", class_=url_class) else None
-        reviews = restaurant_card.find("span", class_=reviews_class).get_text(strip=True) if restaurant_card.find("span", class_=reviews_class) else None
-        median_reviews = restaurant_card.find("span", class_=median_reviews_class).get_text(strip=True) if restaurant_card.find("span", class_=median_reviews_class) else None
-        restaurant_type = restaurant_card.find_all("span", class_=restaurant_type) if restaurant_card.find("span", class_=restaurant_type) else None
-        restaurant_price = restaurant_card.find("span", class_=restautant_price).get_text(strip=True) if restaurant_card.find("span", class_=restautant_price) else None
-        euro_values = [element.get_text() for element in restaurant_card.find_all(text=lambda text: '€' in text)]
-        if len(euro_values) > 0:
-            for euro_value in euro_values:
-                if '€' in euro_value:
-                    restaurant_price = euro_value
-        else:
-            restaurant_price = None
+        fields = {}
+        restaurant_type = []
+        restaurant_price = None
+        # One pass over the card for all the fields
+        for node in restaurant_card.descendants:
+            if isinstance(node, NavigableString):
+                if '€' in node:
+                    restaurant_price = str(node)
+                continue
+            for class_key in _class_keys(node):
+                if (node.name, class_key) == RESTAURANT_TYPE_CLASS:
+                    restaurant_type.append(node)
+                    break
+                field = RESTAURANT_CARD_FIELDS.get((node.name, class_key))
+                if field is not None and field not in fields:
+                    fields[field] = node
+
+        name = fields["name"].get_text(strip=True) if "name" in fields else None
+        url = fields["name"]["href"] if "name" in fields else None
+        reviews = fields["reviews"].get_text(strip=True) if "reviews" in fields else None
+        median_reviews = fields["median_reviews"].get_text(strip=True) if "median_reviews" in fields else None
         if name:
             name = name.replace("'", " ")
         ranking, name = name.split(".", 1) if name else (None, None)
@@ -271,8 +381,7 @@ class TripAdvisorRestaurantsScraper(TripAdvisorScraper):
         page = 1
         tries = 0
         while self.url is not None:
-            time.sleep(random.uniform(1, 3))
-            self.fetch_page(self.url)
+            self.fetch_page(self.url, RESTAURANT_PAGE_STRAINER)
             restaurant_cards = self.get_restaurant_cards()
             if not restaurant_cards:
                 tries += 1
@@ -0,0 +1,246 @@
+"""
+Worker process running the scraping jobs of the scrape_jobs table.
+
+    python -m utils.worker
+
+Jobs are enqueued by the Restaurants page and claimed with
+FOR UPDATE SKIP LOCKED, so several workers can run side by side. The progress
+and logs of each job are written to the table, where the page polls them.
+A failed job is queued again, after a growing delay, until it has run
+SCRAPE_JOB_MAX_ATTEMPTS times, and resumes from the pagination checkpoint of
+its restaurant. Errors that would happen again (PermanentJobError) fail the
+job at once.
+"""
+
+import os
+import time
+import socket
+import argparse
+import threading
+from contextlib import contextmanager
+from utils.db import (
+    claim_scrape_job,
+    update_scrape_job,
+    finish_scrape_job,
+    retry_scrape_job,
+    requeue_stale_scrape_jobs,
+    get_scrape_checkpoint,
+    restaurant_exists,
+    save_restaurant_to_db,
+    delete_reviews_by_restaurant_id,
+)
+from utils.scraping import scrape_restaurant_info, download_restaurant_reviews, refresh_restaurant_reviews
+from utils.projection import refresh_projection
+
+POLL_INTERVAL = float(os.environ.get("SCRAPE_WORKER_POLL_INTERVAL", 5))
+# Seconds without heartbeat after which a running job is considered abandoned
+STALE_JOB_TIMEOUT = int(os.environ.get("SCRAPE_JOB_TIMEOUT", 600))
+# Seconds between two heartbeats of a running job, whatever it is doing
+HEARTBEAT_INTERVAL = float(os.environ.get("SCRAPE_JOB_HEARTBEAT_INTERVAL", 30))
+MAX_JOB_ATTEMPTS = int(os.environ.get("SCRAPE_JOB_MAX_ATTEMPTS", 3))
+# Seconds before the first retry of a failed job, doubled at each attempt
+RETRY_BACKOFF = float(os.environ.get("SCRAPE_JOB_RETRY_BACKOFF", 60))
+# Jobs run at the same time by a worker process
+WORKER_CONCURRENCY = int(os.environ.get("SCRAPE_WORKER_CONCURRENCY", 4))
+
+
+class PermanentJobError(Exception):
+    """Error of a job that running it again would not fix, so it is not retried."""
+
+
+# Un seul thread recalcule les vecteurs et la projection à la fois
+_refresh_lock = threading.Lock()
+
+
+def _refresh_model_outputs():
+    """
+    Recompute the outputs of the Word2Vec model (restaurant vectors and
+    projection) if it was updated, unless another thread is already doing it.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        if refresh_projection():
+            print("Vecteurs des restaurants et projection recalculés")
+    except Exception as e:
+        print(f"Erreur lors du recalcul de la projection : {e}")
+    finally:
+        _refresh_lock.release()
+
+
+@contextmanager
+def _heartbeat(job_id, interval=None):
+    """
+    Refresh the heartbeat of a job from a background thread while the block
+    runs, so the job is not requeued as stale during long steps without
+    progress (e.g. updating the Word2Vec model after the last page).
+
+    Args:
+        job_id (int): The ID of the job.
+        interval (float): Seconds between two heartbeats. Defaults to HEARTBEAT_INTERVAL.
+    """
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(interval or HEARTBEAT_INTERVAL):
+            update_scrape_job(job_id)
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def _progress_callback(job_id):
+    def progress(page, total_pages):
+        update_scrape_job(
+            job_id,
+            progress=min(page / total_pages, 0.99),
+            message=f"Scraping page {page} sur {total_pages}"
+        )
+    return progress
+
+
+def run_job(job):
+    """
+    Run a scraping job.
+
+    Args:
+        job (dict): The job, as returned by claim_scrape_job.
+
+    Returns:
+        int: Number of reviews downloaded.
+    """
+    job_id = job["job_id"]
+    restaurant_id = job["restaurant_id"]
+    total_reviews = job["total_reviews"]
+
+    # Un téléchargement interrompu (worker arrêté ou erreur) reprend au
+    # dernier checkpoint, quel que soit le nombre de tentatives
+    checkpoint = get_scrape_checkpoint(restaurant_id) if restaurant_id is not None else None
+    resume = bool(checkpoint and checkpoint["next_url"])
+    if resume:
+        update_scrape_job(job_id, log=f"Reprise au dernier checkpoint (page {checkpoint['page'] + 1})")
+
+    if job["job_type"] == "refresh":
+        reviews_downloaded = 0
+        if resume:
+            # Les pages restantes d'un téléchargement complet interrompu
+            # passent avant la mise à jour, qui s'arrête aux avis connus
+            reviews_downloaded = download_restaurant_reviews(
+                restaurant_id,
+                job["restaurant_url"],
+                total_reviews,
+                _progress_callback(job_id),
+                resume=True
+            )
+        # Relancer une mise à jour incrémentale est sans risque : les avis déjà
+        # enregistrés sont reconnus et la pagination s'arrête sur eux
+        inserted, updated = refresh_restaurant_reviews(
+            restaurant_id,
+            job["restaurant_url"],
+            total_reviews,
+            _progress_callback(job_id)
+        )
+        reviews_downloaded += inserted
+        update_scrape_job(job_id, reviews_downloaded=reviews_downloaded,
+                          log=f"{inserted} nouvel(s) avis, {updated} avis modifié(s)")
+        return reviews_downloaded
+
+    if job["job_type"] == "new":
+        if restaurant_id is None:
+            if restaurant_exists(job["restaurant_url"]):
+                raise PermanentJobError("Restaurant déjà existant")
+            update_scrape_job(job_id, message="Récupération des informations du restaurant")
+            info = scrape_restaurant_info(job["restaurant_url"])
+            restaurant_df = save_restaurant_to_db(info)
+            if restaurant_df is None:
+                raise Exception("Échec de l'enregistrement du restaurant")
+            restaurant_id = int(restaurant_df["restaurant_id"].iloc[0])
+            total_reviews = int(restaurant_df["restaurant_total_reviews"].iloc[0])
+            update_scrape_job(job_id, restaurant_id=restaurant_id, total_reviews=total_reviews,
+                              log=f"Restaurant enregistré : {info['restaurant_name']}")
+    elif not resume:
+        delete_reviews_by_restaurant_id(restaurant_id)
+
+    reviews_downloaded = download_restaurant_reviews(
+        restaurant_id,
+        job["restaurant_url"],
+        total_reviews,
+        _progress_callback(job_id),
+        resume=resume
+    )
+    update_scrape_job(job_id, reviews_downloaded=reviews_downloaded)
+    return reviews_downloaded
+
+
+def _run_jobs(worker, poll_interval, once):
+    while True:
+        requeued = requeue_stale_scrape_jobs(STALE_JOB_TIMEOUT, MAX_JOB_ATTEMPTS)
+        if requeued:
+            print(f"{requeued} tâche(s) remise(s) en file d'attente")
+
+        job = claim_scrape_job(worker)
+        if job is None:
+            # File vide : on met à jour ce qui dépend du modèle Word2Vec
+            _refresh_model_outputs()
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f"[{worker}] Tâche {job['job_id']} : {job['job_type']} {job['restaurant_url']}")
+        try:
+            with _heartbeat(job["job_id"]):
+                reviews_downloaded = run_job(job)
+            finish_scrape_job(job["job_id"], "done", f"Succès : {reviews_downloaded} avis téléchargés.")
+        except Exception as e:
+            error_message = f"Erreur : {e}"
+            print(error_message)
+            if job["attempts"] < MAX_JOB_ATTEMPTS and not isinstance(e, PermanentJobError):
+                delay = RETRY_BACKOFF * 2 ** (job["attempts"] - 1)
+                retry_scrape_job(
+                    job["job_id"],
+                    f"{error_message} (tentative {job['attempts']} sur {MAX_JOB_ATTEMPTS}, "
+                    f"nouvel essai dans {delay:.0f} s)",
+                    delay
+                )
+            else:
+                finish_scrape_job(job["job_id"], "failed", error_message)
+
+
+def run_worker(poll_interval=None, once=False, concurrency=None):
+    """
+    Claim and run the queued jobs until stopped. Several jobs run at the same
+    time in threads; the requests they send share the per-host rate limiters
+    of utils.rate_limit.
+
+    Args:
+        poll_interval (float): Seconds between two polls of an empty queue. Defaults to POLL_INTERVAL.
+        once (bool): Stop when the queue is empty.
+        concurrency (int): Number of jobs run at the same time. Defaults to WORKER_CONCURRENCY.
+    """
+    poll_interval = poll_interval or POLL_INTERVAL
+    concurrency = concurrency or WORKER_CONCURRENCY
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Worker {name} démarré ({concurrency} tâche(s) en parallèle)")
+    threads = [
+        threading.Thread(target=_run_jobs, args=(f"{name}:{i}", poll_interval, once), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scraping jobs of the scrape_jobs table.")
+    parser.add_argument("--poll-interval", type=float, default=None)
+    parser.add_argument("--once", action="store_true", help="Stop when the queue is empty.")
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+    run_worker(args.poll_interval, args.once, args.concurrency)
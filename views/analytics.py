@@ -1,22 +1,35 @@
 """ Ce module contient la page "Analyse". """
 
 import streamlit as st
-import matplotlib.pyplot as plt
 import plotly.graph_objects as go
-from wordcloud import WordCloud
 
-from utils.db import get_downloaded_restaurants, get_restaurant_by_id
-from collections import Counter
+from utils.cache import (
+    cached_cleaned_reviews,
+    cached_contributions_median,
+    cached_restaurant_review_stats,
+    cached_rating_histograms,
+)
 import altair as alt
 
 from utils.functions import (
     extract_types_from_df,
     generate_wordcloud,
-    clean_text_df,
     generate_word2vec,
     generate_sentiments_analysis,
     generate_word_frequencies_chart,
     generate_spider_plot,
+    generate_review_projection,
+)
+from utils.similarity import similar_restaurants
+from utils.image_cache import render_wordcloud_png
+from utils.term_index import (
+    RATING_BUCKETS,
+    bucket_counters,
+    count_terms,
+    get_bucket_counters,
+    parse_highlighted_terms,
+    count_highlighted_terms,
+    highlighted_counts_from_index,
 )
 
 
@@ -72,9 +85,9 @@ def restaurant_filters(df, tab_title):
     return selected_names, names
 
 
-def get_filtered_restaurant(df, selected_names, names, relevance):
+def get_selected_restaurant_ids(df, selected_names, names):
     """
-    Fonction pour filtrer les restaurants sélectionnés par l'utilisateur.
+    Fonction pour obtenir les IDs des restaurants sélectionnés par l'utilisateur.
     """
     if len(selected_names) <= 0 and "Tous" not in selected_names:
         st.warning("Veuillez sélectionner au moins un restaurant.")
@@ -94,14 +107,27 @@ def get_filtered_restaurant(df, selected_names, names, relevance):
             st.warning(
                 "Vous avez sélectionné plus de dix restaurants, cela peut prendre du temps."
             )
+        return filtered_df["restaurant_id"].tolist()
+
 
-        # Obtenir les détails des restaurants par IDs
-        restaurant_ids = filtered_df["restaurant_id"].tolist()
-        filtered_df = get_restaurant_by_id(restaurant_ids)
-        if relevance:
-            avg = filtered_df["contributions"].median()
-            filtered_df = filtered_df[filtered_df["contributions"] >= avg]
-        return filtered_df
+def get_min_contributions(restaurant_ids, relevance):
+    """
+    Seuil de contributions des avis pertinents : la médiane, calculée en base.
+    """
+    if relevance:
+        return cached_contributions_median(restaurant_ids)
+    return None
+
+
+def get_filtered_restaurant(df, selected_names, names, relevance):
+    """
+    Fonction pour filtrer les restaurants sélectionnés par l'utilisateur.
+    Les avis renvoyés sont pré-traités (colonne cleaned_text).
+    """
+    restaurant_ids = get_selected_restaurant_ids(df, selected_names, names)
+    # Obtenir les avis des restaurants par IDs
+    min_contributions = get_min_contributions(restaurant_ids, relevance)
+    return cached_cleaned_reviews(restaurant_ids, min_contributions)
 
 
 def analytics_page(df):
@@ -156,7 +182,6 @@ def analytics_page(df):
                 "Acquisition et pré-traitement des données sélectionnées... ⏳"
             ):
                 filtered_df = get_filtered_restaurant(df, selected_names, names, relevance)
-                filtered_df = clean_text_df(filtered_df)
                 # analysis_filtered.analytics_filtered_page(filtered_df)
 
             with st.spinner("Analyse des sentiments en cours... ⏳"):
@@ -188,7 +213,7 @@ def analytics_page(df):
         with st.expander("Options de personnalisation"):
             ignored_words_input = st.text_area("Entrez les mots que vous souhaitez ignorer (séparés par des espaces)")
             ignored_words = ignored_words_input.split() if ignored_words_input else []
-            highlighted_words = st.text_area("Entrez les mots que vous souhaitez mettre en avant (séparés par des espaces)")
+            highlighted_words = st.text_area("Entrez les mots que vous souhaitez mettre en avant (séparés par des espaces, les expressions entre guillemets)")
 
         relevance = st.checkbox("Analyse des avis les plus pertinents ?", value=False,
                                 help="Seuls les avis émis par des internautes ayant un volume de contribution supérieur à la médiane seront pris en compte lors de l'analyse.",
@@ -200,19 +225,33 @@ def analytics_page(df):
             with st.spinner(
                 "Acquisition et pré-traitement des données sélectionnées... ⏳"
             ):
-                filtered_df = get_filtered_restaurant(df, selected_names, names, relevance)
-                filtered_df = clean_text_df(filtered_df)
+                restaurant_ids = get_selected_restaurant_ids(df, selected_names, names)
+                min_contributions = get_min_contributions(restaurant_ids, relevance)
+                reviews_stats = cached_restaurant_review_stats(restaurant_ids, min_contributions)
+                ratings_histograms = cached_rating_histograms(restaurant_ids, min_contributions)
+                # Les avis ne sont relus que s'ils sont filtrés par pertinence
+                # ou pour chercher des expressions, sinon l'index des termes suffit
+                highlighted_terms = parse_highlighted_terms(highlighted_words)
+                filtered_df = None
+                if relevance or any(len(term) > 1 for term in highlighted_terms):
+                    filtered_df = cached_cleaned_reviews(restaurant_ids, min_contributions)
+                if relevance:
+                    term_counters = bucket_counters(count_terms(filtered_df))
+                else:
+                    term_counters = get_bucket_counters(restaurant_ids)
 
             with st.spinner("Création du nuage de mots en cours... ⏳"):
-                bad_reviews = filtered_df[filtered_df['rating'].isin([1, 2])]
-                neutral_reviews = filtered_df[filtered_df['rating'] == 3]
-                good_reviews = filtered_df[filtered_df['rating'].isin([4, 5])]
-                
+                bucket_sizes = {
+                    bucket: int(ratings_histograms[[f"rating_{rating}" for rating in ratings]].to_numpy().sum())
+                    for bucket, ratings in RATING_BUCKETS.items()
+                }
+
                 # Description du DataFrame
-                total_reviews = len(filtered_df)
-                unique_restaurants = filtered_df["restaurant_id"].nunique()
-                avg_reviews_per_restaurant = filtered_df.groupby("restaurant_name")["rating"].mean().round(1)
-                reviews_per_restaurant = filtered_df.groupby("restaurant_name")["rating"].count().round(1)
+                total_reviews = int(reviews_stats["review_count"].sum())
+                unique_restaurants = len(reviews_stats)
+                reviews_stats = reviews_stats.set_index("restaurant_name")
+                avg_reviews_per_restaurant = reviews_stats["average_rating"].round(1)
+                reviews_per_restaurant = reviews_stats["review_count"]
 
                 st.write(f"Nombre total d'avis : {total_reviews}")
                 st.write(f"Nombre de restaurants uniques analysés : {unique_restaurants}")
@@ -224,90 +263,61 @@ def analytics_page(df):
                 with colcount:
                     st.write("**Nombre total d'avis par restaurant :**")
                     st.write(reviews_per_restaurant)
+                st.write("**Répartition des notes par restaurant :**")
+                st.write(ratings_histograms.drop(columns="restaurant_id").set_index("restaurant_name"))
                 # Afficher les nuages de mots pour chaque catégorie
                 col1, col2 = st.columns(2)
-                if not bad_reviews.empty:
+                if bucket_sizes["bad"] > 0:
                     with col1:
-                            st.subheader(f"Nuage de mots des avis négatifs ({len(bad_reviews)} avis)")
-                            bad_wordcloud = generate_wordcloud(bad_reviews, ignored_words)
-                            plt.figure(figsize=(10, 5))
-                            plt.imshow(bad_wordcloud, interpolation="bilinear")
-                            plt.axis("off")
-                            plt.show()
-                            st.pyplot(plt)
+                            st.subheader(f"Nuage de mots des avis négatifs ({bucket_sizes['bad']} avis)")
+                            st.image(generate_wordcloud(term_counters["bad"], ignored_words))
                             
                     with col2:
-                            bar_chart, total_words = generate_word_frequencies_chart(bad_reviews, ignored_words, color="red")
+                            bar_chart, total_words = generate_word_frequencies_chart(term_counters["bad"], ignored_words, color="red")
                             st.write(f"Nombre total de mots : {total_words}")
                             st.altair_chart(bar_chart, use_container_width=True)
                             
                 col3, col4 = st.columns(2)
                 
-                if not neutral_reviews.empty:
+                if bucket_sizes["neutral"] > 0:
                     with col3:
-                            st.subheader(f"Nuage de mots des avis neutres ({len(neutral_reviews)} avis)")
-                            neutral_wordcloud = generate_wordcloud(neutral_reviews, ignored_words,)
-                            plt.figure(figsize=(10, 5))
-                            plt.imshow(neutral_wordcloud, interpolation="bilinear")
-                            plt.axis("off")
-                            plt.show()
-                            st.pyplot(plt)
+                            st.subheader(f"Nuage de mots des avis neutres ({bucket_sizes['neutral']} avis)")
+                            st.image(generate_wordcloud(term_counters["neutral"], ignored_words))
                             
                     with col4:
-                            bar_chart, total_words = generate_word_frequencies_chart(neutral_reviews, ignored_words, color="grey")
+                            bar_chart, total_words = generate_word_frequencies_chart(term_counters["neutral"], ignored_words, color="grey")
                             st.write(f"Nombre total de mots : {total_words}")
                             st.altair_chart(bar_chart, use_container_width=True)
 
                 col5, col6 = st.columns(2)
-                if not good_reviews.empty:
+                if bucket_sizes["good"] > 0:
                     with col5:
-                            st.subheader(f"Nuage de mots des avis positifs ({len(good_reviews)} avis)")
-                            good_wordcloud = generate_wordcloud(good_reviews, ignored_words)
-                            plt.figure(figsize=(10, 5))
-                            plt.imshow(good_wordcloud, interpolation="bilinear")
-                            plt.axis("off")
-                            plt.show()
-                            st.pyplot(plt)
+                            st.subheader(f"Nuage de mots des avis positifs ({bucket_sizes['good']} avis)")
+                            st.image(generate_wordcloud(term_counters["good"], ignored_words))
                     with col6:  
-                            bar_chart, total_words = generate_word_frequencies_chart(good_reviews, ignored_words, color="green")
+                            bar_chart, total_words = generate_word_frequencies_chart(term_counters["good"], ignored_words, color="green")
                             st.write(f"Nombre total de mots : {total_words}")
                             st.altair_chart(bar_chart, use_container_width=True)
                             
-                if highlighted_words:
+                if highlighted_terms:
+                    if filtered_df is None:
+                        highlighted_counts = highlighted_counts_from_index(term_counters, highlighted_terms)
+                    else:
+                        highlighted_counts = count_highlighted_terms(filtered_df, highlighted_terms)
                     colword, colword2 = st.columns(2)
                     with colword:
                         st.write("Mots mis en avant :")
                         st.write(highlighted_words)
-                        
-                        def filter_highlighted_words(reviews, highlighted_words):
-                            text_joined = " ".join(reviews["cleaned_text"])
-                            text_joined = text_joined.lower()
-                            text_joined = text_joined.split(" ")
-                            filtered_highlighted_words = [word for word in text_joined if word in highlighted_words]
-                            filtered_highlighted_words = [word for word in filtered_highlighted_words if len(word) > 1]
-                            return filtered_highlighted_words
-                        
-                        bad_highlighted_words = filter_highlighted_words(bad_reviews, highlighted_words)
-                        neutral_highlighted_words = filter_highlighted_words(neutral_reviews, highlighted_words)
-                        good_highlighted_words = filter_highlighted_words(good_reviews, highlighted_words)
-                        
-                        wordcloud = WordCloud(width=800, height=400, background_color="white").generate(
-                            " ".join(bad_highlighted_words + neutral_highlighted_words + good_highlighted_words)
-                        )
-                        plt.figure(figsize=(10, 5))
-                        plt.imshow(wordcloud, interpolation="bilinear")
-                        plt.axis("off")
-                        st.pyplot(plt)
-                        
+
+                        if not highlighted_counts.empty:
+                            st.image(render_wordcloud_png(
+                                dict(zip(highlighted_counts["word"], highlighted_counts["count"]))
+                            ))
+                        else:
+                            st.write("Aucun des mots mis en avant n'apparaît dans les avis.")
+
                     with colword2:
-                        import pandas as pd
-                        word_counts = Counter(bad_highlighted_words + neutral_highlighted_words + good_highlighted_words)
-                        word_counts_df = pd.DataFrame(word_counts.items(), columns=["word", "count"])
-                        word_counts_df["bad_count"] = word_counts_df["word"].apply(lambda x: bad_highlighted_words.count(x))
-                        word_counts_df["neutral_count"] = word_counts_df["word"].apply(lambda x: neutral_highlighted_words.count(x))
-                        word_counts_df["good_count"] = word_counts_df["word"].apply(lambda x: good_highlighted_words.count(x))
-
-                        bar_chart = alt.Chart(word_counts_df).transform_fold(
+                        bar_chart = alt.Chart(highlighted_counts).transform_fold(
                             ["bad_count", "neutral_count", "good_count"],
                             as_=["Sentiment", "Count"]
                         ).mark_bar().encode(
@@ -320,7 +330,7 @@ def analytics_page(df):
                         )
 
                         st.altair_chart(bar_chart, use_container_width=True)
-                        
+
 
     ################################################################
     # WORD2VEC
@@ -338,13 +348,17 @@ def analytics_page(df):
         selected_names, names = restaurant_filters(df, TAB_TITLE)
 
         # col1, col2, col3 = st.columns(3)
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         with col1:
             relevance = st.checkbox("Analyse des avis les plus pertinents ?", value=False,
                                     help="Seuls les avis émis par des internautes ayant un volume de contribution supérieur à la médiane seront pris en compte lors de l'analyse.",
                                     key=f"relevant_only_{TAB_TITLE}")
         with col2:
             three_dim = st.checkbox("Analyse en 3D ? ", value=False)
+        with col3:
+            show_reviews = st.checkbox("Afficher les avis ?", value=False,
+                                       help="Représente aussi chaque avis sur la carte.",
+                                       key=f"show_reviews_{TAB_TITLE}")
         # with col3:
         #     analysis_type = st.selectbox("Où mettre l'accent pour l'analyse ?", options=["Type de cuisine", "Fourchette de prix"])
             
@@ -354,19 +368,25 @@ def analytics_page(df):
             with st.spinner(
                 "Acquisition et pré-traitement des données sélectionnées... ⏳"
             ):
-                filtered_df = get_filtered_restaurant(df, selected_names, names, relevance)
-                if three_dim and len(filtered_df["restaurant_id"].unique()) < 3:
+                restaurant_ids = get_selected_restaurant_ids(df, selected_names, names)
+                min_contributions = get_min_contributions(restaurant_ids, relevance)
+                reviews_stats = cached_restaurant_review_stats(restaurant_ids, min_contributions)
+                if three_dim and len(reviews_stats) < 3:
                     st.warning("Veuillez sélectionner au moins trois restaurants.")
                     st.stop()
-                elif not three_dim and len(filtered_df["restaurant_id"].unique()) < 2:
+                elif not three_dim and len(reviews_stats) < 2:
                     st.warning("Veuillez sélectionner au moins deux restaurants.")
                     st.stop()
-                filtered_df = clean_text_df(filtered_df)
+                filtered_df = cached_cleaned_reviews(restaurant_ids, min_contributions)
 
             with st.spinner("Analyse des similarités en cours... ⏳"):
                 restaurant_coords, restaurant_names = generate_word2vec(
                     filtered_df, three_dim
                 )
+                review_coords, review_restaurants = (
+                    generate_review_projection(filtered_df, three_dim)
+                    if show_reviews else (None, None)
+                )
                 # if analysis_type == "Type de cuisine":
                 #     classes = restaurant_info_supp["restaurant_type"]
                 # else: # analysis_type == "Fourchette de prix"
@@ -376,6 +396,19 @@ def analytics_page(df):
                 fig = go.Figure()
 
                 if three_dim:
+                    if review_coords is not None:
+                        fig.add_trace(
+                            go.Scatter3d(
+                                x=review_coords[:, 0],
+                                y=review_coords[:, 1],
+                                z=review_coords[:, 2],
+                                mode="markers",
+                                marker=dict(size=2, color="lightgrey"),
+                                text=review_restaurants,
+                                hoverinfo="text",
+                                name="Avis",
+                            )
+                        )
                     # Ajout des points de scatter
                     fig.add_trace(
                         go.Scatter3d(
@@ -406,6 +439,18 @@ def analytics_page(df):
                     )
 
                 else:
+                    if review_coords is not None:
+                        fig.add_trace(
+                            go.Scatter(
+                                x=review_coords[:, 0],
+                                y=review_coords[:, 1],
+                                mode="markers",
+                                marker=dict(size=4, color="lightgrey"),
+                                text=review_restaurants,
+                                hoverinfo="text",
+                                name="Avis",
+                            )
+                        )
                     # Ajout des points de scatter
                     fig.add_trace(
                         go.Scatter(
@@ -433,3 +478,41 @@ def analytics_page(df):
 
                 # Affichage du graphique dans Streamlit
                 st.plotly_chart(fig)
+
+        st.divider()
+        st.subheader("Restaurants les plus similaires")
+        st.write(
+            "ℹ️ Recherche, parmi tous les restaurants de la base, ceux dont les avis sont les plus proches du restaurant choisi."
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            reference_name = st.selectbox(
+                "Restaurant de référence",
+                df["restaurant_name"].unique(),
+                key=f"reference_restaurant_{TAB_TITLE}",
+            )
+        with col2:
+            top_k = st.number_input(
+                "Nombre de restaurants", min_value=1, max_value=20, value=5,
+                key=f"top_k_{TAB_TITLE}",
+            )
+        if st.button("Rechercher", key=f"search_similar_{TAB_TITLE}"):
+            reference_id = df[df["restaurant_name"] == reference_name]["restaurant_id"].iloc[0]
+            similar = similar_restaurants(reference_id, int(top_k))
+            if similar.empty:
+                st.warning("Aucun restaurant similaire trouvé.")
+            else:
+                similar = similar.merge(
+                    df[["restaurant_id", "restaurant_name", "restaurant_type", "restaurant_price"]],
+                    on="restaurant_id",
+                )
+                similar["similarity"] = similar["similarity"].round(3)
+                st.dataframe(
+                    similar.drop(columns="restaurant_id").rename(columns={
+                        "restaurant_name": "Restaurant",
+                        "restaurant_type": "Type",
+                        "restaurant_price": "Prix",
+                        "similarity": "Similarité",
+                    }),
+                    hide_index=True,
+                )
@@ -4,7 +4,7 @@ This module contains the "LLM" page.
 
 import streamlit as st
 from utils.MistralAPI import MistralAPI
-from utils.db import get_reviews_one_restaurant
+from utils.cache import cached_reviews_one_restaurant
 
 
 def reviews_treatment(reviews, restaurant_name, restaurant_info):
@@ -48,7 +48,7 @@ def llm_page(df):
     if st.button("Résumer les avis", key="button_name_selection"):
         try:
             st.write("\n\n\n")
-            filtered_df = get_reviews_one_restaurant(restaurant_id)
+            filtered_df = cached_reviews_one_restaurant(restaurant_id)
             reviews = filtered_df["review_text"]
             restaurant_info = df[df["restaurant_name"] == restaurant_name]
 
@@ -27,33 +27,40 @@ def map_page(df):
     ]
 
 
-    # Create a map centered around the average location
-    m = folium.Map(location=[filtered_df['latitude'].mean(), filtered_df['longitude'].mean()], zoom_start=12, tiles='cartodb positron')
+    # Restaurants without coordinates (offline or failed geocoding) are left off the map
+    located_df = filtered_df.dropna(subset=['latitude', 'longitude'])
+    missing = len(filtered_df) - len(located_df)
+    if missing:
+        st.info(f"{missing} restaurant(s) sans coordonnées ne sont pas affichés sur la carte.")
 
-    # Add markers to the map
-    for _, row in filtered_df.iterrows():
-        popup_content = f"""
-        <div>
-        <h4>{row['restaurant_name']}</h4>
-        <p><strong>Adresse :</strong> {row['address']}</p>
-        <p><strong>Note moyenne :</strong> {row['restaurant_avg_review']}</p>
-        <p><strong>Nombre d'avis :</strong> {row['restaurant_total_reviews']}</p>
-        <p><strong>Prix :</strong> {row['restaurant_price']}</p>
-        <p><a href="https://www.tripadvisor.fr/{row['restaurant_url']}" target="_blank">Visiter sur TripAdvisor</a></p>
-        </div>
-        """
-        folium.Marker(
-        location=[row['latitude'], row['longitude']],
-        popup=folium.Popup(popup_content, max_width=300),
-        icon=folium.Icon(color=get_color(row['restaurant_avg_review']))
-        ).add_to(m)
+    if not located_df.empty:
+        # Create a map centered around the average location
+        m = folium.Map(location=[located_df['latitude'].mean(), located_df['longitude'].mean()], zoom_start=12, tiles='cartodb positron')
 
-    # Add heatmap for sections with best califications
-    heat_data = [[row['latitude'], row['longitude']] for _, row in filtered_df.iterrows() if row['restaurant_avg_review'] >= 4]
-    HeatMap(heat_data).add_to(m)
+        # Add markers to the map
+        for _, row in located_df.iterrows():
+            popup_content = f"""
+            <div>
+            <h4>{row['restaurant_name']}</h4>
+            <p><strong>Adresse :</strong> {row['address']}</p>
+            <p><strong>Note moyenne :</strong> {row['restaurant_avg_review']}</p>
+            <p><strong>Nombre d'avis :</strong> {row['restaurant_total_reviews']}</p>
+            <p><strong>Prix :</strong> {row['restaurant_price']}</p>
+            <p><a href="https://www.tripadvisor.fr/{row['restaurant_url']}" target="_blank">Visiter sur TripAdvisor</a></p>
+            </div>
+            """
+            folium.Marker(
+            location=[row['latitude'], row['longitude']],
+            popup=folium.Popup(popup_content, max_width=300),
+            icon=folium.Icon(color=get_color(row['restaurant_avg_review']))
+            ).add_to(m)
+
+        # Add heatmap for sections with best califications
+        heat_data = [[row['latitude'], row['longitude']] for _, row in located_df.iterrows() if row['restaurant_avg_review'] >= 4]
+        HeatMap(heat_data).add_to(m)
 
-    # Display the map
-    folium_static(m)
+        # Display the map
+        folium_static(m)
 
     # Display restaurant information in a grid format
     cols = st.columns(3)
@@ -1,19 +1,19 @@
 """ This module contains the "Scraper" page. """
 
-import time
-import random
+import os
 import re
 import streamlit as st
-from utils.tripAdvisorScraper import TripAdvisorSpecificRestaurantScraper
 from utils.db import (
-    save_reviews_to_db, 
-    delete_reviews_by_restaurant_id,
     restaurant_exists,
-    save_restaurant_to_db,
-    get_reviews_info_by_restaurant)
+    enqueue_scrape_job,
+    get_scrape_jobs)
+from utils.cache import cached_reviews_info_by_restaurant
 from utils.functions import extract_types_from_df
 import folium
 from streamlit_folium import folium_static
+
+# Intervalle de rafraîchissement de l'état des tâches de scraping (secondes)
+JOBS_REFRESH_INTERVAL = float(os.environ.get("SCRAPE_JOBS_REFRESH_INTERVAL", 3))
                         
 def verify_url(url):
     try:
@@ -27,70 +27,34 @@ def verify_url(url):
         st.error(f"Erreur: {e}")
         return False
     
-def scrape_restaurant_reviews(scraper, url, total_reviews_expected):
-    """Scraper tous les avis pour un restaurant spécifique et afficher la progression dans Streamlit."""
-    scraper.fetch_page(url)
-    reviews = []
-    page = 1
-    tries = 0
-    total_pages = total_reviews_expected // 15 + 5
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    while scraper.url:
-        time.sleep(random.uniform(1, 3))
-        review_cards = scraper.get_review_cards()
-        if not review_cards:
-            tries += 1
-            if tries > 10:
-                raise Exception("Aucune carte de restaurant trouvée - Abandon")
-            else:
-                continue
-        tries = 0
-        for card in review_cards:
-            reviews.append(scraper.parse_review(card))
-        scraper.url = scraper.get_next_url()
-        if scraper.url:
-            scraper.fetch_page(scraper.url)
-        page += 1
-        progress_bar.progress(min(page / total_pages, 1.0))
-        status_text.text(f"Scraping page {page} sur {total_pages}")
-    
-    progress_bar.progress(1.0)  # Assurez-vous que la barre de progression est complète à la fin
-    status_text.text("Scraping terminé")
-    return reviews
+STATUS_LABELS = {
+    "queued": "⏳ En attente",
+    "running": "🔄 En cours",
+    "done": "✅ Terminé",
+    "failed": "❌ Échec",
+}
 
-def download_restaurant_data(df):
+
+@st.fragment(run_every=JOBS_REFRESH_INTERVAL)
+def scrape_jobs_status():
     """
-    Télécharger les données pour chaque restaurant dans le DataFrame filtré et enregistrer dans la base de données.
+    Afficher l'état des tâches de scraping, rafraîchi périodiquement
+    sans relancer le reste de la page.
     """
-
-    logs = []
-    for i, (index, row) in enumerate(df.iterrows()):
-        with st.spinner(f"Téléchargement des données pour {row['restaurant_name']}..."):
-            time.sleep(random.uniform(1, 3))
-            restaurant_url = row["restaurant_url"]
-            restaurant_total_reviews = row["restaurant_total_reviews"]
-            try:
-                scraper = TripAdvisorSpecificRestaurantScraper()
-                corpus = scrape_restaurant_reviews(scraper, restaurant_url, restaurant_total_reviews)
-                save_reviews_to_db(row['restaurant_id'], corpus)
-                logs.append(f"Succès: {row['restaurant_name']} - {len(corpus)} avis téléchargés.")
-            except Exception as e:
-                error_message = f"Erreur: {row['restaurant_name']} - {e}"
-                logs.append(error_message)
-                print(error_message)
-                continue
-        time.sleep(random.uniform(1, 3))
-        logs.append({
-            "restaurant_id": row["restaurant_id"],
-            "restaurant_name": row["restaurant_name"],
-            "reviews_downloaded": len(corpus)
-        })
-    
-    with st.expander("Logs du processus"):
-        for log in logs:
-            st.write(log)
+    jobs = get_scrape_jobs()
+    if jobs.empty:
+        st.write("Aucune tâche de scraping.")
+        return
+    for job in jobs.itertuples(index=False):
+        name = job.restaurant_name or job.restaurant_url
+        with st.expander(f"{STATUS_LABELS.get(job.status, job.status)} - {name}", expanded=job.status == "running"):
+            if job.status in ("queued", "running"):
+                st.progress(float(job.progress))
+            if job.message:
+                st.write(job.message)
+            st.write(f"Avis téléchargés : {job.reviews_downloaded}")
+            for log in job.logs or []:
+                st.write(log)
 
 
 def restaurant_page(df):
@@ -123,7 +87,7 @@ def restaurant_page(df):
             with col2:
                 restaurant_id = filtered_df.iloc[0]["restaurant_id"]
                 st.subheader("Reviews Information")
-                reviews_info = get_reviews_info_by_restaurant(restaurant_id)
+                reviews_info = cached_reviews_info_by_restaurant(restaurant_id)
                 st.write(f"**Reviews scraped:** {reviews_info['review_count'].iloc[0]}")
                 st.write(f"**Average Rating:** {reviews_info['average_rating'].iloc[0]:.1f}")
                 st.write(f"**First Comment Date:** {reviews_info['first_comment_date'].iloc[0]}")
@@ -131,21 +95,35 @@ def restaurant_page(df):
             st.subheader("À propos du Restaurant")  
             st.write(f"{restaurant_info_dict['restaurant_about']}")
             with tab_info2:
-                st.warning("**Attention**: Les avis seront écrasés dans la base de données lors de la mise à jour.")
                 try:
                     if not restaurant_name:
                         st.warning("Veuillez sélectionner un restaurant avant de continuer.")
                     else:
                         st.write(f"Mettre à jour les avis de {restaurant_name}")
-                        if st.checkbox("Confirmer le risque de suppression des données existantes"):
+                        mode = st.radio(
+                            "Mode de mise à jour",
+                            ["Nouveaux avis uniquement", "Tout retélécharger"],
+                            help="Le mode incrémental s'arrête aux avis déjà enregistrés et ne télécharge que les pages nécessaires.",
+                            key="update_mode"
+                        )
+                        full_update = mode == "Tout retélécharger"
+                        if full_update:
+                            st.warning("**Attention**: Les avis seront écrasés dans la base de données lors de la mise à jour.")
+                        confirmed = not full_update or st.checkbox("Confirmer le risque de suppression des données existantes")
+                        if confirmed:
                             if st.button("Télécharger", key="button_name_selection"):
-                                st.write(f"Téléchargement des données pour {restaurant_name}...")
                                 filtered_df = df[df["restaurant_name"] == restaurant_name]
-                                restaurant_id = filtered_df.iloc[0]["restaurant_id"]
-                                delete_reviews_by_restaurant_id(restaurant_id)
-                                download_restaurant_data(filtered_df)
-                            else:
-                                st.warning("Veuillez confirmer la suppression des données existantes avant de continuer.")
+                                row = filtered_df.iloc[0]
+                                job_id = enqueue_scrape_job(
+                                    "update" if full_update else "refresh",
+                                    row["restaurant_url"], row["restaurant_id"], row["restaurant_total_reviews"]
+                                )
+                                if job_id is None:
+                                    st.error("Impossible d'ajouter la tâche de téléchargement.")
+                                else:
+                                    st.success(f"Téléchargement des données pour {restaurant_name} ajouté à la file d'attente.")
+                        else:
+                            st.warning("Veuillez confirmer la suppression des données existantes avant de continuer.")
 
                 except FileNotFoundError:
                     st.write(
@@ -168,21 +146,12 @@ def restaurant_page(df):
                     st.error("**Restaurant déjà existant**: Pour mettre à jour les informations, veuillez utiliser la page de mise à jour")
                 else:
                     st.success("URL valide %s" % url_input)
-                    if url != False:
-                        while True:
-                            try:
-                                scraper = TripAdvisorSpecificRestaurantScraper()
-                                scraper.fetch_page(url)
-                                info = scraper.get_restaurant_info()
-                                if info.get('restaurant_name') is not None:
-                                    break
-                            except Exception as e:
-                                st.error(f"Erreur lors de la récupération des informations {e}")
-                                time.sleep(5)
-                        
-                        with st.expander('Regarder les informations'):
-                            st.write(info)
-                        st.success("Restaurant enregistré sur la base de données")
-                        
-                        restaurant_df = save_restaurant_to_db(info)
-                        download_restaurant_data(restaurant_df)
+                    job_id = enqueue_scrape_job("new", url)
+                    if job_id is None:
+                        st.error("Impossible d'ajouter la tâche de scraping.")
+                    else:
+                        st.success("Scraping du restaurant ajouté à la file d'attente.")
+
+        st.divider()
+        st.subheader("Tâches de scraping")
+        scrape_jobs_status()